@@ -1,20 +1,46 @@
+import asyncio
+import concurrent.futures
+import contextvars
 import logging
 import os
+import queue
+import random
+import threading
 import time
+from collections import deque
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Coroutine, Deque, Dict, Iterator, Optional, Tuple
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from openai import APIStatusError
 
+from app import telemetry
+from app.tokens import estimate_tokens
+
 load_dotenv()
 
 # Model defaults (override via env)
 ANALYSIS_MODEL = os.getenv("OPENAI_ANALYSIS_MODEL", os.getenv("OPENAI_MODEL", "gpt-4.1"))
 SUMMARY_MODEL = os.getenv("OPENAI_SUMMARY_MODEL", "gpt-4.1-mini")
+# Process-wide cap on in-flight LLM requests across all jobs and files
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Provider ceilings per model (requests and tokens per minute); 0 disables a bucket
+ANALYSIS_RPM = int(os.getenv("OPENAI_ANALYSIS_RPM", "500"))
+ANALYSIS_TPM = int(os.getenv("OPENAI_ANALYSIS_TPM", "30000"))
+SUMMARY_RPM = int(os.getenv("OPENAI_SUMMARY_RPM", "500"))
+SUMMARY_TPM = int(os.getenv("OPENAI_SUMMARY_TPM", "200000"))
+DEFAULT_RPM = int(os.getenv("OPENAI_DEFAULT_RPM", "500"))
+DEFAULT_TPM = int(os.getenv("OPENAI_DEFAULT_TPM", "30000"))
+# Completion tokens reserved per request when estimating TPM usage up front
+COMPLETION_TOKEN_ALLOWANCE = int(os.getenv("OPENAI_COMPLETION_TOKEN_ALLOWANCE", "512"))
+# Sleeps are stretched by up to this fraction so callers don't retry in lockstep
+RETRY_JITTER = float(os.getenv("OPENAI_RETRY_JITTER", "0.25"))
+# How often blocked callers check their cancel event
+CANCEL_POLL_SECONDS = 0.2
 
-_client: Optional[OpenAI] = None
+_client: Optional[AsyncOpenAI] = None
 logger = logging.getLogger(__name__)
 
 
@@ -39,37 +65,479 @@ def _load_api_key() -> str:
     )
 
 
-def _get_client() -> OpenAI:
-    """Lazily instantiate the OpenAI client so tests can monkeypatch ask_gpt."""
+class AnalysisCancelled(Exception):
+    """Raised when a caller's cancel event is set while its work is still running."""
+
+
+async def _in_context(context: contextvars.Context, coro: Coroutine[Any, Any, Any]) -> Any:
+    # Runs as its own task, so these values stay local to it (and the tasks it spawns)
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+class LLMRuntime:
+    """
+    Background event loop that owns the async OpenAI client and one semaphore
+    bounding in-flight requests for the whole process. Sync callers (job threads,
+    the CLI) submit coroutines here; async callers on other loops are bridged in.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run() -> None:
+                    asyncio.set_event_loop(loop)
+                    self.semaphore = asyncio.Semaphore(self.max_concurrency)
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=_run, name="llm-runtime", daemon=True).start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def in_runtime(self) -> bool:
+        try:
+            return self._loop is not None and asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Schedule a coroutine on the runtime loop from any thread, carrying the caller's context."""
+        return asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coro), self.loop())
+
+    def run(self, coro: Coroutine[Any, Any, Any], cancel_event: Optional[threading.Event] = None) -> Any:
+        """
+        Run a coroutine on the runtime loop and block until it finishes.
+        If cancel_event is set meanwhile, the task (and its in-flight requests)
+        is cancelled and AnalysisCancelled is raised.
+        """
+        if self.in_runtime():
+            coro.close()
+            raise RuntimeError("LLMRuntime.run() called from the runtime loop; await the coroutine instead")
+        future = self.submit(coro)
+        if cancel_event is None:
+            return future.result()
+        while True:
+            try:
+                return future.result(timeout=CANCEL_POLL_SECONDS)
+            except concurrent.futures.TimeoutError:
+                if cancel_event.is_set():
+                    future.cancel()
+                    raise AnalysisCancelled("Cancelled while waiting on the LLM runtime")
+
+
+llm_runtime = LLMRuntime(LLM_MAX_CONCURRENCY)
+
+
+def _get_client() -> AsyncOpenAI:
+    """Lazily instantiate the async OpenAI client (used only on the runtime loop)."""
     global _client
     if _client is None:
-        _client = OpenAI(api_key=_load_api_key())
+        # SDK-level retries are disabled so 429s reach the shared rate limiter
+        _client = AsyncOpenAI(api_key=_load_api_key(), max_retries=0)
     return _client
 
 
-def ask_gpt(prompt: str, *, model: Optional[str] = None, temperature: float = 0.4, retries: int = 3) -> str:
-    """Send a prompt to OpenAI ChatCompletion API and return the reply with retries and rate-limit handling."""
+class TokenBucket:
+    """Per-minute token bucket; all use happens on the runtime loop, so no locking."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta: float) -> None:
+        """Charge (or refund) the difference between estimated and actual usage."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AdaptiveRateLimiter:
+    """
+    Shared limiter for one model: RPM and TPM token buckets plus an AIMD
+    concurrency window. A 429 halves the window (at most once per cooldown)
+    and pauses every caller until Retry-After; each success grows it by ~1
+    per window's worth of requests, up to `max_concurrency`.
+    """
+
+    def __init__(self, model: str, rpm: int, tpm: int, max_concurrency: int):
+        self.model = model
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_concurrency = float(max(max_concurrency, 1))
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.rate_limited = 0
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def allowed(self) -> int:
+        return max(int(self.limit), 1)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        while self.in_flight >= self.allowed():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+        try:
+            delay = self.blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.requests:
+                await self.requests.acquire(1)
+            if self.tokens:
+                await self.tokens.acquire(estimated_tokens)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        free = self.allowed() - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def on_success(self, estimated_tokens: int, used_tokens: Optional[int]) -> None:
+        if self.tokens and used_tokens:
+            self.tokens.adjust(used_tokens - estimated_tokens)
+        self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def on_rate_limited(self, retry_after: Optional[float]) -> None:
+        now = time.monotonic()
+        self.rate_limited += 1
+        cooldown = retry_after if retry_after is not None else 1.0
+        # Many in-flight calls fail together on one ceiling breach; decrease once per window
+        if now - self._last_decrease >= cooldown:
+            self.limit = max(1.0, self.limit / 2)
+            self._last_decrease = now
+            logger.info("Rate limited on model=%s; concurrency window now %s", self.model, self.allowed())
+        self.blocked_until = max(self.blocked_until, now + _with_jitter(cooldown))
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+
+telemetry.REGISTRY.register(
+    telemetry.CallbackGauge(
+        "aicore_llm_waiting_requests",
+        "Model calls queued behind the rate limiter's concurrency window.",
+        lambda: {(model,): len(limiter._waiters) for model, limiter in list(_limiters.items())},
+        ["model"],
+    )
+)
+
+
+def _model_ceilings(model: str) -> Tuple[int, int]:
+    if model == ANALYSIS_MODEL:
+        return ANALYSIS_RPM, ANALYSIS_TPM
+    if model == SUMMARY_MODEL:
+        return SUMMARY_RPM, SUMMARY_TPM
+    return DEFAULT_RPM, DEFAULT_TPM
+
+
+def get_rate_limiter(model: str) -> AdaptiveRateLimiter:
+    """Return the process-wide limiter for a model (runtime loop only)."""
+    limiter = _limiters.get(model)
+    if limiter is None:
+        rpm, tpm = _model_ceilings(model)
+        limiter = AdaptiveRateLimiter(model, rpm, tpm, LLM_MAX_CONCURRENCY)
+        _limiters[model] = limiter
+    return limiter
+
+
+def estimate_request_tokens(prompt: str) -> int:
+    """Prompt+completion token estimate for TPM budgeting."""
+    return estimate_tokens(prompt) + COMPLETION_TOKEN_ALLOWANCE
+
+
+def _with_jitter(seconds: float) -> float:
+    return seconds * (1 + random.uniform(0, RETRY_JITTER))
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Read Retry-After (or retry-after-ms) from a failed OpenAI response, if present."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+def _is_rate_limit(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    return status == 429 or isinstance(exc, APIStatusError) and getattr(exc, "status_code", None) == 429
+
+
+def _record_failure(exc: Exception, limiter: AdaptiveRateLimiter, attempt: int, retries: int, model: str) -> Tuple[bool, Optional[float]]:
+    """Log a failed attempt and feed 429s to the limiter. Returns (is_rate_limit, retry_after)."""
+    is_rate_limit = _is_rate_limit(exc)
+    retry_after = None
+    if is_rate_limit:
+        retry_after = _retry_after_seconds(exc)
+        limiter.on_rate_limited(retry_after)
+    logger.warning("OpenAI call failed (attempt %s/%s, model=%s, rate_limit=%s): %s", attempt, retries, model, is_rate_limit, exc)
+    return is_rate_limit, retry_after
+
+
+async def ask_gpt_async(
+    prompt: str, *, model: Optional[str] = None, temperature: float = 0.4, retries: int = 3
+) -> str:
+    """
+    Async variant of ask_gpt. Every attempt passes the model's shared rate limiter
+    (RPM/TPM buckets, AIMD window, Retry-After cooldown) and holds a slot of the
+    process-wide concurrency budget while in flight.
+    """
+    if not llm_runtime.in_runtime():
+        # Bridge callers on other event loops onto the runtime loop that owns the budget
+        return await asyncio.wrap_future(
+            llm_runtime.submit(ask_gpt_async(prompt, model=model, temperature=temperature, retries=retries))
+        )
+
     model_to_use = model or ANALYSIS_MODEL
+    limiter = get_rate_limiter(model_to_use)
+    estimated_tokens = estimate_request_tokens(prompt)
     backoff = 1.0
     last_exc: Optional[Exception] = None
 
     for attempt in range(1, retries + 1):
+        retry_after: Optional[float] = None
+        is_rate_limit = False
+        await limiter.acquire(estimated_tokens)
+        started = time.perf_counter()
         try:
-            response = _get_client().chat.completions.create(
-                model=model_to_use,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=temperature
+            async with llm_runtime.semaphore:
+                telemetry.LLM_IN_FLIGHT.inc(model=model_to_use)
+                try:
+                    response = await _get_client().chat.completions.create(
+                        model=model_to_use,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature
+                    )
+                finally:
+                    telemetry.LLM_IN_FLIGHT.dec(model=model_to_use)
+        except Exception as exc:  # Broad to capture rate limits/network issues
+            last_exc = exc
+            is_rate_limit, retry_after = _record_failure(exc, limiter, attempt, retries, model_to_use)
+            telemetry.record_llm_attempt(
+                model_to_use, "rate_limited" if is_rate_limit else "error", time.perf_counter() - started, attempt
             )
+        else:
+            usage = getattr(response, "usage", None)
+            limiter.on_success(estimated_tokens, getattr(usage, "total_tokens", None))
+            telemetry.record_llm_attempt(model_to_use, "ok", time.perf_counter() - started, attempt)
+            telemetry.record_llm_usage(model_to_use, usage)
             return response.choices[0].message.content
-        except Exception as exc:  # Broad to capture rate limits/network issues
+        finally:
+            limiter.release()
+
+        if attempt == retries:
+            break
+        # Sleep outside the semaphore so backing-off calls don't hold budget
+        sleep_for = retry_after if retry_after is not None else backoff * (2 if is_rate_limit else 1)
+        await asyncio.sleep(_with_jitter(sleep_for))
+        backoff *= 2
+
+    raise RuntimeError(f"OpenAI call failed after {retries} attempts: {last_exc}")
+
+
+async def _stream_on_runtime(
+    prompt: str, model: Optional[str], temperature: float, retries: int
+) -> AsyncIterator[str]:
+    """Streaming counterpart of ask_gpt_async's retry loop; runs on the runtime loop."""
+    model_to_use = model or ANALYSIS_MODEL
+    limiter = get_rate_limiter(model_to_use)
+    estimated_tokens = estimate_request_tokens(prompt)
+    backoff = 1.0
+    last_exc: Optional[Exception] = None
+
+    for attempt in range(1, retries + 1):
+        retry_after: Optional[float] = None
+        is_rate_limit = False
+        emitted = False
+        usage = None
+        await limiter.acquire(estimated_tokens)
+        started = time.perf_counter()
+        try:
+            async with llm_runtime.semaphore:
+                telemetry.LLM_IN_FLIGHT.inc(model=model_to_use)
+                try:
+                    stream = await _get_client().chat.completions.create(
+                        model=model_to_use,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+                    async for chunk in stream:
+                        if getattr(chunk, "usage", None) is not None:
+                            usage = chunk.usage
+                        if chunk.choices:
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                emitted = True
+                                yield delta
+                finally:
+                    telemetry.LLM_IN_FLIGHT.dec(model=model_to_use)
+        except Exception as exc:
+            telemetry.record_llm_attempt(
+                model_to_use, "rate_limited" if _is_rate_limit(exc) else "error", time.perf_counter() - started, attempt
+            )
+            if emitted:
+                # Part of the reply is already with the caller; a retry would repeat it
+                raise
             last_exc = exc
-            status = getattr(exc, "status_code", None)
-            is_rate_limit = status == 429 or isinstance(exc, APIStatusError) and getattr(exc, "status_code", None) == 429
-            logger.warning("OpenAI call failed (attempt %s/%s, model=%s, rate_limit=%s): %s", attempt, retries, model_to_use, is_rate_limit, exc)
-            if attempt == retries:
-                break
-            sleep_for = backoff * (2 if is_rate_limit else 1)
-            time.sleep(sleep_for)
-            backoff *= 2
+            is_rate_limit, retry_after = _record_failure(exc, limiter, attempt, retries, model_to_use)
+        else:
+            limiter.on_success(estimated_tokens, getattr(usage, "total_tokens", None))
+            telemetry.record_llm_attempt(model_to_use, "ok", time.perf_counter() - started, attempt)
+            telemetry.record_llm_usage(model_to_use, usage)
+            return
+        finally:
+            limiter.release()
+
+        if attempt == retries:
+            break
+        sleep_for = retry_after if retry_after is not None else backoff * (2 if is_rate_limit else 1)
+        await asyncio.sleep(_with_jitter(sleep_for))
+        backoff *= 2
 
     raise RuntimeError(f"OpenAI call failed after {retries} attempts: {last_exc}")
+
+
+_STREAM_DONE = object()
+
+
+async def _pump_stream(prompt: str, model: Optional[str], temperature: float, retries: int, put: Callable[[Any], None]) -> None:
+    """Forward reply deltas (then an exception, if any, then _STREAM_DONE) to another thread or loop."""
+    try:
+        async for delta in _stream_on_runtime(prompt, model, temperature, retries):
+            put(delta)
+    except BaseException as exc:
+        put(exc)
+        raise
+    finally:
+        put(_STREAM_DONE)
+
+
+async def stream_gpt_async(
+    prompt: str, *, model: Optional[str] = None, temperature: float = 0.4, retries: int = 3
+) -> AsyncIterator[str]:
+    """
+    Yield the reply as text deltas while it is generated. Retries and rate
+    limiting match ask_gpt_async, but only until the first delta arrives.
+    """
+    if llm_runtime.in_runtime():
+        async for delta in _stream_on_runtime(prompt, model, temperature, retries):
+            yield delta
+        return
+
+    loop = asyncio.get_running_loop()
+    items: "asyncio.Queue[Any]" = asyncio.Queue()
+    future = llm_runtime.submit(
+        _pump_stream(prompt, model, temperature, retries, lambda item: loop.call_soon_threadsafe(items.put_nowait, item))
+    )
+    try:
+        while True:
+            item = await items.get()
+            if item is _STREAM_DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        future.cancel()
+
+
+def ask_gpt(
+    prompt: str,
+    *,
+    model: Optional[str] = None,
+    temperature: float = 0.4,
+    retries: int = 3,
+    cancel_event: Optional[threading.Event] = None,
+) -> str:
+    """Send a prompt to OpenAI ChatCompletion API and return the reply with retries and rate-limit handling."""
+    return llm_runtime.run(
+        ask_gpt_async(prompt, model=model, temperature=temperature, retries=retries), cancel_event=cancel_event
+    )
+
+
+def stream_gpt(
+    prompt: str,
+    *,
+    model: Optional[str] = None,
+    temperature: float = 0.4,
+    retries: int = 3,
+    cancel_event: Optional[threading.Event] = None,
+) -> Iterator[str]:
+    """Blocking iterator over the reply's text deltas; see stream_gpt_async."""
+    items: "queue.Queue[Any]" = queue.Queue()
+    future = llm_runtime.submit(_pump_stream(prompt, model, temperature, retries, items.put))
+    try:
+        while True:
+            try:
+                item = items.get(timeout=CANCEL_POLL_SECONDS)
+            except queue.Empty:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise AnalysisCancelled("Cancelled while streaming the reply")
+                continue
+            if item is _STREAM_DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Stops the request if the consumer gave up early
+        future.cancel()
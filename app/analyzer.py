@@ -1,13 +1,19 @@
 
+import json
 import logging
 import os
+import threading
 from datetime import datetime
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import Any, Callable, List, Dict, Optional, Tuple
 
-from app.ai_engine import ANALYSIS_MODEL, ask_gpt
-from app.preprocessing import preprocess_files
-from app.prompt_builder import build_prompt
+from app.ai_engine import ANALYSIS_MODEL, AnalysisCancelled, ask_gpt, stream_gpt
+from app.cache import file_sha256, get_result_cache, make_cache_key
+from app.preprocessing import detect_file_type, preprocess_files, preprocessing_settings
+from app.prompt_builder import PROMPT_TEMPLATE_VERSION, build_prompt
 from app.progress import progress_manager
+from app.run_history import get_run_history, merge_metrics, metrics_from_markdown
+from app.telemetry import timed_stage, track_job
 
 logger = logging.getLogger(__name__)
 
@@ -32,22 +38,197 @@ def _extract_section(markdown: str, title: str) -> str:
     return "\n".join(collected).strip()
 
 
-def analyze(files: List[Dict], context: Dict, job_id: Optional[str] = None) -> Dict:
+# Report sections surfaced as separate result fields
+SECTION_KEYS = {
+    "executive summary": "summary",
+    "key metrics & findings": "insights",
+    "recommendations": "recommendations",
+}
+
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class SectionStream:
+    """
+    Incremental counterpart of _extract_section: feed streamed Markdown and get
+    back each (title, body) section as soon as the next heading closes it.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._title: Optional[str] = None
+        self._lines: List[str] = []
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        self._pending += text
+        closed: List[Tuple[str, str]] = []
+        while "\n" in self._pending:
+            line, self._pending = self._pending.split("\n", 1)
+            closed.extend(self._line(line))
+        return closed
+
+    def finish(self) -> List[Tuple[str, str]]:
+        closed = self._line(self._pending) if self._pending else []
+        self._pending = ""
+        return closed + self._close()
+
+    def _line(self, line: str) -> List[Tuple[str, str]]:
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            closed = self._close()
+            self._title = stripped.lstrip("#").strip()
+            return closed
+        if self._title is not None:
+            self._lines.append(line)
+        return []
+
+    def _close(self) -> List[Tuple[str, str]]:
+        if self._title is None:
+            return []
+        section = (self._title, "\n".join(self._lines).strip())
+        self._title, self._lines = None, []
+        return [section]
+
+
+def _stream_report(prompt: str, cancel_event: Optional[threading.Event], on_event: EventCallback) -> str:
+    """Stream the final report, emitting `token` deltas and each `section` once complete."""
+    parts: List[str] = []
+    sections = SectionStream()
+
+    def _emit_sections(closed: List[Tuple[str, str]]) -> None:
+        for title, content in closed:
+            on_event("section", {"title": title, "key": SECTION_KEYS.get(title.lower()), "content": content})
+
+    for delta in stream_gpt(prompt, model=ANALYSIS_MODEL, temperature=0.35, cancel_event=cancel_event):
+        parts.append(delta)
+        on_event("token", {"text": delta})
+        _emit_sections(sections.feed(delta))
+    _emit_sections(sections.finish())
+    return "".join(parts)
+
+
+def _input_identity(file_dict: Dict) -> str:
+    name = file_dict.get("name") or Path(file_dict["path"]).name
+    content_hash = file_dict.get("sha256") or file_sha256(Path(file_dict["path"]))
+    return f"{name}\0{detect_file_type(Path(name))}\0{content_hash}"
+
+
+def analysis_cache_key(files: List[Dict], context: Dict) -> Optional[str]:
+    """
+    Key for a complete analysis: each input's name, detected type and content
+    (order-insensitive), normalized context, models, prompt versions and
+    preprocessing settings. None if a file can't be hashed.
+    """
+    try:
+        # Name and type matter too: they pick the processor and appear in the prompt and result
+        inputs = sorted(_input_identity(f) for f in files)
+    except (OSError, KeyError, TypeError) as exc:
+        logger.warning("Skipping result cache, could not hash inputs: %s", exc)
+        return None
+    return make_cache_key(
+        "analysis",
+        PROMPT_TEMPLATE_VERSION,
+        ANALYSIS_MODEL,
+        *preprocessing_settings(),
+        json.dumps(context, sort_keys=True, separators=(",", ":"), default=str),
+        *inputs,
+    )
+
+
+def _replay_cached(result: Dict, on_event: EventCallback) -> None:
+    """Give streaming callers the same events a live run would produce."""
+    report = result.get("markdown_report", "")
+    on_event("token", {"text": report})
+    sections = SectionStream()
+    for title, content in sections.feed(report) + sections.finish():
+        on_event("section", {"title": title, "key": SECTION_KEYS.get(title.lower()), "content": content})
+
+
+def _check_cancelled(cancel_event: Optional[threading.Event]) -> None:
+    if cancel_event is not None and cancel_event.is_set():
+        raise AnalysisCancelled("Analysis cancelled")
+
+
+def analyze(
+    files: List[Dict],
+    context: Dict,
+    job_id: Optional[str] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_event: Optional[EventCallback] = None,
+) -> Dict:
+    """
+    Run the full pipeline. Setting cancel_event (e.g. when the client goes away)
+    stops the remaining LLM work and raises AnalysisCancelled. With on_event the
+    report is streamed: `stage`, `token` and `section` events are emitted as
+    the analysis advances, before the full result is returned. The result's
+    `timings` hold this run's per-stage durations and model usage.
+    """
+    with track_job() as timings:
+        with timed_stage("analysis"):
+            result = _analyze(files, context, job_id, cancel_event, on_event)
+        result["timings"] = timings.as_dict()
+    return result
+
+
+def _with_plan_context(file_summaries: List[Dict], context: Dict) -> Dict:
+    """Add test-plan details parsed from JMX files to the context; caller-supplied keys win."""
+    plans = [f for f in file_summaries if f.get("test_context")]
+    merged = dict(context)
+    for f in plans:
+        for key, value in f["test_context"].items():
+            # Several plans in one upload keep their entries apart by file name
+            merged.setdefault(f"{key} ({f.get('name')})" if len(plans) > 1 else key, value)
+    return merged
+
+
+def _analyze(
+    files: List[Dict],
+    context: Dict,
+    job_id: Optional[str],
+    cancel_event: Optional[threading.Event],
+    on_event: Optional[EventCallback],
+) -> Dict:
     logger.info("Starting analysis with %s files and context keys=%s", len(files), list(context.keys()))
     progress_ctx = {"job_id": job_id, "total_files": len(files)} if job_id else None
-    if progress_ctx:
-        progress_manager.update(job_id, progress=5, step="reading_files", message="Reading uploaded files")
-
-    file_summaries = preprocess_files(files, progress_ctx=progress_ctx)
-
-    if progress_ctx:
-        progress_manager.update(job_id, progress=65, step="building_prompt", message="Preparing analysis prompt")
-    prompt = build_prompt(file_summaries, context)
-    if progress_ctx:
-        progress_manager.update(job_id, progress=75, step="ai_analysis", message="Running AI analysis")
-    ai_response = ask_gpt(prompt, model=ANALYSIS_MODEL, temperature=0.35)
-    if progress_ctx:
-        progress_manager.update(job_id, progress=95, step="finalizing", message="Finalizing report")
+
+    def _stage(progress: int, step: str, message: str) -> None:
+        if progress_ctx:
+            progress_manager.update(job_id, progress=progress, step=step, message=message)
+        if on_event:
+            on_event("stage", {"progress": progress, "step": step, "message": message})
+
+    result_cache = get_result_cache()
+    cache_key = analysis_cache_key(files, context) if result_cache else None
+    cached = result_cache.get(cache_key) if cache_key else None
+    if cached:
+        logger.info("Returning cached analysis result (key=%s)", cache_key[:12])
+        result = json.loads(cached)
+        result["cache_hit"] = True
+        # run_id and timings describe the run that produced the cached result, not this one
+        result.pop("timings", None)
+        if "run_id" in result:
+            result["cached_run_id"] = result.pop("run_id")
+        if on_event:
+            _replay_cached(result, on_event)
+        _stage(95, "finalizing", "Reusing cached analysis for identical inputs")
+        return result
+
+    _stage(5, "reading_files", "Reading uploaded files")
+    _check_cancelled(cancel_event)
+    with timed_stage("preprocessing"):
+        file_summaries = preprocess_files(files, progress_ctx=progress_ctx, cancel_event=cancel_event)
+
+    _check_cancelled(cancel_event)
+    _stage(65, "building_prompt", "Preparing analysis prompt")
+    with timed_stage("prompt_build"):
+        prompt = build_prompt(file_summaries, _with_plan_context(file_summaries, context))
+    _stage(75, "ai_analysis", "Running AI analysis")
+    with timed_stage("final_analysis"):
+        if on_event:
+            ai_response = _stream_report(prompt, cancel_event, on_event)
+        else:
+            ai_response = ask_gpt(prompt, model=ANALYSIS_MODEL, temperature=0.35, cancel_event=cancel_event)
+    _stage(95, "finalizing", "Finalizing report")
     logger.info("AI analysis complete using model=%s", ANALYSIS_MODEL)
 
     # Parse expected sections from Markdown response
@@ -57,7 +238,12 @@ def analyze(files: List[Dict], context: Dict, job_id: Optional[str] = None) -> D
     if not summary:
         summary = ai_response
 
-    return {
+    cache_totals = {"hits": 0, "misses": 0}
+    for f in file_summaries:
+        for k in cache_totals:
+            cache_totals[k] += (f.get("cache") or {}).get(k, 0)
+
+    result = {
         "summary": summary.strip(),
         "insights": insights.strip(),
         "recommendations": recommendations.strip(),
@@ -73,8 +259,32 @@ def analyze(files: List[Dict], context: Dict, job_id: Optional[str] = None) -> D
                     "file_type": f.get("file_type"),
                     "chunks": f.get("chunks"),
                     "total_lines": f.get("total_lines"),
+                    "planned_tokens": f.get("planned_tokens", 0),
+                    "processor": f.get("processor", "llm_chunks"),
+                    "cache": f.get("cache"),
+                    "reused": f.get("reused", False),
+                    "degraded": f.get("degraded", False),
                 }
                 for f in file_summaries
-            ]
+            ],
+            "reused_files": [f.get("name") for f in file_summaries if f.get("reused")],
+            "cache": cache_totals,
         },
     }
+    # Locally computed metrics take precedence over numbers quoted in the report
+    metrics = merge_metrics(
+        [f["metrics"] for f in file_summaries if f.get("metrics")] + [metrics_from_markdown(ai_response)]
+    )
+    result["metrics"] = metrics
+    history = get_run_history() if metrics else None
+    if history is not None:
+        result["run_id"] = history.record_run(metrics, context=context)
+
+    # A retry of a partly failed run must reach the model again, not replay the broken report
+    degraded = [f.get("name") for f in file_summaries if f.get("degraded")]
+    if degraded:
+        logger.warning("Not caching analysis result, degraded file summaries: %s", degraded)
+    elif cache_key:
+        result_cache.set(cache_key, json.dumps(result))
+    result["cache_hit"] = False
+    return result
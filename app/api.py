@@ -1,20 +1,38 @@
+import asyncio
+import concurrent.futures
+import hashlib
 import json
 import logging
+import math
 import os
 import shutil
 import tempfile
 import threading
+import time
 import uuid
 import zipfile
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
+from app.ai_engine import AnalysisCancelled
 from app.analyzer import analyze
-from app.progress import progress_manager
-from app.ai_engine import ask_gpt, ANALYSIS_MODEL
+from app.bundles import ZipBombError, detect_file_type, expand_zip
+from app.progress import FINISHED_STATUSES, merge_events, progress_manager
+from app.run_history import (
+    REGRESSION_ERROR_RATE_PP,
+    REGRESSION_LATENCY_PCT,
+    REGRESSION_THROUGHPUT_PCT,
+    compare_metrics,
+    format_delta_table,
+    get_run_history,
+    metrics_from_markdown,
+)
+from app.scheduler import SchedulerOverloaded, analyze_scheduler, job_scheduler
+from app.telemetry import REGISTRY, timed_stage
+from app.ai_engine import ask_gpt_async, ANALYSIS_MODEL
 
 
 def setup_logging():
@@ -31,10 +49,192 @@ def setup_logging():
   )
 setup_logging()
 
+# Uploads are streamed to disk in fixed-size blocks; limits reject oversized input early
+UPLOAD_BLOCK_BYTES = int(os.getenv("UPLOAD_BLOCK_BYTES", str(1024 * 1024)))
+MAX_UPLOAD_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_BYTES", str(2 * 1024 ** 3)))
+MAX_UPLOAD_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", str(4 * 1024 ** 3)))
+# How often a waiting /analyze request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.getenv("ANALYZE_DISCONNECT_POLL_SECONDS", "1.0"))
+# Progress streams flush coalesced deltas at most this often
+PROGRESS_STREAM_INTERVAL = float(os.getenv("PROGRESS_STREAM_INTERVAL_SECONDS", "0.25"))
+PROGRESS_HEARTBEAT_SECONDS = 15.0
+
 app = FastAPI()
 
+
+class UploadLimitMiddleware:
+    """
+    Enforce MAX_UPLOAD_REQUEST_BYTES on /analyze uploads at the ASGI level: a
+    larger declared Content-Length is refused before the body is read, and the
+    bytes actually received are counted so chunked requests without a length
+    are cut off with 413 as soon as they cross the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith("/analyze"):
+            await self.app(scope, receive, send)
+            return
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > MAX_UPLOAD_REQUEST_BYTES:
+            logging.warning("Rejected upload of %s bytes (limit %s)", declared.decode(), MAX_UPLOAD_REQUEST_BYTES)
+            response = JSONResponse(
+                status_code=413,
+                content={"detail": f"Request exceeds upload limit of {MAX_UPLOAD_REQUEST_BYTES} bytes"},
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_UPLOAD_REQUEST_BYTES:
+                    logging.warning("Aborted upload after %s bytes (limit %s)", received, MAX_UPLOAD_REQUEST_BYTES)
+                    # Raised while the form is parsed, so the endpoint answers 413 instead of spooling the rest
+                    raise HTTPException(
+                        status_code=413, detail=f"Request exceeds upload limit of {MAX_UPLOAD_REQUEST_BYTES} bytes"
+                    )
+            return message
+
+        await self.app(scope, counting_receive, send)
+
+
+app.add_middleware(UploadLimitMiddleware)
+
+
+def _copy_upload(file: UploadFile, filepath: str, request_budget: int) -> Tuple[int, str]:
+    """Copy one spooled upload to filepath in UPLOAD_BLOCK_BYTES blocks; returns (size, sha256)."""
+    digest = hashlib.sha256()
+    size_bytes = 0
+    with open(filepath, "wb") as f:
+        while True:
+            block = file.file.read(UPLOAD_BLOCK_BYTES)
+            if not block:
+                break
+            size_bytes += len(block)
+            if size_bytes > MAX_UPLOAD_FILE_BYTES:
+                raise HTTPException(status_code=413, detail=f"File {file.filename} exceeds {MAX_UPLOAD_FILE_BYTES} bytes")
+            if size_bytes > request_budget:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_REQUEST_BYTES} bytes in total")
+            digest.update(block)
+            f.write(block)
+    return size_bytes, digest.hexdigest()
+
+
+async def _save_uploads(files: List[UploadFile], temp_dir: str) -> List[dict]:
+    """
+    Copy each (already spooled) upload to temp_dir in UPLOAD_BLOCK_BYTES blocks,
+    hashing on the fly in a worker thread. Raises 413 when a file or the saved total crosses its
+    limit; the raw request size is enforced while receiving by UploadLimitMiddleware.
+    """
+    with timed_stage("upload"):
+        saved_files = []
+        request_bytes = 0
+        for file in files:
+            if file.size is not None and file.size > MAX_UPLOAD_FILE_BYTES:
+                raise HTTPException(status_code=413, detail=f"File {file.filename} exceeds {MAX_UPLOAD_FILE_BYTES} bytes")
+            filename = f"{uuid.uuid4()}_{file.filename}"
+            filepath = os.path.join(temp_dir, filename)
+            Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+            # Disk writes and hashing of GB uploads run in a worker thread, not on the event loop
+            size_bytes, sha256 = await asyncio.to_thread(
+                _copy_upload, file, filepath, MAX_UPLOAD_REQUEST_BYTES - request_bytes
+            )
+            request_bytes += size_bytes
+            saved_files.append({
+                "file_id": str(uuid.uuid4()),
+                "name": file.filename,
+                "path": filepath,
+                "size_bytes": size_bytes,
+                "sha256": sha256,
+                "file_type": detect_file_type(file.filename),
+            })
+            logging.info(f"File saved: {filepath}")
+    return saved_files
+
+
+def _expand_bundles(saved_files: List[dict], temp_dir: str) -> List[dict]:
+    """
+    Replace uploaded zips with their analyzable members (extracted in parallel,
+    bomb-checked). A zip that is corrupt or holds nothing analyzable is a 400.
+    """
+    expanded: List[dict] = []
+    for f in saved_files:
+        if f["name"].lower().endswith(".zip"):
+            logging.info("Expanding zip %s", f["name"])
+            with timed_stage("bundle_expand"):
+                members = _expand_zip(f["path"], f["name"], temp_dir)
+            if not members:
+                raise HTTPException(status_code=400, detail=f"No analyzable files in bundle {f['name']}")
+            expanded.extend(members)
+            # The archive itself is no longer needed once its members are on disk
+            Path(f["path"]).unlink(missing_ok=True)
+        else:
+            expanded.append(f)
+    logging.info("Final file list for analysis: %s", [f.get("name") for f in expanded])
+    return expanded
+
+
+def _overloaded(exc: SchedulerOverloaded) -> HTTPException:
+    logging.warning("Rejected analysis job: %s", exc)
+    return HTTPException(
+        status_code=503,
+        detail=f"Analysis queue is full, retry later ({exc})",
+        headers={"Retry-After": str(max(math.ceil(exc.retry_after), 1))},
+    )
+
+
+async def _run_analysis(request: Request, saved_files: List[dict], context_data: Dict) -> Dict:
+    """
+    Run analyze() on analyze_scheduler's workers so the event loop stays free,
+    and cancel the remaining work if the client disconnects while waiting. The
+    pool is separate from job_scheduler, so queued progress jobs never make
+    /analyze return 503.
+    """
+    cancel_event = threading.Event()
+    outcome: concurrent.futures.Future = concurrent.futures.Future()
+    job_id = str(uuid.uuid4())
+
+    def _task():
+        if not outcome.set_running_or_notify_cancel():
+            return
+        try:
+            outcome.set_result(analyze(saved_files, context_data, cancel_event=cancel_event))
+        except BaseException as exc:
+            outcome.set_exception(exc)
+
+    try:
+        analyze_scheduler.submit(job_id, _task)
+    except SchedulerOverloaded as exc:
+        raise _overloaded(exc)
+
+    waiter = asyncio.wrap_future(outcome)
+    while True:
+        done, _ = await asyncio.wait({waiter}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return waiter.result()
+        if await request.is_disconnected():
+            logging.warning("Client disconnected; cancelling analysis")
+            cancel_event.set()
+            if analyze_scheduler.cancel(job_id):
+                outcome.cancel()
+            else:
+                # Let the worker wind down before the caller removes the uploaded files
+                await asyncio.wait({waiter})
+                if not waiter.cancelled():
+                    waiter.exception()
+            raise HTTPException(status_code=499, detail="Client disconnected")
+
+
 @app.post("/analyze")
 async def analyze_files(
+    request: Request,
     files: List[UploadFile] = File(...),
     context: str = Form(default="{}")
 ):
@@ -49,36 +249,11 @@ async def analyze_files(
     temp_dir = tempfile.mkdtemp()
     logging.info(f"Temporary directory created at: {temp_dir}")
     try:
-        # Save uploaded files to temporary directory
-        saved_files = []
-        for file in files:
-            filename = f"{uuid.uuid4()}_{file.filename}"
-            filepath = os.path.join(temp_dir, filename)
-            Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-            with open(filepath, "wb") as f:
-                f.write(await file.read())
-            size_bytes = os.path.getsize(filepath)
-            saved_files.append({
-                "file_id": str(uuid.uuid4()),
-                "name": file.filename,
-                "path": filepath,
-                "size_bytes": size_bytes,
-                "file_type": _detect_file_type(file.filename),
-            })
-            logging.info(f"File saved: {filepath}")
+        # Stream uploaded files to temporary directory
+        saved_files = await _save_uploads(files, temp_dir)
 
         # Expand zips into individual files for detailed processing and progress UI
-        expanded: List[dict] = []
-        for f in saved_files:
-            if f["name"].lower().endswith(".zip"):
-                logging.info("Expanding zip %s", f["name"])
-                expanded.extend(_expand_zip(f["path"], f["name"], temp_dir))
-            else:
-                expanded.append(f)
-        if expanded:
-            logging.info("Zip expansion produced %s files", len(expanded))
-        saved_files = expanded or saved_files
-        logging.info("Final file list for analysis: %s", [f.get("name") for f in saved_files])
+        saved_files = await asyncio.to_thread(_expand_bundles, saved_files, temp_dir)
 
         # Parse context JSON
         try:
@@ -90,10 +265,12 @@ async def analyze_files(
 
         # Call analyzer
         logging.info("Calling analyzer with saved files and context data")
-        result = analyze(saved_files, context_data)
+        result = await _run_analysis(request, saved_files, context_data)
         logging.info("Analysis completed successfully")
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
@@ -102,52 +279,114 @@ async def analyze_files(
         logging.info(f"Temporary directory removed: {temp_dir}")
 
 
+@app.post("/analyze/stream")
+async def analyze_files_stream(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    context: str = Form(default="{}")
+):
+    """
+    Same analysis as /analyze, delivered as server-sent events: `queued`, then
+    `stage` updates, the report as `token` deltas, each `section` as soon as it
+    is complete, and finally `result` (or `error`).
+    """
+    logging.info("Received request to /analyze/stream endpoint")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        saved_files = await _save_uploads(files, temp_dir)
+        saved_files = await asyncio.to_thread(_expand_bundles, saved_files, temp_dir)
+        try:
+            context_data = json.loads(context)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON in context")
+    except HTTPException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    except Exception as exc:
+        logging.exception("Failed to start streamed analysis")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise HTTPException(status_code=500, detail=f"Failed to start analysis: {exc}")
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancel_event = threading.Event()
+    job_id = str(uuid.uuid4())
+
+    def _emit(event: Optional[str], data: Optional[Dict]) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def _task():
+        try:
+            _emit("result", analyze(saved_files, context_data, cancel_event=cancel_event, on_event=_emit))
+        except AnalysisCancelled:
+            logging.info("Streamed analysis cancelled")
+        except Exception as exc:
+            logging.exception("Streamed analysis failed")
+            _emit("error", {"detail": f"Analysis failed: {exc}"})
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            _emit(None, None)
+
+    try:
+        queue_status = job_scheduler.submit(job_id, _task)
+    except SchedulerOverloaded as exc:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise _overloaded(exc)
+
+    async def _stream():
+        finished = False
+        try:
+            yield _sse("queued", queue_status)
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.get(), DISCONNECT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    finished = True
+                    return
+                yield _sse(event, data)
+        finally:
+            if not finished:
+                logging.warning("Stream client went away; cancelling analysis")
+                cancel_event.set()
+                if job_scheduler.cancel(job_id):
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/analyze/progress")
 async def analyze_files_with_progress(
     files: List[UploadFile] = File(...),
-    context: str = Form(default="{}")
+    context: str = Form(default="{}"),
+    priority: int = Form(default=0),
 ):
     logging.info("Received request to /analyze/progress endpoint")
     temp_dir = tempfile.mkdtemp()
     try:
-        saved_files = []
-        for file in files:
-            filename = f"{uuid.uuid4()}_{file.filename}"
-            filepath = os.path.join(temp_dir, filename)
-            Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-            with open(filepath, "wb") as f:
-                f.write(await file.read())
-            size_bytes = os.path.getsize(filepath)
-            saved_files.append({
-                "file_id": str(uuid.uuid4()),
-                "name": file.filename,
-                "path": filepath,
-                "size_bytes": size_bytes,
-                "file_type": _detect_file_type(file.filename),
-            })
+        saved_files = await _save_uploads(files, temp_dir)
 
         # Expand zips into individual files for detailed processing and progress UI
-        expanded: List[dict] = []
-        for f in saved_files:
-            if f["name"].lower().endswith(".zip"):
-                logging.info("Expanding zip %s", f["name"])
-                expanded.extend(_expand_zip(f["path"], f["name"], temp_dir))
-            else:
-                expanded.append(f)
-        if expanded:
-            logging.info("Zip expansion produced %s files", len(expanded))
-        saved_files = expanded or saved_files
-        logging.info("Final file list for analysis: %s", [f.get("name") for f in saved_files])
+        saved_files = await asyncio.to_thread(_expand_bundles, saved_files, temp_dir)
 
         try:
             context_data = json.loads(context)
         except json.JSONDecodeError:
             raise HTTPException(status_code=400, detail="Invalid JSON in context")
 
-        job_id = progress_manager.create_job(saved_files)
-        initial = progress_manager.get(job_id)
+        # The progress store may be SQLite (locks, fsync); its calls stay off the event loop
+        job_id = await asyncio.to_thread(progress_manager.create_job, saved_files)
 
         def _run():
+            progress_manager.start(job_id)
             try:
                 result = analyze(saved_files, context_data, job_id=job_id)
                 progress_manager.set_result(job_id, result)
@@ -157,8 +396,18 @@ async def analyze_files_with_progress(
             finally:
                 shutil.rmtree(temp_dir, ignore_errors=True)
 
-        threading.Thread(target=_run, daemon=True).start()
+        try:
+            queue_status = job_scheduler.submit(job_id, _run, priority=priority)
+        except SchedulerOverloaded as exc:
+            await asyncio.to_thread(progress_manager.discard, job_id)
+            raise _overloaded(exc)
+        initial = await asyncio.to_thread(progress_manager.get, job_id)
+        if initial and initial["status"] == "queued":
+            initial.update(queue_status)
         return {"job_id": job_id, "initial_progress": initial}
+    except HTTPException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
     except Exception as exc:
         logging.exception("Failed to start progress analysis")
         shutil.rmtree(temp_dir, ignore_errors=True)
@@ -167,95 +416,205 @@ async def analyze_files_with_progress(
 
 @app.get("/analyze/progress/{job_id}")
 async def get_progress(job_id: str):
-    job = progress_manager.get(job_id)
+    job = await asyncio.to_thread(progress_manager.get, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "queued":
+        job.update(job_scheduler.status(job_id))
     return job
 
 
-@app.post("/compare")
-async def compare_markdown(payload: dict):
+def _sse(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _poll_job(job_id: str, cursor: int) -> Tuple[Optional[str], Optional[Tuple[List[Dict], Optional[Dict]]]]:
+    # Read status before the events so a terminal status is never missed
+    return progress_manager.status(job_id), progress_manager.events_since(job_id, cursor)
+
+
+@app.get("/analyze/progress/{job_id}/events")
+async def stream_progress(job_id: str, request: Request, since: int = 0):
+    """
+    Server-sent events for a job: a `snapshot` first (or when the cursor is too
+    old), then `progress` deltas coalesced per interval, each with its sequence
+    number as the event id. Reconnects resume via Last-Event-ID or ?since=.
+    """
+    if await asyncio.to_thread(progress_manager.status, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    last_event_id = request.headers.get("last-event-id", "")
+    cursor = int(last_event_id) if last_event_id.isdigit() else since
+
+    async def _events():
+        nonlocal cursor
+        queue_status: Dict = {}
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            status, pending = await asyncio.to_thread(_poll_job, job_id, cursor)
+            if status is None or pending is None:
+                yield _sse("error", {"detail": "Job not found"})
+                return
+            events, snapshot = pending
+            if snapshot is not None:
+                cursor = snapshot["seq"]
+                yield _sse("snapshot", snapshot, cursor)
+                last_sent = time.monotonic()
+            elif events:
+                delta = merge_events(events)
+                cursor = delta["seq"]
+                yield _sse("progress", delta, cursor)
+                last_sent = time.monotonic()
+            if status in FINISHED_STATUSES:
+                return
+            if status == "queued":
+                current = job_scheduler.status(job_id)
+                if current and current.get("queue_position") != queue_status.get("queue_position"):
+                    queue_status = current
+                    yield _sse("queue", current)
+                    last_sent = time.monotonic()
+            if time.monotonic() - last_sent >= PROGRESS_HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(PROGRESS_STREAM_INTERVAL)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _parse_comparison(response_text: str) -> Dict:
+    # Try to parse JSON; if fails, wrap response
+    try:
+        parsed = json.loads(response_text)
+        return {
+            "ai_comparison_summary": parsed.get("ai_comparison_summary") or response_text,
+            "ai_key_differences": parsed.get("ai_key_differences") or [],
+            "ai_recommendations": parsed.get("ai_recommendations") or [],
+        }
+    except Exception:
+        return {
+            "ai_comparison_summary": response_text,
+            "ai_key_differences": [],
+            "ai_recommendations": [],
+        }
+
+
+def _load_comparison_metrics(payload: dict) -> Tuple[Dict, Dict[str, Dict]]:
+    """(baseline metrics, {run label: metrics}) from stored run ids or from two Markdown reports."""
+    baseline_run_id = payload.get("baseline_run_id")
+    if baseline_run_id:
+        run_ids = payload.get("run_ids") or []
+        if not run_ids:
+            raise HTTPException(status_code=400, detail="run_ids must list at least one run to compare")
+        history = get_run_history()
+        if history is None:
+            raise HTTPException(status_code=503, detail="Run history is disabled")
+        baseline = history.get_metrics(baseline_run_id)
+        candidates = {run_id: history.get_metrics(run_id) for run_id in run_ids}
+        missing = [rid for rid, metrics in [(baseline_run_id, baseline)] + list(candidates.items()) if metrics is None]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Unknown run ids: {', '.join(missing)}")
+        return baseline, candidates
+
     report_a_md = payload.get("report_a_markdown", "")
     report_b_md = payload.get("report_b_markdown", "")
-    context = payload.get("context", "")
     if not report_a_md or not report_b_md:
         raise HTTPException(status_code=400, detail="Missing markdown content")
+    return metrics_from_markdown(report_a_md), {"B": metrics_from_markdown(report_b_md)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint: stage latencies, model calls/tokens/429s, in-flight and queue depth."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/compare")
+async def compare_markdown(payload: dict):
+    """
+    Compare runs. Pass `baseline_run_id` and `run_ids` (from analysis results) to
+    compare stored runs, or `report_a_markdown`/`report_b_markdown`. Numeric
+    deltas and regression flags are computed locally; the model only sees the
+    compact delta table.
+    """
+    context = payload.get("context", "")
+    # Stored runs are read from SQLite; keep that off the event loop
+    baseline, candidates = await asyncio.to_thread(_load_comparison_metrics, payload)
+    run_ids = list(candidates)
+    rows = compare_metrics(baseline, candidates)
+    regressions = [
+        {"run_id": run_id, "transaction": row["transaction"], "metric": row["metric"], "baseline": row["baseline"], **run}
+        for row in rows
+        for run_id, run in row["runs"].items()
+        if run["regression"]
+    ]
 
     system_prompt = (
         "You are a senior performance engineer. Compare two performance test result reports written in Markdown. "
         "Find differences, improvements, regressions, bottlenecks, architecture clues, error patterns, stability patterns, "
         "and any significant contrast between the two. Produce a concise summary, list of key differences, and recommendations."
     )
-    user_prompt = (
-        f"Context: {context}\n\n"
-        "Report A (baseline):\n"
-        "--------------------\n"
-        f"{report_a_md}\n\n"
-        "Report B (new):\n"
-        "--------------------\n"
-        f"{report_b_md}\n\n"
-        "Respond in JSON with keys: ai_comparison_summary (string), ai_key_differences (array of strings), ai_recommendations (array of strings)."
+    response_format = (
+        "Respond in JSON with keys: ai_comparison_summary (string), ai_key_differences (array of strings), "
+        "ai_recommendations (array of strings)."
     )
+    if rows:
+        runs_legend = "\n".join(f"- Run {n + 1}: {run_id}" for n, run_id in enumerate(run_ids))
+        user_prompt = (
+            "You are a senior performance engineer comparing load-test runs against a baseline. "
+            "Deltas below were computed exactly; do not recompute them. Rows marked ! exceed regression thresholds "
+            f"(latency +{REGRESSION_LATENCY_PCT:g}%, throughput -{REGRESSION_THROUGHPUT_PCT:g}%, "
+            f"error rate +{REGRESSION_ERROR_RATE_PP:g}pp). Explain what changed, likely causes and what to do.\n\n"
+            f"Context: {context}\n\nRuns:\n{runs_legend}\n\n"
+            f"{format_delta_table(rows, run_ids)}\n\n{response_format}"
+        )
+    elif payload.get("report_a_markdown"):
+        # No comparable numbers in either report: fall back to comparing the text
+        user_prompt = (
+            f"{system_prompt}\n\n"
+            f"Context: {context}\n\n"
+            "Report A (baseline):\n"
+            "--------------------\n"
+            f"{payload['report_a_markdown']}\n\n"
+            "Report B (new):\n"
+            "--------------------\n"
+            f"{payload['report_b_markdown']}\n\n"
+            f"{response_format}"
+        )
+    else:
+        raise HTTPException(status_code=422, detail="The selected runs share no comparable metrics")
 
     try:
-        response_text = ask_gpt(
-            f"{system_prompt}\n\n{user_prompt}",
-            model=ANALYSIS_MODEL,
-            temperature=0.1,
-        )
-        # Try to parse JSON; if fails, wrap response
-        try:
-            parsed = json.loads(response_text)
-            return {
-                "ai_comparison_summary": parsed.get("ai_comparison_summary") or response_text,
-                "ai_key_differences": parsed.get("ai_key_differences") or [],
-                "ai_recommendations": parsed.get("ai_recommendations") or [],
-            }
-        except Exception:
-            return {
-                "ai_comparison_summary": response_text,
-                "ai_key_differences": [],
-                "ai_recommendations": [],
-            }
+        response_text = await ask_gpt_async(user_prompt, model=ANALYSIS_MODEL, temperature=0.1)
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"AI comparison failed: {exc}")
-def _detect_file_type(name: str) -> str:
-    lower = name.lower()
-    if lower.endswith(".log"):
-        return "log"
-    if lower.endswith(".csv"):
-        return "csv"
-    if lower.endswith(".jmx"):
-        return "jmx"
-    if lower.endswith(".json"):
-        return "json"
-    if lower.endswith(".md") or lower.endswith(".markdown"):
-        return "markdown"
-    if lower.endswith(".txt"):
-        return "text"
-    return "unknown"
+    return dict(
+        _parse_comparison(response_text),
+        metric_deltas=rows,
+        regressions=regressions,
+        compared_runs=run_ids,
+    )
+
+
+@app.get("/runs")
+async def list_runs(limit: int = 50):
+    history = get_run_history()
+    if history is None:
+        raise HTTPException(status_code=503, detail="Run history is disabled")
+    return {"runs": await asyncio.to_thread(history.list_runs, limit)}
+
 
 def _expand_zip(file_path: str, original_name: str, temp_dir: str) -> List[dict]:
-    extracted = []
     try:
-        with zipfile.ZipFile(file_path, "r") as zf:
-            for member in zf.infolist():
-                if member.is_dir():
-                    continue
-                dest_path = os.path.join(temp_dir, member.filename)
-                Path(dest_path).parent.mkdir(parents=True, exist_ok=True)
-                with zf.open(member) as src, open(dest_path, "wb") as dst:
-                    dst.write(src.read())
-                size_bytes = os.path.getsize(dest_path)
-                extracted.append({
-                    "file_id": str(uuid.uuid4()),
-                    "name": member.filename,
-                    "path": dest_path,
-                    "size_bytes": size_bytes,
-                    "file_type": _detect_file_type(member.filename),
-                    "source_zip": original_name,
-                    "message": f"Extracted from {original_name}",
-                })
-    except Exception as exc:
+        return expand_zip(file_path, original_name, temp_dir)
+    except ZipBombError as exc:
+        logging.warning("Rejected zip %s: %s", original_name, exc)
+        raise HTTPException(status_code=413, detail=f"Rejected zip {original_name}: {exc}")
+    except (zipfile.BadZipFile, OSError) as exc:
         logging.warning("Failed to expand zip %s: %s", original_name, exc)
-    return extracted
+        return []
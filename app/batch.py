@@ -0,0 +1,244 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from app.ai_engine import AnalysisCancelled
+from app.analyzer import analyze
+from app.bundles import detect_file_type, expand_zip, is_analyzable
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+Analyzer = Callable[..., Dict]
+
+
+def discover_bundles(source: str) -> List[Path]:
+    """
+    Bundles under a directory or matching a glob: every zip, every
+    subdirectory and every loose analyzable file is one bundle.
+    """
+    root = Path(source)
+    if root.is_dir():
+        candidates: Iterable[Path] = root.iterdir()
+    else:
+        candidates = (Path(p) for p in glob.glob(source, recursive=True))
+    bundles = []
+    for path in candidates:
+        if path.name.startswith("."):
+            continue
+        if path.is_dir() or path.suffix.lower() == ".zip" or (path.is_file() and is_analyzable(path.name)):
+            bundles.append(path.resolve())
+    return sorted(set(bundles))
+
+
+def _describe(path: Path, name: str) -> Dict:
+    return {
+        "name": name,
+        "path": str(path),
+        "size_bytes": path.stat().st_size,
+        "file_type": detect_file_type(name),
+    }
+
+
+def bundle_files(bundle: Path, work_dir: str) -> List[Dict]:
+    """Files to analyze for one bundle; zips are expanded into work_dir."""
+    if bundle.is_dir():
+        return [
+            _describe(path, str(path.relative_to(bundle)))
+            for path in sorted(bundle.rglob("*"))
+            if path.is_file() and is_analyzable(path.name)
+        ]
+    if bundle.suffix.lower() == ".zip":
+        return expand_zip(str(bundle), bundle.name, work_dir)
+    return [_describe(bundle, bundle.name)]
+
+
+def _bundle_bytes(bundle: Path) -> int:
+    if bundle.is_dir():
+        return sum(p.stat().st_size for p in bundle.rglob("*") if p.is_file())
+    return bundle.stat().st_size
+
+
+def load_completed(output_path: Path) -> Set[str]:
+    """Bundles already analyzed successfully in a previous (possibly interrupted) run."""
+    done: Set[str] = set()
+    if not output_path.exists():
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interruption; that bundle simply runs again
+                continue
+            if record.get("status") == "ok":
+                done.add(record["bundle"])
+    return done
+
+
+class JsonlWriter:
+    """Appends one record per line, flushed and fsynced so a crash loses at most the line in flight."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        needs_newline = False
+        if path.exists() and path.stat().st_size > 0:
+            # A crash mid-write leaves a partial last line; only its final byte needs checking
+            with open(path, "rb") as fh:
+                fh.seek(-1, os.SEEK_END)
+                needs_newline = fh.read(1) != b"\n"
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        if needs_newline:
+            self._file.write("\n")
+
+    def write(self, record: Dict) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _analyze_bundle(bundle: Path, context: Dict, analyze_fn: Analyzer, cancel_event: threading.Event) -> Dict:
+    started = time.time()
+    record: Dict = {"bundle": str(bundle), "input_bytes": 0}
+    # Every bundle gets its own scratch dir so parallel workers never share extracted files
+    work_dir = tempfile.mkdtemp(prefix="bundle-")
+    try:
+        # A bundle removed since discovery fails on its own instead of aborting the batch
+        record["input_bytes"] = _bundle_bytes(bundle)
+        files = bundle_files(bundle, work_dir)
+        if not files:
+            raise ValueError("no analyzable files found")
+        record["files"] = len(files)
+        record["result"] = analyze_fn(files, context, cancel_event=cancel_event)
+        record["status"] = "ok"
+    except AnalysisCancelled:
+        record["status"] = "cancelled"
+    except Exception as exc:
+        logger.exception("Batch analysis failed for %s", bundle)
+        record["status"] = "failed"
+        record["error"] = str(exc)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    record["elapsed_seconds"] = round(time.time() - started, 3)
+    record["finished_at"] = time.time()
+    return record
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)] if ordered else 0.0
+
+
+def summarize_batch(records: List[Dict], skipped: int, wall_seconds: float) -> Dict:
+    ok = [r for r in records if r["status"] == "ok"]
+    latencies = [r["elapsed_seconds"] for r in ok]
+    input_mb = sum(r.get("input_bytes", 0) for r in ok) / (1024 * 1024)
+    return {
+        "bundles_ok": len(ok),
+        "bundles_failed": sum(1 for r in records if r["status"] == "failed"),
+        "bundles_cancelled": sum(1 for r in records if r["status"] == "cancelled"),
+        "bundles_skipped": skipped,
+        "result_cache_hits": sum(1 for r in ok if (r.get("result") or {}).get("cache_hit")),
+        "wall_seconds": round(wall_seconds, 2),
+        "input_mb": round(input_mb, 2),
+        "bundles_per_minute": round(len(ok) / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        "mb_per_second": round(input_mb / wall_seconds, 3) if wall_seconds else 0.0,
+        "bundle_seconds_p50": round(_percentile(latencies, 0.5), 2),
+        "bundle_seconds_max": round(max(latencies, default=0.0), 2),
+    }
+
+
+def run_batch(
+    source: str,
+    output_path: str,
+    context: Dict,
+    *,
+    workers: int = BATCH_WORKERS,
+    resume: bool = True,
+    analyze_fn: Optional[Analyzer] = None,
+    on_record: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Analyze every bundle found at `source` with `workers` bundles in flight,
+    appending one JSON line per finished bundle to `output_path`.
+
+    All workers run in this process, so their model calls share the LLM
+    runtime's global concurrency and rate limits. With `resume`, bundles that
+    already have an "ok" line in the output are skipped. Ctrl-C cancels the
+    bundles in flight and returns the summary of what finished.
+    """
+    analyze_fn = analyze_fn or analyze
+    output = Path(output_path)
+    if not resume and output.exists():
+        output.unlink()
+    completed = load_completed(output) if resume else set()
+    # The results file may live next to the bundles; it is never one of them
+    bundles = [b for b in discover_bundles(source) if b != output.resolve()]
+    pending = [b for b in bundles if str(b) not in completed]
+    skipped = len(bundles) - len(pending)
+    logger.info("Batch: %s bundles found, %s already done, %s to analyze", len(bundles), skipped, len(pending))
+
+    cancel_event = threading.Event()
+    writer = JsonlWriter(output)
+    records: List[Dict] = []
+    started = time.time()
+    queue = iter(pending)
+    executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="batch")
+    in_flight: Dict = {}
+    try:
+        # Submit lazily so an interruption leaves unstarted bundles untouched for the next run
+        for bundle in queue:
+            in_flight[executor.submit(_analyze_bundle, bundle, context, analyze_fn, cancel_event)] = bundle
+            if len(in_flight) >= max(workers, 1):
+                break
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.pop(future)
+                record = future.result()
+                records.append(record)
+                if record["status"] != "cancelled":
+                    writer.write(record)
+                if on_record:
+                    on_record(record)
+                bundle = next(queue, None)
+                if bundle is not None and not cancel_event.is_set():
+                    in_flight[executor.submit(_analyze_bundle, bundle, context, analyze_fn, cancel_event)] = bundle
+    except KeyboardInterrupt:
+        logger.warning("Batch interrupted; cancelling %s bundles in flight", len(in_flight))
+        cancel_event.set()
+        for future in in_flight:
+            record = future.result()
+            records.append(record)
+            if record["status"] != "cancelled":
+                writer.write(record)
+    finally:
+        executor.shutdown(wait=True)
+        writer.close()
+    return summarize_batch(records, skipped, time.time() - started)
+
+
+def format_summary(summary: Dict) -> str:
+    return (
+        f"Bundles: {summary['bundles_ok']} ok, {summary['bundles_failed']} failed, "
+        f"{summary['bundles_cancelled']} cancelled, {summary['bundles_skipped']} skipped (already done)\n"
+        f"Wall time: {summary['wall_seconds']}s | Input: {summary['input_mb']} MB | "
+        f"Result cache hits: {summary['result_cache_hits']}\n"
+        f"Throughput: {summary['bundles_per_minute']} bundles/min, {summary['mb_per_second']} MB/s | "
+        f"Per bundle: p50 {summary['bundle_seconds_p50']}s, max {summary['bundle_seconds_max']}s"
+    )
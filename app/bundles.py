@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import os
+import re
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Binary, archive and media members are skipped by name before anything is decompressed;
+# every other member is analyzed, unrecognized types through the plain-text path
+SKIPPED_EXTENSIONS = {
+    ".7z", ".bin", ".bmp", ".bz2", ".class", ".db", ".dll", ".dylib", ".exe", ".gif", ".gz", ".hprof", ".ico",
+    ".jar", ".jfr", ".jpeg", ".jpg", ".mov", ".mp4", ".pdf", ".png", ".pyc", ".rar", ".so", ".sqlite", ".tar",
+    ".tgz", ".ttf", ".war", ".woff", ".woff2", ".xz", ".zip",
+}
+# Rotated logs: gc.log.1, app.log.2024-01-01, gc.log.0.current
+_ROTATED_LOG = re.compile(r"\.log(?:\.\d+|[._-]\d{4}-?\d{2}-?\d{2}(?:[._-]\d+)?)(?:\.current)?$")
+
+ZIP_BLOCK_BYTES = int(os.getenv("ZIP_BLOCK_BYTES", str(1024 * 1024)))
+ZIP_EXTRACT_WORKERS = int(os.getenv("ZIP_EXTRACT_WORKERS", "4"))
+ZIP_MAX_MEMBERS = int(os.getenv("ZIP_MAX_MEMBERS", "10000"))
+ZIP_MAX_MEMBER_BYTES = int(os.getenv("ZIP_MAX_MEMBER_BYTES", str(4 * 1024 ** 3)))
+ZIP_MAX_TOTAL_BYTES = int(os.getenv("ZIP_MAX_TOTAL_BYTES", str(8 * 1024 ** 3)))
+ZIP_MAX_RATIO = float(os.getenv("ZIP_MAX_RATIO", "200"))
+
+
+class ZipBombError(ValueError):
+    """Raised when a bundle exceeds decompression limits (size, ratio or member count)."""
+
+
+def _extension(name: str) -> str:
+    lowered = PurePosixPath(name.replace("\\", "/").lower()).name
+    if _ROTATED_LOG.search(lowered):
+        return ".log"
+    return PurePosixPath(lowered).suffix
+
+
+def detect_file_type(name: str) -> str:
+    ext = _extension(name)
+    if ext == ".log":
+        return "log"
+    if ext in {".csv", ".jtl"}:
+        return "csv"
+    if ext == ".jmx":
+        return "jmx"
+    if ext == ".json":
+        return "json"
+    if ext in {".md", ".markdown"}:
+        return "markdown"
+    if ext == ".txt":
+        return "text"
+    return "unknown"
+
+
+def is_analyzable(name: str) -> bool:
+    """False for known binary/unsupported types and OS metadata (.DS_Store, __MACOSX/)."""
+    path = PurePosixPath(name.replace("\\", "/"))
+    if path.name.startswith(".") or "__MACOSX" in path.parts:
+        return False
+    return _extension(name) not in SKIPPED_EXTENSIONS
+
+
+def _safe_relative_path(member_name: str) -> Optional[PurePosixPath]:
+    """Return the member path if it stays inside the extraction dir (no zip-slip)."""
+    path = PurePosixPath(member_name.replace("\\", "/"))
+    if path.is_absolute() or ".." in path.parts:
+        return None
+    return path
+
+
+def _check_declared_sizes(members: List[zipfile.ZipInfo], original_name: str) -> None:
+    if len(members) > ZIP_MAX_MEMBERS:
+        raise ZipBombError(f"{original_name}: {len(members)} members exceeds limit of {ZIP_MAX_MEMBERS}")
+    total = 0
+    for member in members:
+        if member.file_size > ZIP_MAX_MEMBER_BYTES:
+            raise ZipBombError(f"{original_name}: member {member.filename} is {member.file_size} bytes uncompressed")
+        if member.compress_size and member.file_size / member.compress_size > ZIP_MAX_RATIO:
+            raise ZipBombError(f"{original_name}: member {member.filename} compression ratio exceeds {ZIP_MAX_RATIO}")
+        total += member.file_size
+    if total > ZIP_MAX_TOTAL_BYTES:
+        raise ZipBombError(f"{original_name}: {total} bytes uncompressed exceeds limit of {ZIP_MAX_TOTAL_BYTES}")
+
+
+def _extract_member(zip_path: str, member: zipfile.ZipInfo, dest_path: Path) -> Dict:
+    """Stream one member to disk in blocks, enforcing real (not declared) sizes."""
+    digest = hashlib.sha256()
+    written = 0
+    # A separate handle per worker so members decompress in parallel
+    with zipfile.ZipFile(zip_path, "r") as zf, zf.open(member) as src, open(dest_path, "wb") as dst:
+        while True:
+            block = src.read(ZIP_BLOCK_BYTES)
+            if not block:
+                break
+            written += len(block)
+            if written > member.file_size or written > ZIP_MAX_MEMBER_BYTES:
+                raise ZipBombError(f"member {member.filename} inflates past its declared size")
+            digest.update(block)
+            dst.write(block)
+    return {"size_bytes": written, "sha256": digest.hexdigest()}
+
+
+def expand_zip(file_path: str, original_name: str, dest_dir: str) -> List[Dict]:
+    """
+    Extract the analyzable members of a zip bundle into a fresh folder under dest_dir.
+
+    Binary members are filtered out by name before anything is decompressed, checked
+    against member-count, size and compression-ratio limits, then streamed to
+    disk in parallel in fixed-size blocks while their sha256 is computed.
+    Raises ZipBombError when limits are exceeded and zipfile.BadZipFile for
+    corrupt archives.
+    """
+    root = Path(dest_dir) / f"zip-{uuid.uuid4().hex[:8]}"
+    with zipfile.ZipFile(file_path, "r") as zf:
+        candidates = []
+        skipped = 0
+        for member in zf.infolist():
+            if member.is_dir():
+                continue
+            rel_path = _safe_relative_path(member.filename)
+            if rel_path is None or not is_analyzable(member.filename):
+                skipped += 1
+                continue
+            candidates.append((member, rel_path))
+    if skipped:
+        logger.info("Skipped %s non-analyzable or unsafe members in %s", skipped, original_name)
+    _check_declared_sizes([m for m, _ in candidates], original_name)
+
+    targets = []
+    for member, rel_path in candidates:
+        dest_path = root.joinpath(*rel_path.parts)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        targets.append((member, dest_path))
+
+    with ThreadPoolExecutor(max_workers=max(ZIP_EXTRACT_WORKERS, 1)) as executor:
+        futures = [executor.submit(_extract_member, file_path, member, dest_path) for member, dest_path in targets]
+        results = [future.result() for future in futures]
+
+    extracted = []
+    for (member, dest_path), result in zip(targets, results):
+        extracted.append({
+            "file_id": str(uuid.uuid4()),
+            "name": member.filename,
+            "path": str(dest_path),
+            "size_bytes": result["size_bytes"],
+            "sha256": result["sha256"],
+            "file_type": detect_file_type(member.filename),
+            "source_zip": original_name,
+            "message": f"Extracted from {original_name}",
+        })
+    return extracted
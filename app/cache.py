@@ -0,0 +1,247 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / ".cache"
+
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() == "true"
+SUMMARY_CACHE_DIR = Path(os.getenv("SUMMARY_CACHE_DIR", str(DEFAULT_CACHE_DIR))).expanduser()
+SUMMARY_CACHE_MEMORY_ENTRIES = int(os.getenv("SUMMARY_CACHE_MEMORY_ENTRIES", "2048"))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+SUMMARY_CACHE_TTL_SECONDS = float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", str(DEFAULT_CACHE_DIR))).expanduser()
+RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "64"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def make_cache_key(*parts: object) -> str:
+    """Return a stable sha256 hex digest over the given key parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8", errors="ignore")
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") never collide
+        digest.update(str(len(data)).encode("ascii") + b":")
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def file_sha256(path: Path) -> str:
+    """sha256 of a file's content, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for a single run."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """
+    Two-tier string cache: a bounded in-memory LRU in front of a SQLite file.
+
+    - Memory tier keeps the most recently used `max_memory_entries` values.
+    - Disk tier survives restarts and is shared by processes using the same path.
+    - Entries older than `ttl_seconds` are treated as misses and purged.
+    - When the disk tier exceeds `max_disk_bytes`, least recently used rows are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        *,
+        max_memory_entries: int = 1024,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 7 * 24 * 3600,
+    ):
+        self.path = Path(path) if path else None
+        self.max_memory_entries = max(max_memory_entries, 0)
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        if self.path:
+            try:
+                self._open_disk()
+            except Exception as exc:
+                logger.warning("Disk cache unavailable at %s, using memory only: %s", self.path, exc)
+                self._conn = None
+
+    def _open_disk(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+        conn.commit()
+        self._conn = conn
+        self._disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        if not self.max_memory_entries:
+            return
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT value, created_at, size FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, created_at, size = row
+                if self._expired(created_at, now):
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self._disk_bytes -= size
+                    return None
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            except sqlite3.Error as exc:
+                logger.warning("Disk cache read failed: %s", exc)
+                return None
+            self._remember(key, value, created_at)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8", errors="ignore"))
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is None:
+                return
+            try:
+                old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                self._disk_bytes += size - (old[0] if old else 0)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict(now)
+                self._conn.commit()
+            except sqlite3.Error as exc:
+                logger.warning("Disk cache write failed: %s", exc)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired rows, then least recently used rows until under the size cap (lock held)."""
+        if self.ttl_seconds > 0:
+            self._conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,))
+        # Recompute from disk: other processes may share the same file
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        target = int(self.max_disk_bytes * 0.9)
+        cursor = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC")
+        doomed = []
+        for key, size in cursor:
+            if self._disk_bytes <= target:
+                break
+            doomed.append((key,))
+            self._disk_bytes -= size
+        if doomed:
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            logger.info("Evicted %s entries from disk cache %s", len(doomed), self.path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM entries")
+                self._conn.commit()
+                self._disk_bytes = 0
+
+
+_summary_cache: Optional[TieredCache] = None
+_summary_cache_lock = threading.Lock()
+_result_cache: Optional[TieredCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> Optional[TieredCache]:
+    """Return the process-wide cache for chunk/meta summaries, or None when disabled."""
+    global _summary_cache
+    if not SUMMARY_CACHE_ENABLED:
+        return None
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = TieredCache(
+                SUMMARY_CACHE_DIR / "summaries.sqlite3",
+                max_memory_entries=SUMMARY_CACHE_MEMORY_ENTRIES,
+                max_disk_bytes=SUMMARY_CACHE_MAX_BYTES,
+                ttl_seconds=SUMMARY_CACHE_TTL_SECONDS,
+            )
+        return _summary_cache
+
+
+def get_result_cache() -> Optional[TieredCache]:
+    """Return the process-wide cache of complete analysis results, or None when disabled."""
+    global _result_cache
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = TieredCache(
+                RESULT_CACHE_DIR / "results.sqlite3",
+                max_memory_entries=RESULT_CACHE_MEMORY_ENTRIES,
+                max_disk_bytes=RESULT_CACHE_MAX_BYTES,
+                ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+            )
+        return _result_cache
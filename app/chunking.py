@@ -0,0 +1,162 @@
+import logging
+import mmap
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+READ_BUFFER_BYTES = 1024 * 1024
+# Characters per estimated token above which a single oversized record is cut off
+MAX_CHARS_PER_TOKEN = 8
+
+# Lines that continue the previous log record (stack frames, wrapped messages)
+_LOG_CONTINUATION = re.compile(rb"^(?:[ \t]|at |Caused by:|\.\.\. \d+ more)")
+
+
+class ChunkPlan(NamedTuple):
+    """
+    Where each chunk of a file starts and ends (byte spans) and its estimated tokens.
+    Holds no file content. For CSV files `header` is the span of the header row,
+    which is repeated at the top of every chunk and counted in its tokens.
+    """
+
+    spans: List[Tuple[int, int]]
+    tokens: List[int]
+    total_lines: int
+    header: Optional[Tuple[int, int]] = None
+
+    @property
+    def planned_tokens(self) -> int:
+        return sum(self.tokens)
+
+
+class _RecordStarts:
+    """Decides whether a line may start a chunk without splitting a record."""
+
+    def __init__(self, file_type: str):
+        self.file_type = file_type
+        self.depth = 0
+
+    def __call__(self, line: bytes) -> bool:
+        if self.file_type in {"log", "text"}:
+            return not _LOG_CONTINUATION.match(line)
+        if self.file_type == "json":
+            # Cut only between members of the top-level container (or between NDJSON lines).
+            # Brackets inside strings are rare enough in load-test output to ignore.
+            starts = self.depth <= 1
+            self.depth += line.count(b"{") + line.count(b"[") - line.count(b"}") - line.count(b"]")
+            self.depth = max(self.depth, 0)
+            return starts
+        return True
+
+
+def _pack(
+    records: Iterable[Tuple[int, int, bool]], budget: int, reserved: int = 0
+) -> Iterator[Tuple[int, Optional[int], int]]:
+    """
+    Greedily pack (position, tokens, starts_record) lines into chunks of at most
+    `budget` tokens (including `reserved` tokens repeated per chunk).
+    Chunks are cut at the last record start that fits; a record larger than the
+    budget on its own is split at line level. Yields (start, end, tokens) with
+    end=None for the final chunk, which runs to the end of the input.
+    """
+    limit = max(budget - reserved, 1)
+    chunk_start: Optional[int] = None
+    chunk_tokens = 0
+    boundary: Optional[int] = None
+    since_boundary = 0
+
+    for pos, tokens, starts in records:
+        if chunk_start is None:
+            chunk_start, chunk_tokens, boundary, since_boundary = pos, 0, None, 0
+        if starts and pos != chunk_start:
+            boundary, since_boundary = pos, 0
+        if chunk_tokens + tokens > limit and pos != chunk_start:
+            if boundary is not None and boundary != pos:
+                # Close at the last record start; the partial record opens the next chunk
+                yield chunk_start, boundary, chunk_tokens - since_boundary + reserved
+                chunk_start, chunk_tokens, boundary = boundary, since_boundary, None
+            if chunk_tokens + tokens > limit and pos != chunk_start:
+                yield chunk_start, pos, chunk_tokens + reserved
+                chunk_start, chunk_tokens, boundary = pos, 0, None
+        chunk_tokens += tokens
+        since_boundary += tokens
+
+    if chunk_start is not None:
+        yield chunk_start, None, chunk_tokens + reserved
+
+
+def plan_file_chunks(path: Path, file_type: str, budget: int) -> Optional[ChunkPlan]:
+    """
+    Stream the file once in binary mode and plan token-budgeted chunk spans.
+    Returns None if the file can't be read.
+    """
+    newlines = 0
+    pos = 0
+    header: Optional[Tuple[int, int]] = None
+    header_tokens = 0
+    record_starts = _RecordStarts(file_type)
+
+    try:
+        with open(path, "rb", buffering=READ_BUFFER_BYTES) as fh:
+            if file_type == "csv":
+                first = fh.readline()
+                if first:
+                    header = (0, len(first))
+                    header_tokens = estimate_tokens(first) + 1
+                    pos = len(first)
+                    newlines += first.endswith(b"\n")
+
+            def _records() -> Iterator[Tuple[int, int, bool]]:
+                nonlocal pos, newlines
+                for raw in fh:
+                    start = pos
+                    pos += len(raw)
+                    if raw.endswith(b"\n"):
+                        newlines += 1
+                    line = raw.rstrip(b"\r\n")
+                    yield start, estimate_tokens(line) + 1, record_starts(line)
+
+            spans: List[Tuple[int, int]] = []
+            tokens: List[int] = []
+            for start, end, chunk_tokens in _pack(_records(), budget, header_tokens):
+                spans.append((start, pos if end is None else end))
+                tokens.append(chunk_tokens)
+    except OSError as exc:
+        logger.warning("Failed to read file %s: %s", path, exc)
+        return None
+
+    if not spans and header:
+        # Header-only CSV: the header itself is the content
+        spans, tokens, header = [header], [header_tokens], None
+    return ChunkPlan(spans=spans, tokens=tokens, total_lines=newlines + 1, header=header)
+
+
+def iter_file_chunks(path: Path, plan: ChunkPlan) -> Iterator[str]:
+    """Yield decoded chunk texts lazily from a memory map of the file."""
+    if not plan.spans:
+        return
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header = mm[plan.header[0]:plan.header[1]] if plan.header else b""
+        for begin, end in plan.spans:
+            text = (header + mm[begin:end]).decode("utf-8", errors="ignore").replace("\r\n", "\n")
+            yield text[:-1] if text.endswith("\n") else text
+
+
+def plan_text_chunks(text: str, file_type: str, budget: int) -> List[str]:
+    """Chunk an in-memory string with the same token budget and record boundaries."""
+    lines = text.splitlines()
+    record_starts = _RecordStarts(file_type)
+    records = (
+        (idx, estimate_tokens(line) + 1, record_starts(line.encode("utf-8", errors="ignore")))
+        for idx, line in enumerate(lines)
+    )
+    return ["\n".join(lines[start:end]) for start, end, _ in _pack(records, budget)]
+
+
+def truncate_to_budget(text: str, budget: int) -> str:
+    """Hard cap for single records too large for any chunk (e.g. one giant JSON line)."""
+    return text[: budget * MAX_CHARS_PER_TOKEN]
@@ -1,85 +1,234 @@
+import asyncio
+import json
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Optional
 
-from app.ai_engine import SUMMARY_MODEL, ask_gpt
+from app import bundles
+from app.ai_engine import SUMMARY_MODEL, ask_gpt_async, llm_runtime
+from app.cache import CacheStats, file_sha256, get_summary_cache, make_cache_key
+from app.chunking import READ_BUFFER_BYTES, iter_file_chunks, plan_file_chunks, plan_text_chunks, truncate_to_budget
+from app.processors.csv_parser import aggregate_jtl_csv, format_jtl_stats, is_jtl_csv
+from app.processors.jmx_parser import JMX_MAX_SAMPLERS_LISTED, jmx_test_context, parse_jmx
+from app.processors.json_parser import count_lines, format_summary_table, parse_summary_json
+from app.processors.log_signals import extract_log_signals, format_log_signals, format_windows
+from app.processors.log_templates import DrainMiner, format_template_table
+from app.processors.timeseries import TIMESERIES_POINTS, format_timeseries, reduce_timeseries_csv
 from app.progress import progress_manager
+from app.run_history import metrics_from_jtl_stats
+from app.telemetry import timed_stage
+from app.tokens import chunk_token_budget, estimate_tokens, estimate_tokens_from_size
 
 logger = logging.getLogger(__name__)
 
-# Chunking thresholds to stay well under model context limits
-MAX_LINES_PER_CHUNK = int(os.getenv("PREPROCESS_MAX_LINES_PER_CHUNK", "400"))
-MAX_CHARS_PER_CHUNK = int(os.getenv("PREPROCESS_MAX_CHARS_PER_CHUNK", "6000"))
+# Content tokens per summarization chunk, sized for SUMMARY_MODEL's budget and window
+SUMMARY_CHUNK_TOKENS = chunk_token_budget(SUMMARY_MODEL)
+# Files whose local work (reading, planning, aggregation) runs concurrently per job.
+# LLM concurrency is capped process-wide by LLM_MAX_CONCURRENCY in app.ai_engine.
 MAX_FILE_WORKERS = int(os.getenv("PREPROCESS_MAX_WORKERS", "4"))
-MAX_CHUNK_WORKERS = int(os.getenv("PREPROCESS_MAX_CHUNK_WORKERS", str(MAX_FILE_WORKERS)))
+# Chunks materialized ahead of the summarizer; bounds per-file memory to a few chunks
+MAX_CHUNKS_IN_FLIGHT = int(os.getenv("PREPROCESS_MAX_CHUNKS_IN_FLIGHT", "8"))
+# Drain-style template mining for log/text files before summarization
+LOG_COMPACTION_ENABLED = os.getenv("PREPROCESS_LOG_COMPACTION", "true").lower() == "true"
+LOG_COMPACTION_MIN_RATIO = float(os.getenv("PREPROCESS_LOG_COMPACTION_MIN_RATIO", "3"))
+LOG_TEMPLATE_MAX_ROWS = int(os.getenv("PREPROCESS_LOG_TEMPLATE_MAX_ROWS", "300"))
+# Local signal extraction for .log files; only context windows around error bursts reach the summarizer
+LOG_SIGNALS_ENABLED = os.getenv("PREPROCESS_LOG_SIGNALS", "true").lower() == "true"
+# Flattened JSON summaries up to this size go straight into the analysis prompt
+JSON_SUMMARY_MAX_TOKENS = int(os.getenv("PREPROCESS_JSON_SUMMARY_MAX_TOKENS", str(SUMMARY_CHUNK_TOKENS)))
+# Hierarchical (tree) reduction of chunk summaries into the file meta-summary
+REDUCE_FAN_IN = int(os.getenv("PREPROCESS_REDUCE_FAN_IN", "8"))
+REDUCE_MAX_DEPTH = int(os.getenv("PREPROCESS_REDUCE_MAX_DEPTH", "4"))
+REDUCE_MAX_INPUT_TOKENS = int(os.getenv("PREPROCESS_REDUCE_MAX_INPUT_TOKENS", str(SUMMARY_CHUNK_TOKENS)))
+SUMMARY_TEMPERATURE = 0.2
+
+CHUNK_PROMPT_TEMPLATE = (
+    "You are summarizing {file_type} content for performance analysis.\n"
+    "File: {file_name}\n"
+    "Chunk {chunk_number} of {total_chunks}\n"
+    "Summarize key performance signals, metrics, errors, and anomalies in under 180 words. "
+    "Use concise bullet points when possible. Focus on latency, throughput, errors, resource saturation, and lock/GC warnings. "
+    "Do NOT add extra commentary or conclusions beyond what appears in this chunk.\n\n"
+    "Chunk Content:\n"
+    "----------------\n"
+    "{content}\n"
+)
+
+META_PROMPT_TEMPLATE = (
+    "File: {file_name}\n"
+    "Type: {file_type}\n"
+    "You are consolidating multiple partial summaries for this file. "
+    "Combine them into a single meta-summary (max 220 words) highlighting key signals, metrics, and anomalies. "
+    "Avoid repetition. Keep bullet structure tight.\n\n"
+    "Partial Summaries:\n"
+    "------------------\n"
+    "{content}"
+)
+
+
+# Bump when a local processor changes its output, so stored summaries and results are not reused
+PREPROCESSING_VERSION = "4"
+
+# Per-file results kept by content hash so unchanged files skip preprocessing entirely
+FILE_RECORD_FIELDS = (
+    "file_type", "summary", "chunks", "chunk_summaries", "total_lines", "planned_tokens", "reduce_depth", "processor",
+    "metrics", "test_context",
+)
+
+
+def preprocessing_settings() -> Tuple:
+    """Every setting that shapes a file summary; part of the record and analysis cache keys."""
+    return (
+        PREPROCESSING_VERSION,
+        SUMMARY_MODEL,
+        SUMMARY_CHUNK_TOKENS,
+        LOG_COMPACTION_ENABLED,
+        LOG_TEMPLATE_MAX_ROWS,
+        LOG_SIGNALS_ENABLED,
+        JSON_SUMMARY_MAX_TOKENS,
+        TIMESERIES_POINTS,
+        JMX_MAX_SAMPLERS_LISTED,
+        CHUNK_PROMPT_TEMPLATE,
+        META_PROMPT_TEMPLATE,
+    )
+
+
+def _file_record_key(content_hash: str, file_type: str) -> str:
+    """Summary-record key: file content plus every setting that shapes the summary."""
+    return make_cache_key("file-record", content_hash, file_type, *preprocessing_settings())
 
 
 def detect_file_type(path: Path) -> str:
-    ext = path.suffix.lower()
-    if ext in {".log"}:
-        return "log"
-    if ext in {".csv"}:
-        return "csv"
-    if ext in {".jmx"}:
-        return "jmx"
-    if ext in {".json"}:
-        return "json"
-    if ext in {".md", ".markdown"}:
-        return "markdown"
-    if ext in {".txt"}:
-        return "text"
-    return "unknown"
-
-
-def _chunk_text(text: str) -> List[str]:
-    lines = text.splitlines()
-    chunks: List[str] = []
-    current_lines: List[str] = []
-    current_len = 0
-
-    for line in lines:
-        # Reserve newline as well
-        line_len = len(line) + 1
-        if (
-            current_lines
-            and (len(current_lines) >= MAX_LINES_PER_CHUNK or current_len + line_len > MAX_CHARS_PER_CHUNK)
-        ):
-            chunks.append("\n".join(current_lines))
-            current_lines = []
-            current_len = 0
-        current_lines.append(line)
-        current_len += line_len
-
-    if current_lines:
-        chunks.append("\n".join(current_lines))
-    return chunks
-
-
-def _read_file(path: Path) -> Tuple[str, int]:
-    try:
-        content = path.read_text(encoding="utf-8", errors="ignore")
-        return content, content.count("\n") + 1
-    except Exception as exc:
-        logger.warning("Failed to read file %s: %s", path, exc)
-        return "", 0
-
-
-def _summarize_chunk(file_name: str, file_type: str, chunk_text: str, chunk_index: int, total_chunks: int, progress_ctx=None) -> str:
-    prompt = (
-        f"You are summarizing {file_type or 'file'} content for performance analysis.\n"
-        f"File: {file_name}\n"
-        f"Chunk {chunk_index + 1} of {total_chunks}\n"
-        "Summarize key performance signals, metrics, errors, and anomalies in under 180 words. "
-        "Use concise bullet points when possible. Focus on latency, throughput, errors, resource saturation, and lock/GC warnings. "
-        "Do NOT add extra commentary or conclusions beyond what appears in this chunk.\n\n"
-        "Chunk Content:\n"
-        "----------------\n"
-        f"{chunk_text[:MAX_CHARS_PER_CHUNK]}\n"
+    return bundles.detect_file_type(path.name)
+
+
+def _compact_log(path: Path) -> Optional[Tuple[str, int]]:
+    """
+    Mine log templates in one streaming pass and return (template_table, total_lines).
+    Returns None when the file already fits one chunk or lines are too diverse for
+    templating to shrink them by LOG_COMPACTION_MIN_RATIO.
+    """
+    # Cheap pre-check from the file size alone
+    if estimate_tokens_from_size(path.stat().st_size) <= SUMMARY_CHUNK_TOKENS:
+        return None
+    miner = DrainMiner()
+    newlines = 0
+    with open(path, "rb", buffering=READ_BUFFER_BYTES) as fh:
+        for raw in fh:
+            if raw.endswith(b"\n"):
+                newlines += 1
+            miner.add_line(raw.decode("utf-8", errors="ignore"))
+    if not miner.templates or miner.total_lines < LOG_COMPACTION_MIN_RATIO * len(miner.templates):
+        return None
+    return format_template_table(miner, LOG_TEMPLATE_MAX_ROWS), newlines + 1
+
+
+def _summarize_locally(path: Path, file_type: str) -> Optional[Dict]:
+    """
+    Compute a summary without the LLM for structured files we can aggregate ourselves.
+    Returns None when the file should go through chunk summarization instead. A
+    result with `llm_input` still needs that (much smaller) text summarized; its
+    `summary`, if any, is kept in front of the meta-summary.
+    """
+    stats = aggregate_jtl_csv(str(path)) if file_type == "csv" and is_jtl_csv(str(path)) else None
+    if stats is not None:
+        return {
+            "summary": format_jtl_stats(stats),
+            "total_lines": stats["rows"] + 1,
+            "processor": "jtl_aggregate",
+            "metrics": metrics_from_jtl_stats(stats),
+        }
+    if file_type == "csv":
+        reduced = reduce_timeseries_csv(str(path))
+        if reduced is not None:
+            return {"summary": format_timeseries(reduced), "total_lines": reduced["rows"] + 1, "processor": "timeseries"}
+    if file_type == "json":
+        summary = parse_summary_json(str(path))
+        if summary is None:
+            return None
+        table = format_summary_table(summary)
+        # Many transactions: the table still replaces the raw JSON, but is summarized first
+        oversized = estimate_tokens(table) > JSON_SUMMARY_MAX_TOKENS
+        return {
+            "summary": None if oversized else table,
+            "llm_input": table if oversized else None,
+            "total_lines": count_lines(str(path)),
+            "processor": "json_summary_chunks" if oversized else "json_summary",
+            "metrics": metrics_from_jtl_stats(summary),
+        }
+    if file_type == "jmx":
+        plan = parse_jmx(str(path))
+        if plan is None:
+            return None
+        samplers = sum(group["sampler_count"] for group in plan["thread_groups"])
+        return {
+            "summary": (
+                f"JMeter test plan parsed locally: {len(plan['thread_groups'])} thread groups, {samplers} samplers "
+                "(details in Test Context)."
+            ),
+            "total_lines": count_lines(str(path)),
+            "processor": "jmx_plan",
+            "test_context": jmx_test_context(plan),
+        }
+    # Small logs fit one chunk and are cheaper to summarize whole
+    if file_type == "log" and LOG_SIGNALS_ENABLED and estimate_tokens_from_size(path.stat().st_size) > SUMMARY_CHUNK_TOKENS:
+        with timed_stage("log_signals"):
+            signals = extract_log_signals(str(path))
+        return {
+            "summary": format_log_signals(signals),
+            "llm_input": format_windows(signals) or None,
+            "total_lines": signals["total_lines"],
+            "processor": "log_signals",
+        }
+    return None
+
+
+async def _ask_summary_model(
+    prompt: str, template: str, content: str, cache_stats: Optional[CacheStats] = None
+) -> str:
+    """
+    Call SUMMARY_MODEL through the summary cache.
+    The key covers the content, model, prompt template and temperature, so identical
+    chunks re-uploaded in a later run skip the LLM round trip.
+    """
+    cache = get_summary_cache()
+    key = None
+    if cache is not None:
+        key = make_cache_key(SUMMARY_MODEL, SUMMARY_TEMPERATURE, template, content)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            if cache_stats:
+                cache_stats.hit()
+            return cached
+    if cache_stats:
+        cache_stats.miss()
+    result = await ask_gpt_async(prompt, model=SUMMARY_MODEL, temperature=SUMMARY_TEMPERATURE)
+    if cache is not None and result:
+        await asyncio.to_thread(cache.set, key, result)
+    return result
+
+
+async def _summarize_chunk(
+    file_name: str,
+    file_type: str,
+    chunk_text: str,
+    chunk_index: int,
+    total_chunks: int,
+    progress_ctx=None,
+    cache_stats: Optional[CacheStats] = None,
+) -> str:
+    content = truncate_to_budget(chunk_text, SUMMARY_CHUNK_TOKENS)
+    prompt = CHUNK_PROMPT_TEMPLATE.format(
+        file_type=file_type or "file",
+        file_name=file_name,
+        chunk_number=chunk_index + 1,
+        total_chunks=total_chunks,
+        content=content,
     )
     if progress_ctx:
-        progress_manager.update(
+        progress_manager.post_update(
             progress_ctx["job_id"],
             step="summarizing_chunk",
             message=f"Summarizing chunk {chunk_index + 1}/{total_chunks} for {file_name}",
@@ -90,13 +239,14 @@ def _summarize_chunk(file_name: str, file_type: str, chunk_text: str, chunk_inde
             chunk_total=total_chunks,
             log=f"Sending chunk {chunk_index + 1}/{total_chunks} of {file_name} to AI",
         )
-    result = ask_gpt(prompt, model=SUMMARY_MODEL, temperature=0.2)
+    with timed_stage("chunk_summary"):
+        result = await _ask_summary_model(prompt, CHUNK_PROMPT_TEMPLATE, content, cache_stats)
     if progress_ctx:
         # update overall progress portion
         per_file_share = progress_ctx.get("per_file_share", 0)
         chunk_progress = (chunk_index + 1) / total_chunks if total_chunks else 1
         new_progress = progress_ctx.get("base_progress", 0) + per_file_share * chunk_progress
-        progress_manager.update(
+        progress_manager.post_update(
             progress_ctx["job_id"],
             progress=new_progress,
             step="summarizing_chunk",
@@ -111,46 +261,140 @@ def _summarize_chunk(file_name: str, file_type: str, chunk_text: str, chunk_inde
     return result
 
 
-def _summarize_file_from_chunks(file_name: str, file_type: str, chunks: List[str], progress_ctx=None) -> Tuple[str, List[str]]:
-    chunk_summaries = [None] * len(chunks)
-    # Parallel chunk summarization with ordering preservation
+def _reduce_fan_in(leaves: int) -> int:
+    """Fan-in that keeps the tree within REDUCE_MAX_DEPTH levels for `leaves` inputs."""
+    fan_in = max(REDUCE_FAN_IN, 2)
+    depth = max(REDUCE_MAX_DEPTH, 1)
+    while fan_in ** depth < leaves:
+        fan_in += 1
+    return fan_in
+
+
+def _fit_reduce_inputs(summaries: List[str], max_tokens: int) -> List[str]:
+    """Trim the longest inputs so one reduction prompt stays within max_tokens."""
+    counts = [estimate_tokens(s) for s in summaries]
+    if sum(counts) <= max_tokens:
+        return summaries
+    share = max(max_tokens // max(len(summaries), 1), 1)
+    fitted = []
+    for text, count in zip(summaries, counts):
+        if count > share:
+            text = text[: max(int(len(text) * share / count), 1)] + " [...]"
+        fitted.append(text)
+    return fitted
+
+
+async def _reduce_summaries(
+    file_name: str, file_type: str, summaries: List[str], cache_stats: Optional[CacheStats] = None
+) -> str:
+    combined = "\n\n".join(_fit_reduce_inputs(summaries, REDUCE_MAX_INPUT_TOKENS))
+    prompt = META_PROMPT_TEMPLATE.format(file_name=file_name, file_type=file_type or "unknown", content=combined)
+    with timed_stage("meta_summary"):
+        return (await _ask_summary_model(prompt, META_PROMPT_TEMPLATE, combined, cache_stats)).strip()
+
+
+def _build_reduce_tree(
+    file_name: str,
+    file_type: str,
+    leaves: List["asyncio.Future[str]"],
+    cache_stats: Optional[CacheStats] = None,
+    failures: Optional[List[str]] = None,
+) -> Tuple["asyncio.Future[str]", int]:
+    """
+    Wire up a tree of reduction tasks over leaf futures (one per chunk summary).
+    Each group reduces as soon as its own inputs resolve, so upper levels overlap
+    with chunk summarization still in progress. Returns (root, depth). Groups
+    that fall back to concatenation are recorded in `failures`.
+    """
+    fan_in = _reduce_fan_in(len(leaves))
+
+    async def _reduce_group(children: List["asyncio.Future[str]"]) -> str:
+        summaries = [await child for child in children]
+        try:
+            return await _reduce_summaries(file_name, file_type, summaries, cache_stats)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Intermediate reduction failed for file=%s: %s", file_name, exc)
+            if failures is not None:
+                failures.append(f"reduction: {exc}")
+            return "\n".join(_fit_reduce_inputs(summaries, REDUCE_MAX_INPUT_TOKENS))
+
+    level = leaves
+    depth = 0
+    # Intermediate levels until the remaining nodes fit one final reduction
+    while len(level) > fan_in:
+        level = [
+            asyncio.ensure_future(_reduce_group(level[i:i + fan_in]))
+            for i in range(0, len(level), fan_in)
+        ]
+        depth += 1
+
+    async def _final() -> str:
+        summaries = [await node for node in level]
+        return await _reduce_summaries(file_name, file_type, summaries, cache_stats)
+
+    return asyncio.ensure_future(_final()), depth + 1
+
+
+async def _summarize_file_from_chunks(
+    file_name: str,
+    file_type: str,
+    iter_chunks: Callable[[], Iterator[str]],
+    total_chunks: int,
+    progress_ctx=None,
+    cache_stats: Optional[CacheStats] = None,
+) -> Tuple[str, List[str], int, bool]:
+    """
+    Summarize chunks as `iter_chunks()` produces them, then tree-reduce them into a
+    meta-summary (fan-in PREPROCESS_REDUCE_FAN_IN, depth <= PREPROCESS_REDUCE_MAX_DEPTH).
+    At most MAX_CHUNKS_IN_FLIGHT chunk texts are held at once, so memory scales
+    with chunk size rather than file size; results are collected in chunk order.
+    Returns (meta_summary, chunk_summaries, reduce_depth, degraded), where degraded
+    is set when any chunk or intermediate reduction failed and was papered over.
+    """
+    chunk_summaries: List[Optional[str]] = [None] * total_chunks
+    failures: List[str] = []
+    loop = asyncio.get_running_loop()
+    leaves: List["asyncio.Future[str]"] = [loop.create_future() for _ in range(total_chunks)]
+    root, reduce_depth = _build_reduce_tree(file_name, file_type, leaves, cache_stats, failures)
+
+    async def _summarize(idx: int, chunk: str) -> None:
+        try:
+            result = await _summarize_chunk(file_name, file_type, chunk, idx, total_chunks, progress_ctx, cache_stats)
+            chunk_summaries[idx] = result.strip()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Chunk summary failed for file=%s chunk=%s: %s", file_name, idx, exc)
+            chunk_summaries[idx] = f"[Chunk {idx + 1} summary failed: {exc}]"
+            failures.append(f"chunk {idx + 1}: {exc}")
+        leaves[idx].set_result(chunk_summaries[idx])
+
+    pending = set()
     try:
-        with ThreadPoolExecutor(max_workers=MAX_CHUNK_WORKERS) as executor:
-            future_to_idx = {
-                executor.submit(_summarize_chunk, file_name, file_type, chunk, idx, len(chunks), progress_ctx): idx
-                for idx, chunk in enumerate(chunks)
-            }
-            for future in as_completed(future_to_idx):
-                idx = future_to_idx[future]
-                try:
-                    chunk_summaries[idx] = future.result().strip()
-                except Exception as exc:
-                    logger.warning("Chunk summary failed for file=%s chunk=%s: %s", file_name, idx, exc)
-                    chunk_summaries[idx] = f"[Chunk {idx + 1} summary failed: {exc}]"
-    except Exception as exc:
-        # Fallback to sequential if executor setup fails
-        logger.warning("Parallel chunk summarization failed for file=%s, falling back to sequential: %s", file_name, exc)
-        for idx, chunk in enumerate(chunks):
-            try:
-                chunk_summaries[idx] = _summarize_chunk(file_name, file_type, chunk, idx, len(chunks), progress_ctx).strip()
-            except Exception as inner_exc:
-                logger.warning("Sequential chunk summary failed for file=%s chunk=%s: %s", file_name, idx, inner_exc)
-                chunk_summaries[idx] = f"[Chunk {idx + 1} summary failed: {inner_exc}]"
-
-    # Meta-summary across chunk summaries
-    combined_prompt = (
-        f"File: {file_name}\n"
-        f"Type: {file_type or 'unknown'}\n"
-        "You are consolidating multiple partial summaries for this file. "
-        "Combine them into a single meta-summary (max 220 words) highlighting key signals, metrics, and anomalies. "
-        "Avoid repetition. Keep bullet structure tight.\n\n"
-        "Partial Summaries:\n"
-        "------------------\n"
-        + "\n\n".join(chunk_summaries)
-    )
-    meta_summary = ask_gpt(combined_prompt, model=SUMMARY_MODEL, temperature=0.2)
+        for idx, chunk in enumerate(iter_chunks()):
+            if len(pending) >= max(MAX_CHUNKS_IN_FLIGHT, 1):
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.add(asyncio.ensure_future(_summarize(idx, chunk)))
+        if pending:
+            await asyncio.gather(*pending)
+        for idx, leaf in enumerate(leaves):
+            # Chunks the iterator never produced (file shrank since planning)
+            if not leaf.done():
+                leaf.set_result(f"[Chunk {idx + 1} unavailable]")
+                failures.append(f"chunk {idx + 1}: unavailable")
+        meta_summary = await root
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        root.cancel()
+        for leaf in leaves:
+            leaf.cancel()
+        raise
+
     if progress_ctx:
-        progress_manager.update(
+        progress_manager.post_update(
             progress_ctx["job_id"],
             step="file_summary",
             message=f"Consolidated summaries for {file_name}",
@@ -159,19 +403,38 @@ def _summarize_file_from_chunks(file_name: str, file_type: str, chunks: List[str
             file_status="done",
             file_progress=100,
             progress=progress_ctx.get("base_progress", 0) + progress_ctx.get("per_file_share", 0),
-            log=f"Meta-summary created for {file_name}",
+            log=f"Meta-summary created for {file_name} ({reduce_depth} reduction level(s))",
         )
-    return meta_summary.strip(), chunk_summaries
+    return meta_summary.strip(), chunk_summaries, reduce_depth, bool(failures)
 
 
-def preprocess_files(files: List[Dict], progress_ctx: Optional[Dict] = None) -> List[Dict]:
+def preprocess_files(
+    files: List[Dict], progress_ctx: Optional[Dict] = None, cancel_event: Optional[threading.Event] = None
+) -> List[Dict]:
+    """Blocking wrapper around preprocess_files_async, run on the shared LLM runtime loop."""
+    try:
+        return llm_runtime.run(preprocess_files_async(files, progress_ctx=progress_ctx), cancel_event=cancel_event)
+    finally:
+        # The pipeline posts progress from the loop; later stages must not be overtaken by it
+        if progress_ctx:
+            progress_manager.flush(progress_ctx["job_id"])
+
+
+async def preprocess_files_async(files: List[Dict], progress_ctx: Optional[Dict] = None) -> List[Dict]:
     """
     Preprocess uploaded files:
     - Detect type
-    - Chunk large files
-    - Summarize chunks with gpt-4.1-mini
-    - Meta-summarize per file
+    - Reuse the stored summary record of files whose content was seen before
+    - Aggregate structured files (JMeter CSV results) locally, without LLM calls
+    - Collapse repetitive log/text lines into mined templates
+    - Plan token-budgeted chunks on record boundaries by streaming each file,
+      logging planned tokens before any call, and feed chunks to the summarizer lazily
+    - Summarize chunks with gpt-4.1-mini (through the summary cache)
+    - Tree-reduce chunk summaries into one meta-summary per file
     Returns list of dicts containing summaries only (no raw content).
+    Each dict carries a `cache` entry with summary-cache hit/miss counts, a
+    `reused` flag set when an unchanged file's stored summary record was used,
+    and a `degraded` flag when the summary has failed parts and must not be cached.
     """
     file_summaries: List[Dict] = [None] * len(files)
     if progress_ctx:
@@ -179,27 +442,95 @@ def preprocess_files(files: List[Dict], progress_ctx: Optional[Dict] = None) ->
         per_file_share = 60 / total_files  # allocate 60% of overall progress to files
         progress_ctx["per_file_share"] = per_file_share
         progress_ctx["base_progress"] = 10  # after initial reading/detection
+    # Local file work runs in worker threads so the shared event loop never blocks on disk/CPU
+    file_slots = asyncio.Semaphore(max(MAX_FILE_WORKERS, 1))
 
-    def _process_file(idx: int, file_dict: Dict) -> Dict:
+    async def _summarize_file(idx: int, file_dict: Dict) -> Dict:
         path = Path(file_dict["path"])
         file_type = detect_file_type(path)
-        content, total_lines = _read_file(path)
-        if not content:
+        display_name = file_dict.get("name") or path.name
+
+        try:
+            async with file_slots:
+                with timed_stage("local_aggregate"):
+                    local = await asyncio.to_thread(_summarize_locally, path, file_type)
+        except Exception as exc:
+            logger.warning("Local aggregation failed for %s, falling back to chunking: %s", display_name, exc)
+            local = None
+        compacted = None
+        compact_processor = "log_templates"
+        if local and local.get("llm_input"):
+            compacted = (local["llm_input"], local["total_lines"])
+            compact_processor = local["processor"]
+        elif local:
+            logger.info("Summarized file=%s locally with processor=%s", display_name, local["processor"])
+            if progress_ctx:
+                progress_manager.post_update(
+                    progress_ctx["job_id"],
+                    step="aggregating",
+                    message=f"Aggregated {display_name} locally",
+                    file_name=display_name,
+                    file_id=file_dict.get("file_id"),
+                    file_status="done",
+                    file_progress=100,
+                    log=f"Computed statistics for {display_name} without AI calls",
+                )
             return {
                 "file_id": file_dict.get("file_id"),
-                "name": file_dict.get("name") or path.name,
+                "name": display_name,
                 "file_type": file_type,
-                "summary": "Unable to read file content.",
+                "summary": local["summary"],
                 "chunks": 0,
                 "chunk_summaries": [],
-                "total_lines": total_lines,
+                "total_lines": local["total_lines"],
+                "processor": local["processor"],
+                "metrics": local.get("metrics"),
+                "test_context": local.get("test_context"),
+                "cache": {"hits": 0, "misses": 0},
             }
 
-        chunks = _chunk_text(content)
-        if not chunks:
+        if not compacted and LOG_COMPACTION_ENABLED and file_type in {"log", "text"}:
+            try:
+                async with file_slots:
+                    with timed_stage("log_compaction"):
+                        compacted = await asyncio.to_thread(_compact_log, path)
+            except Exception as exc:
+                logger.warning("Log compaction failed for %s, falling back to raw chunks: %s", display_name, exc)
+
+        if compacted:
+            template_table, total_lines = compacted
+            with timed_stage("chunk_planning"):
+                chunk_kind = "log" if compact_processor == "log_signals" else "table"
+                table_chunks = plan_text_chunks(template_table, chunk_kind, SUMMARY_CHUNK_TOKENS)
+            total_chunks = len(table_chunks)
+            planned_tokens = sum(estimate_tokens(chunk) for chunk in table_chunks)
+            iter_chunks = lambda: iter(table_chunks)  # noqa: E731
+            processor = compact_processor
+        else:
+            async with file_slots:
+                with timed_stage("chunk_planning"):
+                    plan = await asyncio.to_thread(plan_file_chunks, path, file_type, SUMMARY_CHUNK_TOKENS)
+            if plan is None:
+                return {
+                    "file_id": file_dict.get("file_id"),
+                    "name": display_name,
+                    "file_type": file_type,
+                    "summary": "Unable to read file content.",
+                    "chunks": 0,
+                    "chunk_summaries": [],
+                    "total_lines": 0,
+                    "degraded": True,
+                }
+            total_lines = plan.total_lines
+            total_chunks = len(plan.spans)
+            planned_tokens = plan.planned_tokens
+            iter_chunks = lambda: iter_file_chunks(path, plan)  # noqa: E731
+            processor = "llm_chunks"
+
+        if not total_chunks:
             return {
                 "file_id": file_dict.get("file_id"),
-                "name": file_dict.get("name") or path.name,
+                "name": display_name,
                 "file_type": file_type,
                 "summary": "Empty file.",
                 "chunks": 0,
@@ -207,75 +538,127 @@ def preprocess_files(files: List[Dict], progress_ctx: Optional[Dict] = None) ->
                 "total_lines": total_lines,
             }
 
-        logger.info("Preprocessing file=%s type=%s chunks=%s lines=%s", path.name, file_type, len(chunks), total_lines)
+        logger.info(
+            "Preprocessing file=%s type=%s processor=%s chunks=%s lines=%s planned_tokens=%s",
+            path.name, file_type, processor, total_chunks, total_lines, planned_tokens,
+        )
+        file_ctx = None
         if progress_ctx:
-            progress_ctx["base_progress"] = 10 + progress_ctx.get("per_file_share", 0) * idx
-            progress_ctx["file_id"] = file_dict.get("file_id")
-            progress_manager.update(
+            # Per-file copy: files run concurrently and must not share base_progress/file_id
+            file_ctx = dict(
+                progress_ctx,
+                base_progress=10 + progress_ctx.get("per_file_share", 0) * idx,
+                file_id=file_dict.get("file_id"),
+            )
+            progress_manager.post_update(
                 progress_ctx["job_id"],
                 step="chunking",
-                message=f"Chunking {file_dict.get('name') or path.name}",
-                file_name=file_dict.get("name") or path.name,
+                message=f"Chunking {display_name}",
+                file_name=display_name,
                 file_id=file_dict.get("file_id"),
                 file_status="chunking",
                 file_progress=5,
-                chunk_total=len(chunks),
-                log=f"Split {file_dict.get('name') or path.name} into {len(chunks)} chunks",
+                chunk_total=total_chunks,
+                log=f"Split {display_name} into {total_chunks} chunks (~{planned_tokens} tokens planned)",
             )
-        meta_summary, chunk_summaries = _summarize_file_from_chunks(
-            file_dict.get("name") or path.name, file_type, chunks, progress_ctx=progress_ctx
+        cache_stats = CacheStats()
+        meta_summary, chunk_summaries, reduce_depth, degraded = await _summarize_file_from_chunks(
+            display_name,
+            file_type,
+            iter_chunks,
+            total_chunks,
+            progress_ctx=file_ctx,
+            cache_stats=cache_stats,
         )
         return {
             "file_id": file_dict.get("file_id"),
-            "name": file_dict.get("name") or path.name,
+            "name": display_name,
             "file_type": file_type,
-            "summary": meta_summary,
-            "chunks": len(chunks),
+            "summary": "\n\n".join(part for part in (local.get("summary") if local else None, meta_summary) if part),
+            "chunks": total_chunks,
             "chunk_summaries": chunk_summaries,
             "total_lines": total_lines,
+            "planned_tokens": planned_tokens,
+            "reduce_depth": reduce_depth,
+            "processor": processor,
+            "metrics": local.get("metrics") if local else None,
+            "cache": cache_stats.as_dict(),
+            "degraded": degraded,
         }
 
-    try:
-        with ThreadPoolExecutor(max_workers=MAX_FILE_WORKERS) as executor:
-            future_to_idx = {executor.submit(_process_file, idx, f): idx for idx, f in enumerate(files)}
-            for future in as_completed(future_to_idx):
-                idx = future_to_idx[future]
-                try:
-                    file_summaries[idx] = future.result()
-                    if progress_ctx:
-                        progress_manager.update(
-                            progress_ctx["job_id"],
-                            step="file_done",
-                            message=f"Finished {file_summaries[idx]['name']}",
-                            file_name=file_summaries[idx]["name"],
-                            file_status="done",
-                            file_progress=100,
-                            log=f"File completed: {file_summaries[idx]['name']}",
-                        )
-                except Exception as exc:
-                    logger.warning("File preprocessing failed for %s: %s", files[idx].get("name"), exc)
-                    file_summaries[idx] = {
-                        "name": files[idx].get("name") or Path(files[idx]["path"]).name,
-                        "file_type": detect_file_type(Path(files[idx]["path"])),
-                        "summary": f"[Preprocessing failed: {exc}]",
-                        "chunks": 0,
-                        "chunk_summaries": [],
-                        "total_lines": 0,
-                    }
-    except Exception as exc:
-        logger.warning("Parallel file preprocessing failed, falling back to sequential: %s", exc)
-        for idx, f in enumerate(files):
+    async def _process_file(idx: int, file_dict: Dict) -> Dict:
+        path = Path(file_dict["path"])
+        file_type = detect_file_type(path)
+        display_name = file_dict.get("name") or path.name
+        record_cache = get_summary_cache()
+        record_key = None
+        if record_cache is not None:
             try:
-                file_summaries[idx] = _process_file(idx, f)
-            except Exception as inner_exc:
-                logger.warning("Sequential file preprocessing failed for %s: %s", f.get("name"), inner_exc)
-                file_summaries[idx] = {
-                    "name": f.get("name") or Path(f["path"]).name,
-                    "file_type": detect_file_type(Path(f["path"])),
-                    "summary": f"[Preprocessing failed: {inner_exc}]",
-                    "chunks": 0,
-                    "chunk_summaries": [],
-                    "total_lines": 0,
-                }
+                content_hash = file_dict.get("sha256")
+                if not content_hash:
+                    with timed_stage("hash"):
+                        content_hash = await asyncio.to_thread(file_sha256, path)
+                record_key = _file_record_key(content_hash, file_type)
+            except OSError as exc:
+                logger.warning("Could not hash %s, summary record not reused: %s", display_name, exc)
+        # Cache lookups may hit SQLite; keep them off the shared LLM loop
+        cached = await asyncio.to_thread(record_cache.get, record_key) if record_key else None
+        if cached:
+            logger.info("Reusing summary record for unchanged file=%s", display_name)
+            if progress_ctx:
+                progress_manager.post_update(
+                    progress_ctx["job_id"],
+                    step="reusing",
+                    message=f"Reused previous summary of {display_name}",
+                    file_name=display_name,
+                    file_id=file_dict.get("file_id"),
+                    file_status="reused",
+                    file_progress=100,
+                    log=f"{display_name} is unchanged since a previous analysis; summary reused",
+                )
+            return dict(
+                json.loads(cached),
+                file_id=file_dict.get("file_id"),
+                name=display_name,
+                reused=True,
+                cache={"hits": 0, "misses": 0},
+            )
+
+        result = await _summarize_file(idx, file_dict)
+        # Only complete summaries are worth reusing (not placeholders or partly failed summaries)
+        if record_key and result.get("processor") and not result.get("degraded"):
+            record = json.dumps({k: result.get(k) for k in FILE_RECORD_FIELDS})
+            await asyncio.to_thread(record_cache.set, record_key, record)
+        result["reused"] = False
+        return result
+
+    async def _run_file(idx: int, file_dict: Dict) -> None:
+        try:
+            file_summaries[idx] = await _process_file(idx, file_dict)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("File preprocessing failed for %s: %s", file_dict.get("name"), exc)
+            file_summaries[idx] = {
+                "name": file_dict.get("name") or Path(file_dict["path"]).name,
+                "file_type": detect_file_type(Path(file_dict["path"])),
+                "summary": f"[Preprocessing failed: {exc}]",
+                "chunks": 0,
+                "chunk_summaries": [],
+                "total_lines": 0,
+                "degraded": True,
+            }
+            return
+        if progress_ctx:
+            progress_manager.post_update(
+                progress_ctx["job_id"],
+                step="file_done",
+                message=f"Finished {file_summaries[idx]['name']}",
+                file_name=file_summaries[idx]["name"],
+                file_status="done",
+                file_progress=100,
+                log=f"File completed: {file_summaries[idx]['name']}",
+            )
 
+    await asyncio.gather(*(_run_file(idx, f) for idx, f in enumerate(files)))
     return file_summaries
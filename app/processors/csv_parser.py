@@ -1,6 +1,313 @@
+import logging
+import os
+import warnings
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
 import pandas as pd
 
+from app.processors.timeseries import format_timeseries, reduce_timeseries_csv
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_CHUNK_ROWS = int(os.getenv("CSV_AGGREGATE_CHUNK_ROWS", "200000"))
+THROUGHPUT_BUCKET_SECONDS = int(os.getenv("CSV_THROUGHPUT_BUCKET_SECONDS", "60"))
+MAX_LABELS = int(os.getenv("CSV_AGGREGATE_MAX_LABELS", "500"))
+MAX_THROUGHPUT_ROWS = 30
+OTHER_LABEL = "(other labels)"
+
+# JMeter CSV results always carry these; everything else is optional
+JTL_REQUIRED_COLUMNS = {"timeStamp", "elapsed", "label"}
+JTL_OPTIONAL_COLUMNS = ("responseCode", "success")
+
+# Log-spaced latency bins (0.1 ms .. 1 h, ~1% apart) give percentiles with
+# bounded memory per label regardless of how many samples a file holds.
+_HIST_EDGES = np.concatenate(([0.0], np.geomspace(0.1, 3_600_000.0, num=1800)))
+_HIST_BINS = len(_HIST_EDGES)
+_HIST_VALUES = np.concatenate(([0.0], np.sqrt(_HIST_EDGES[1:-1] * _HIST_EDGES[2:]), [_HIST_EDGES[-1]]))
+PERCENTILES = (50, 90, 95, 99)
+
+
 def read_metrics_csv(path: str) -> str:
-    """Read and return first 10 rows of CSV as a string."""
-    df = pd.read_csv(path)
-    return df.head(10).to_csv(index=False)
+    """Return a monitoring export as downsampled series, or the first 10 rows of any other CSV."""
+    reduced = reduce_timeseries_csv(path)
+    if reduced is not None:
+        return format_timeseries(reduced)
+    df = pd.read_csv(path, nrows=10)
+    return df.to_csv(index=False)
+
+
+def is_jtl_csv(path: str) -> bool:
+    """Return True when the CSV header looks like a JMeter results file."""
+    try:
+        header = pd.read_csv(path, nrows=0)
+    except Exception:
+        return False
+    return JTL_REQUIRED_COLUMNS.issubset(set(header.columns))
+
+
+def _epoch_ms(column: pd.Series) -> pd.Series:
+    """
+    Epoch milliseconds from JMeter's timeStamp column: numbers as written by the
+    default `ms` format, or dates written with a custom
+    jmeter.save.saveservice.timestamp_format. NaN where neither parses.
+    """
+    ms = pd.to_numeric(column, errors="coerce")
+    formatted = ms.isna() & column.notna()
+    if formatted.any():
+        with warnings.catch_warnings():
+            # The format is inferred from the first value and applied vectorized; others become NaT
+            warnings.simplefilter("ignore", UserWarning)
+            parsed = pd.to_datetime(column[formatted], errors="coerce", utc=True)
+        ms[formatted] = (parsed - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(milliseconds=1)
+    return ms
+
+
+class _JtlAccumulator:
+    """Running per-label aggregates updated one DataFrame chunk at a time."""
+
+    def __init__(self, bucket_seconds: int):
+        self.bucket_ms = max(bucket_seconds, 1) * 1000
+        self.label_index: Dict[str, int] = {}
+        self.labels: List[str] = []
+        self.count = np.zeros(0, dtype=np.int64)
+        self.errors = np.zeros(0, dtype=np.int64)
+        self.total = np.zeros(0, dtype=np.float64)
+        self.max = np.zeros(0, dtype=np.float64)
+        self.hist = np.zeros((0, _HIST_BINS), dtype=np.int64)
+        self.buckets: Counter = Counter()
+        self.bucket_errors: Counter = Counter()
+        self.status_codes: Counter = Counter()
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        self.rows = 0
+
+    def _label_ids(self, labels: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(labels, use_na_sentinel=False)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, label in enumerate(uniques):
+            label = str(label)
+            idx = self.label_index.get(label)
+            if idx is None:
+                if len(self.labels) >= MAX_LABELS:
+                    label = OTHER_LABEL
+                    idx = self.label_index.get(label)
+                if idx is None:
+                    idx = len(self.labels)
+                    self.label_index[label] = idx
+                    self.labels.append(label)
+            mapping[i] = idx
+        self._grow(len(self.labels))
+        return mapping[codes]
+
+    def _grow(self, size: int) -> None:
+        extra = size - len(self.count)
+        if extra <= 0:
+            return
+        self.count = np.concatenate((self.count, np.zeros(extra, dtype=np.int64)))
+        self.errors = np.concatenate((self.errors, np.zeros(extra, dtype=np.int64)))
+        self.total = np.concatenate((self.total, np.zeros(extra, dtype=np.float64)))
+        self.max = np.concatenate((self.max, np.zeros(extra, dtype=np.float64)))
+        self.hist = np.vstack((self.hist, np.zeros((extra, _HIST_BINS), dtype=np.int64)))
+
+    def add(self, df: pd.DataFrame) -> None:
+        elapsed = pd.to_numeric(df["elapsed"], errors="coerce")
+        ts = _epoch_ms(df["timeStamp"])
+        valid = elapsed.notna() & ts.notna()
+        if not valid.any():
+            return
+        df = df[valid]
+        elapsed_arr = elapsed[valid].to_numpy(dtype=np.float64)
+        ts_arr = ts[valid].to_numpy(dtype=np.int64)
+        ids = self._label_ids(df["label"])
+        n_labels = len(self.labels)
+
+        failed = self._failed_mask(df)
+        self.rows += len(df)
+        self.count += np.bincount(ids, minlength=n_labels)
+        self.errors += np.bincount(ids, weights=failed, minlength=n_labels).astype(np.int64)
+        self.total += np.bincount(ids, weights=elapsed_arr, minlength=n_labels)
+        np.maximum.at(self.max, ids, elapsed_arr)
+
+        bins = np.clip(np.searchsorted(_HIST_EDGES, elapsed_arr, side="right") - 1, 0, _HIST_BINS - 1)
+        flat = np.bincount(ids * _HIST_BINS + bins, minlength=n_labels * _HIST_BINS)
+        self.hist += flat.reshape(n_labels, _HIST_BINS)
+
+        bucket_ids = ts_arr // self.bucket_ms
+        uniq, counts = np.unique(bucket_ids, return_counts=True)
+        self.buckets.update(dict(zip(uniq.tolist(), counts.tolist())))
+        if failed.any():
+            uniq, counts = np.unique(bucket_ids[failed.astype(bool)], return_counts=True)
+            self.bucket_errors.update(dict(zip(uniq.tolist(), counts.tolist())))
+
+        if "responseCode" in df.columns:
+            self.status_codes.update(df["responseCode"].astype(str).value_counts().to_dict())
+
+        chunk_first, chunk_last = int(ts_arr.min()), int((ts_arr + elapsed_arr.astype(np.int64)).max())
+        self.first_ts = chunk_first if self.first_ts is None else min(self.first_ts, chunk_first)
+        self.last_ts = chunk_last if self.last_ts is None else max(self.last_ts, chunk_last)
+
+    @staticmethod
+    def _failed_mask(df: pd.DataFrame) -> np.ndarray:
+        if "success" in df.columns:
+            return (df["success"].astype(str).str.strip().str.lower() == "false").to_numpy(dtype=np.float64)
+        if "responseCode" in df.columns:
+            codes = pd.to_numeric(df["responseCode"], errors="coerce")
+            return (codes.isna() | (codes >= 400)).to_numpy(dtype=np.float64)
+        return np.zeros(len(df), dtype=np.float64)
+
+
+def _percentiles(hist: np.ndarray, max_value: float) -> Dict[int, float]:
+    total = hist.sum()
+    if not total:
+        return {p: 0.0 for p in PERCENTILES}
+    cumulative = np.cumsum(hist)
+    result = {}
+    for p in PERCENTILES:
+        idx = int(np.searchsorted(cumulative, total * p / 100.0, side="left"))
+        result[p] = float(min(_HIST_VALUES[min(idx, _HIST_BINS - 1)], max_value))
+    return result
+
+
+def aggregate_jtl_csv(
+    path: str,
+    *,
+    chunk_rows: int = AGGREGATE_CHUNK_ROWS,
+    bucket_seconds: int = THROUGHPUT_BUCKET_SECONDS,
+) -> Optional[Dict]:
+    """
+    Aggregate a JMeter CSV results file in bounded-memory chunked passes.
+
+    Returns per-label count, mean, p50/p90/p95/p99, max and error rate, plus
+    throughput per time bucket and the overall status-code breakdown.
+    Percentiles come from log-spaced histograms (~1% relative error).
+    Returns None when no row has a usable timeStamp and elapsed.
+    """
+    header = pd.read_csv(path, nrows=0)
+    columns = [c for c in header.columns if c in JTL_REQUIRED_COLUMNS or c in JTL_OPTIONAL_COLUMNS]
+    acc = _JtlAccumulator(bucket_seconds)
+    reader = pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={"label": "string", "responseCode": "string", "success": "string"},
+        chunksize=max(chunk_rows, 1),
+        on_bad_lines="skip",
+        low_memory=True,
+    )
+    for chunk in reader:
+        acc.add(chunk)
+    if not acc.rows:
+        return None
+
+    duration_s = max((acc.last_ts - acc.first_ts) / 1000.0, 0.001)
+    labels = []
+    for idx, label in enumerate(acc.labels):
+        count = int(acc.count[idx])
+        if not count:
+            continue
+        pcts = _percentiles(acc.hist[idx], float(acc.max[idx]))
+        labels.append({
+            "label": label,
+            "count": count,
+            "mean_ms": float(acc.total[idx] / count),
+            **{f"p{p}_ms": v for p, v in pcts.items()},
+            "max_ms": float(acc.max[idx]),
+            "errors": int(acc.errors[idx]),
+            "error_rate": float(acc.errors[idx] / count),
+            "throughput_rps": count / duration_s if duration_s else 0.0,
+        })
+    labels.sort(key=lambda r: r["count"], reverse=True)
+
+    total_count = int(acc.count.sum())
+    overall = None
+    if total_count:
+        pcts = _percentiles(acc.hist.sum(axis=0), float(acc.max.max()))
+        overall = {
+            "label": "TOTAL",
+            "count": total_count,
+            "mean_ms": float(acc.total.sum() / total_count),
+            **{f"p{p}_ms": v for p, v in pcts.items()},
+            "max_ms": float(acc.max.max()),
+            "errors": int(acc.errors.sum()),
+            "error_rate": float(acc.errors.sum() / total_count),
+            "throughput_rps": total_count / duration_s if duration_s else 0.0,
+        }
+
+    throughput = [
+        {
+            "bucket_start_ms": int(bucket * acc.bucket_ms),
+            "requests": int(acc.buckets[bucket]),
+            "errors": int(acc.bucket_errors.get(bucket, 0)),
+            "rps": acc.buckets[bucket] / (acc.bucket_ms / 1000.0),
+        }
+        for bucket in sorted(acc.buckets)
+    ]
+
+    return {
+        "rows": acc.rows,
+        "start_ms": acc.first_ts,
+        "end_ms": acc.last_ts,
+        "duration_s": duration_s,
+        "bucket_seconds": acc.bucket_ms // 1000,
+        "labels": labels,
+        "overall": overall,
+        "throughput": throughput,
+        "status_codes": dict(acc.status_codes.most_common()),
+    }
+
+
+def _merge_buckets(rows: List[Dict], max_rows: int) -> List[Dict]:
+    """Merge adjacent throughput buckets so the table stays within max_rows."""
+    if len(rows) <= max_rows:
+        return rows
+    group = -(-len(rows) // max_rows)
+    merged = []
+    for i in range(0, len(rows), group):
+        part = rows[i:i + group]
+        requests = sum(r["requests"] for r in part)
+        merged.append({
+            "bucket_start_ms": part[0]["bucket_start_ms"],
+            "requests": requests,
+            "errors": sum(r["errors"] for r in part),
+            "rps": sum(r["rps"] for r in part) / len(part),
+            "peak_rps": max(r["rps"] for r in part),
+        })
+    return merged
+
+
+def format_jtl_stats(stats: Dict, max_labels: int = 50) -> str:
+    """Render aggregated JTL stats as a compact Markdown block for the analysis prompt."""
+    lines = [
+        "Aggregated locally from JMeter results (no raw rows sent).",
+        f"Samples: {stats['rows']} | Duration: {stats['duration_s']:.0f}s",
+        "",
+        "| Label | Count | Mean ms | p50 | p90 | p95 | p99 | Max | Error % | RPS |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    rows = stats["labels"][:max_labels]
+    if stats.get("overall"):
+        rows = rows + [stats["overall"]]
+    for r in rows:
+        lines.append(
+            f"| {r['label']} | {r['count']} | {r['mean_ms']:.1f} | {r['p50_ms']:.0f} | {r['p90_ms']:.0f} | "
+            f"{r['p95_ms']:.0f} | {r['p99_ms']:.0f} | {r['max_ms']:.0f} | {r['error_rate'] * 100:.2f} | "
+            f"{r['throughput_rps']:.2f} |"
+        )
+    if len(stats["labels"]) > max_labels:
+        lines.append(f"({len(stats['labels']) - max_labels} lower-volume labels omitted)")
+
+    if stats.get("status_codes"):
+        codes = ", ".join(f"{code}: {count}" for code, count in list(stats["status_codes"].items())[:15])
+        lines += ["", f"Status codes: {codes}"]
+
+    if stats.get("throughput"):
+        buckets = _merge_buckets(stats["throughput"], MAX_THROUGHPUT_ROWS)
+        start = stats.get("start_ms") or 0
+        lines += ["", "Throughput over time (offset from start):", "| Offset s | Requests | Errors | Avg RPS | Peak RPS |", "|---|---|---|---|---|"]
+        for b in buckets:
+            offset = max((b["bucket_start_ms"] - start) / 1000.0, 0)
+            lines.append(
+                f"| {offset:.0f} | {b['requests']} | {b['errors']} | {b['rps']:.2f} | {b.get('peak_rps', b['rps']):.2f} |"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,185 @@
+import os
+import xml.etree.ElementTree as ET
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+JMX_MAX_SAMPLERS_LISTED = int(os.getenv("JMX_MAX_SAMPLERS_LISTED", "15"))
+MAX_VARIABLES_LISTED = 20
+
+_PROP_TAGS = {"stringProp", "boolProp", "intProp", "longProp", "doubleProp", "floatProp"}
+
+
+def _props(elem: ET.Element) -> Dict[str, str]:
+    """Every named property of a test element, nested elementProps included."""
+    props = {}
+    for prop in elem.iter():
+        if prop.tag not in _PROP_TAGS:
+            continue
+        if prop.get("name"):
+            props[prop.get("name")] = (prop.text or "").strip()
+        elif prop.findtext("name"):
+            # Older serialization: <doubleProp><name>throughput</name><value>60.0</value></doubleProp>
+            props[prop.findtext("name")] = (prop.findtext("value") or "").strip()
+    return props
+
+
+def _variables(elem: ET.Element) -> Dict[str, str]:
+    variables = {}
+    for arg in elem.iter("elementProp"):
+        props = _props(arg)
+        if "Argument.name" in props:
+            variables[props["Argument.name"]] = props.get("Argument.value", "")
+    return variables
+
+
+def _thread_group(elem: ET.Element, props: Dict[str, str]) -> Dict:
+    testclass = elem.get("testclass", elem.tag)
+    group = {"name": elem.get("testname", ""), "type": testclass.rsplit(".", 1)[-1]}
+    if "ThreadGroup.num_threads" in props:
+        loops = props.get("LoopController.loops")
+        group.update(
+            threads=props.get("ThreadGroup.num_threads"),
+            ramp_up_s=props.get("ThreadGroup.ramp_time"),
+            loops="forever" if loops == "-1" else loops,
+            duration_s=props.get("ThreadGroup.duration") if props.get("ThreadGroup.scheduler") == "true" else None,
+            delay_s=props.get("ThreadGroup.delay") if props.get("ThreadGroup.scheduler") == "true" else None,
+        )
+    elif "TargetLevel" in props:
+        # Concurrency / arrivals thread groups from jmeter-plugins; times are in Unit (M or S)
+        unit = "min" if props.get("Unit", "M") == "M" else "s"
+        group.update(
+            threads=props.get("TargetLevel"),
+            ramp_up=f"{props.get('RampUp', '0')}{unit}",
+            steps=props.get("Steps"),
+            hold=f"{props.get('Hold', '0')}{unit}",
+        )
+    group.update(samplers=[], sampler_count=0, timers=[], assertions=Counter())
+    return group
+
+
+def _sampler(elem: ET.Element, props: Dict[str, str]) -> str:
+    name = elem.get("testname", "")
+    if "HTTPSampler.path" in props:
+        method = props.get("HTTPSampler.method") or "GET"
+        return f"{name} ({method} {props.get('HTTPSampler.path') or '/'})"
+    return f"{name} ({elem.get('testclass', elem.tag)})"
+
+
+def _timer(elem: ET.Element, props: Dict[str, str]) -> str:
+    name = elem.get("testname", "") or elem.tag
+    if "RandomTimer.range" in props:
+        return f"{name}: {props.get('ConstantTimer.delay', '0')} ms + random {props['RandomTimer.range']} ms"
+    if "ConstantTimer.delay" in props:
+        return f"{name}: {props['ConstantTimer.delay']} ms"
+    if "throughputPeriod" in props:
+        return f"{name}: {props.get('throughput')} samples per {props['throughputPeriod']}s"
+    if "throughput" in props:
+        # ConstantThroughputTimer targets samples per minute
+        return f"{name}: {props['throughput']} samples/min"
+    return name
+
+
+def _is_disabled(elem: ET.Element) -> bool:
+    return elem.get("enabled") == "false"
+
+
+def parse_jmx(path: str) -> Optional[Dict]:
+    """
+    Extract thread groups, samplers, timers and assertions from a JMeter plan
+    with a streaming parse. Each test element is dropped from the tree once
+    read, so memory follows the nesting depth, not the plan size. Disabled
+    elements and everything under them are skipped. None if not a test plan.
+    """
+    plan = {"name": None, "variables": {}, "thread_groups": [], "timers": [], "assertions": Counter()}
+    # (enclosing thread group or None, disabled) for every open hashTree
+    scopes: List[Tuple[Optional[Dict], bool]] = []
+    parents: List[ET.Element] = []
+    pending = None  # scope the next hashTree opens: set by the test element just before it
+    found_plan = False
+
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "hashTree":
+                scopes.append(pending or (scopes[-1] if scopes else (None, False)))
+                pending = None
+            parents.append(elem)
+            continue
+
+        parents.pop()
+        parent = parents[-1] if parents else None
+        if elem.tag == "hashTree":
+            scopes.pop()
+            pending = None
+        elif parent is not None and parent.tag == "hashTree":
+            # A test element: its properties are complete now
+            group, disabled = scopes[-1] if scopes else (None, False)
+            disabled = disabled or _is_disabled(elem)
+            testclass = elem.get("testclass", elem.tag)
+            props = _props(elem) if not disabled else {}
+            if not disabled:
+                if elem.tag == "TestPlan":
+                    found_plan = True
+                    plan["name"] = elem.get("testname")
+                    plan["variables"].update(_variables(elem))
+                elif testclass == "Arguments":
+                    plan["variables"].update(_variables(elem))
+                elif "ThreadGroup" in testclass:
+                    group = _thread_group(elem, props)
+                    plan["thread_groups"].append(group)
+                elif testclass.endswith(("Sampler", "SamplerProxy")) and group is not None:
+                    group["sampler_count"] += 1
+                    if len(group["samplers"]) < JMX_MAX_SAMPLERS_LISTED:
+                        group["samplers"].append(_sampler(elem, props))
+                elif testclass.endswith("Timer"):
+                    (group or plan)["timers"].append(_timer(elem, props))
+                elif testclass.endswith("Assertion"):
+                    (group or plan)["assertions"][testclass.rsplit(".", 1)[-1]] += 1
+            pending = (group, disabled)
+        else:
+            continue
+        if parent is not None:
+            parent.remove(elem)
+
+    return plan if found_plan else None
+
+
+def _describe_group(group: Dict) -> str:
+    parts = [group["type"]]
+    if group.get("threads") is not None:
+        parts.append(f"{group['threads']} threads")
+    for key, label in (("ramp_up_s", "ramp-up {}s"), ("ramp_up", "ramp-up {}"), ("steps", "{} steps"),
+                       ("hold", "hold {}"), ("duration_s", "duration {}s"), ("delay_s", "startup delay {}s")):
+        if group.get(key) not in (None, ""):
+            parts.append(label.format(group[key]))
+    if group.get("loops") is not None:
+        parts.append(f"loops {group['loops']}")
+    parts.append(f"{group['sampler_count']} samplers")
+    return ", ".join(parts)
+
+
+def _assertions(counts: Counter) -> str:
+    return ", ".join(f"{name} x{count}" for name, count in counts.most_common())
+
+
+def jmx_test_context(plan: Dict) -> Dict[str, str]:
+    """Flatten a parsed plan into Test Context entries for build_prompt."""
+    context = {"Test Plan": plan["name"] or "(unnamed)"}
+    for idx, group in enumerate(plan["thread_groups"], start=1):
+        prefix = f"Thread Group {idx}" + (f" '{group['name']}'" if group["name"] else "")
+        context[prefix] = _describe_group(group)
+        if group["samplers"]:
+            listed = "; ".join(group["samplers"])
+            more = group["sampler_count"] - len(group["samplers"])
+            context[f"{prefix} samplers"] = listed + (f" (+{more} more)" if more > 0 else "")
+        if group["timers"]:
+            context[f"{prefix} timers"] = "; ".join(group["timers"])
+        if group["assertions"]:
+            context[f"{prefix} assertions"] = _assertions(group["assertions"])
+    if plan["timers"]:
+        context["Plan-level timers"] = "; ".join(plan["timers"])
+    if plan["assertions"]:
+        context["Plan-level assertions"] = _assertions(plan["assertions"])
+    if plan["variables"]:
+        shown = list(plan["variables"].items())[:MAX_VARIABLES_LISTED]
+        context["Plan variables"] = ", ".join(f"{name}={value}" for name, value in shown)
+    return context
@@ -1,7 +1,272 @@
 import json
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+JSON_STREAM_BLOCK_BYTES = int(os.getenv("JSON_STREAM_BLOCK_BYTES", str(1024 * 1024)))
+JSON_SUMMARY_MAX_LABELS = int(os.getenv("JSON_SUMMARY_MAX_LABELS", "500"))
+
+ROW_FIELDS = ("count", "mean_ms", "p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms", "error_rate", "throughput_rps")
+_NON_WHITESPACE = re.compile(r"[^ \t\n\r]")
+_K6_TAG = re.compile(r"^(?P<metric>[^{]+)\{(?P<tags>.*)\}$")
+
+
+class _JsonStream:
+    """
+    Incremental reader over a JSON file's top-level container. Only one
+    member is decoded at a time, so memory follows the largest member rather
+    than the file (the whole of a JMeter statistics.json is never held).
+    """
+
+    def __init__(self, fh, block_bytes: int):
+        self.fh = fh
+        self.block_bytes = max(block_bytes, 1024)
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        # Read at least as much as is buffered so retries over one huge member stay linear
+        block = self.fh.read(max(self.block_bytes, len(self.buf) - self.pos))
+        if not block:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            match = _NON_WHITESPACE.search(self.buf, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self._fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in JSON, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut at the buffer edge decodes "successfully"; read on to be sure
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_members(path: str, block_bytes: int = JSON_STREAM_BLOCK_BYTES) -> Iterator[Tuple[Union[str, int], Any]]:
+    """Yield (key, value) for a top-level object, or (index, value) for a top-level array."""
+    with open(path, "r", encoding="utf-8", errors="replace") as fh:
+        stream = _JsonStream(fh, block_bytes)
+        opener = stream.expect("{[")
+        closer = "}" if opener == "{" else "]"
+        if stream.peek() == closer:
+            return
+        index = 0
+        while True:
+            if opener == "{":
+                key = stream.value()
+                stream.expect(":")
+                yield key, stream.value()
+            else:
+                yield index, stream.value()
+                index += 1
+            if stream.expect("," + closer) == closer:
+                return
+
+
+def count_lines(path: str) -> int:
+    newlines = 0
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(JSON_STREAM_BLOCK_BYTES), b""):
+            newlines += block.count(b"\n")
+    return newlines + 1
+
+
+def _num(value: Any) -> Optional[float]:
+    if isinstance(value, dict):
+        value = value.get("total")
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row(label: str, **fields: Optional[float]) -> Dict:
+    row: Dict[str, Any] = {"label": label}
+    row.update({field: fields.get(field) for field in ROW_FIELDS})
+    return row
+
+
+def _jmeter_row(label: str, stats: Dict) -> Dict:
+    """One entry of JMeter's dashboard statistics.json (pct1..3 default to 90/95/99)."""
+    count = _num(stats.get("sampleCount"))
+    error_pct = _num(stats.get("errorPct"))
+    if error_pct is None and count:
+        error_pct = (_num(stats.get("errorCount")) or 0) / count * 100
+    return _row(
+        stats.get("transaction") or label,
+        count=count,
+        mean_ms=_num(stats.get("meanResTime")),
+        p50_ms=_num(stats.get("medianResTime")),
+        p90_ms=_num(stats.get("pct1ResTime")),
+        p95_ms=_num(stats.get("pct2ResTime")),
+        p99_ms=_num(stats.get("pct3ResTime")),
+        max_ms=_num(stats.get("maxResTime")),
+        error_rate=error_pct / 100 if error_pct is not None else None,
+        throughput_rps=_num(stats.get("throughput")),
+    )
+
+
+def _gatling_row(label: str, stats: Dict) -> Dict:
+    """Gatling js/stats.json node stats (percentiles1..4 default to 50/75/95/99)."""
+    requests = stats.get("numberOfRequests") or {}
+    total = _num(requests)
+    failed = _num(requests.get("ko")) if isinstance(requests, dict) else None
+    return _row(
+        label,
+        count=total,
+        mean_ms=_num(stats.get("meanResponseTime")),
+        p50_ms=_num(stats.get("percentiles1")),
+        p95_ms=_num(stats.get("percentiles3")),
+        p99_ms=_num(stats.get("percentiles4")),
+        max_ms=_num(stats.get("maxResponseTime")),
+        error_rate=(failed / total) if total and failed is not None else None,
+        throughput_rps=_num(stats.get("meanNumberOfRequestsPerSecond")),
+    )
+
+
+def _gatling_requests(contents: Dict, prefix: str = "") -> Iterator[Dict]:
+    for node in contents.values():
+        if not isinstance(node, dict):
+            continue
+        name = f"{prefix}{node.get('name', '?')}"
+        if node.get("type") == "REQUEST" and isinstance(node.get("stats"), dict):
+            yield _gatling_row(name, node["stats"])
+        elif isinstance(node.get("contents"), dict):
+            yield from _gatling_requests(node["contents"], f"{name} / ")
+
+
+def _k6_values(metric: Any) -> Dict:
+    # handleSummary() nests values; --summary-export keeps them flat
+    if isinstance(metric, dict) and isinstance(metric.get("values"), dict):
+        return metric["values"]
+    return metric if isinstance(metric, dict) else {}
+
+
+def _k6_rows(metrics: Dict) -> Tuple[List[Dict], Optional[Dict]]:
+    """Rows from k6 summary metrics, per `name`/`group` tagged submetric plus the overall one."""
+    grouped: Dict[str, Dict[str, Optional[float]]] = {}
+    for key, metric in metrics.items():
+        match = _K6_TAG.match(key)
+        name, label = key, "TOTAL"
+        if match:
+            tags = dict(part.split(":", 1) for part in match.group("tags").split(",") if ":" in part)
+            label = tags.get("name") or tags.get("group")
+            if not label:
+                continue
+            name = match.group("metric")
+        values = _k6_values(metric)
+        fields = grouped.setdefault(label, {})
+        if name == "http_req_duration":
+            fields.update(
+                mean_ms=_num(values.get("avg")),
+                p50_ms=_num(values.get("med")),
+                p90_ms=_num(values.get("p(90)")),
+                p95_ms=_num(values.get("p(95)")),
+                p99_ms=_num(values.get("p(99)")),
+                max_ms=_num(values.get("max")),
+            )
+        elif name == "http_reqs":
+            fields.update(count=_num(values.get("count")), throughput_rps=_num(values.get("rate")))
+        elif name == "http_req_failed":
+            fields["error_rate"] = _num(values.get("rate", values.get("value")))
+    rows = [_row(label, **fields) for label, fields in grouped.items() if any(v is not None for v in fields.values())]
+    overall = next((row for row in rows if row["label"] == "TOTAL"), None)
+    return [row for row in rows if row["label"] != "TOTAL"], overall
+
+
+def parse_summary_json(path: str) -> Optional[Dict]:
+    """
+    Flatten a load-test summary into per-transaction rows shaped like
+    aggregate_jtl_csv labels. Recognizes JMeter statistics.json, k6 summary
+    exports (--summary-export and handleSummary) and Gatling stats.json.
+    Returns None for any other JSON.
+    """
+    labels: List[Dict] = []
+    overall: Optional[Dict] = None
+    source = None
+    for key, value in iter_json_members(path):
+        if isinstance(value, dict) and "sampleCount" in value:
+            source = "jmeter"
+            row = _jmeter_row(str(key), value)
+            if str(key).lower() == "total":
+                overall = dict(row, label="TOTAL")
+            else:
+                labels.append(row)
+        elif key == "metrics" and isinstance(value, dict) and any(k.startswith("http_req") for k in value):
+            source = "k6"
+            labels, overall = _k6_rows(value)
+        elif key == "stats" and isinstance(value, dict) and "numberOfRequests" in value:
+            source = "gatling"
+            overall = _gatling_row("TOTAL", value)
+        elif key == "contents" and isinstance(value, dict):
+            labels.extend(_gatling_requests(value))
+    if source is None or not (labels or overall):
+        return None
+    labels.sort(key=lambda row: row.get("count") or 0, reverse=True)
+    return {"source": source, "labels": labels, "overall": overall}
+
+
+def _cell(value: Optional[float], fmt: str) -> str:
+    return "-" if value is None else format(value, fmt)
+
+
+def format_summary_table(summary: Dict, max_labels: int = JSON_SUMMARY_MAX_LABELS) -> str:
+    """Compact Markdown table of a parsed summary, same columns as format_jtl_stats."""
+    source = {"jmeter": "JMeter statistics.json", "k6": "k6 summary", "gatling": "Gatling stats.json"}[summary["source"]]
+    lines = [
+        f"Flattened locally from {source} (raw JSON not sent).",
+        "",
+        "| Label | Count | Mean ms | p50 | p90 | p95 | p99 | Max | Error % | RPS |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    rows = summary["labels"][:max_labels]
+    if summary.get("overall"):
+        rows = rows + [summary["overall"]]
+    for r in rows:
+        error_pct = r["error_rate"] * 100 if r["error_rate"] is not None else None
+        lines.append(
+            f"| {r['label']} | {_cell(r['count'], '.0f')} | {_cell(r['mean_ms'], '.1f')} | {_cell(r['p50_ms'], '.0f')} | "
+            f"{_cell(r['p90_ms'], '.0f')} | {_cell(r['p95_ms'], '.0f')} | {_cell(r['p99_ms'], '.0f')} | "
+            f"{_cell(r['max_ms'], '.0f')} | {_cell(error_pct, '.2f')} | {_cell(r['throughput_rps'], '.2f')} |"
+        )
+    if len(summary["labels"]) > max_labels:
+        lines.append(f"({len(summary['labels']) - max_labels} lower-volume transactions omitted)")
+    return "\n".join(lines)
+
 
 def read_summary_json(path: str) -> str:
-    """Read and return pretty-printed JSON data."""
-    with open(path, 'r') as f:
-        data = json.load(f)
-    return json.dumps(data, indent=2)
+    """Return a load-test summary as a compact table, or other JSON re-serialized without indentation."""
+    summary = parse_summary_json(path)
+    if summary:
+        return format_summary_table(summary)
+    with open(path, "r") as f:
+        return json.dumps(json.load(f), separators=(",", ":"))
@@ -0,0 +1,275 @@
+import os
+import re
+from collections import Counter, deque
+from statistics import median
+from typing import Deque, Dict, List, Optional
+
+from app.processors.log_templates import split_timestamp
+
+CONTEXT_LINES_BEFORE = int(os.getenv("LOG_SIGNAL_CONTEXT_BEFORE", "5"))
+CONTEXT_LINES_AFTER = int(os.getenv("LOG_SIGNAL_CONTEXT_AFTER", "10"))
+MAX_WINDOW_LINES = int(os.getenv("LOG_SIGNAL_MAX_WINDOW_LINES", "60"))
+MAX_WINDOWS = int(os.getenv("LOG_SIGNAL_MAX_WINDOWS", "40"))
+WINDOWS_PER_MINUTE = int(os.getenv("LOG_SIGNAL_WINDOWS_PER_MINUTE", "3"))
+# Until a timestamp is seen (or in logs without any), lines are bucketed by count instead of minute
+LINES_PER_BUCKET = int(os.getenv("LOG_SIGNAL_LINES_PER_BUCKET", "1000"))
+# A minute is a burst when its error lines reach both the floor and FACTOR x the median minute
+BURST_MIN_EVENTS = int(os.getenv("LOG_SIGNAL_BURST_MIN_EVENTS", "5"))
+BURST_FACTOR = float(os.getenv("LOG_SIGNAL_BURST_FACTOR", "3"))
+MAX_SIGNATURES = 2000
+MAX_LINE_CHARS = 500
+MAX_SERIES_ROWS = 60
+OTHER_SIGNATURE = "(other signatures)"
+
+# One pass of one pattern per line finds every signal; alternatives are tried left to right
+_SIGNALS = re.compile(
+    r"(?P<level>\b(?:FATAL|SEVERE|CRITICAL|ERROR|WARN(?:ING)?)\b)"
+    r"|(?P<exception>\b(?:[a-zA-Z_$][\w$]*\.)*[A-Z][\w$]*(?:Exception|Error)\b)(?::[ \t]*(?P<message>[^\n]{0,200}))?"
+    r"|(?P<gc>(?:GC\(\d+\)|Pause (?:Young|Full|Remark|Cleanup)|Full GC|GC pause)[^\n]*?(?P<gc_ms>\d+(?:\.\d+)?)[ \t]?ms)"
+    r"|(?P<pool>(?i:pool (?:is )?exhausted|connection is not available|cannot get a connection"
+    r"|unable to acquire (?:jdbc )?connection|too many connections|remaining connection slots are reserved))"
+    r"|(?P<timeout>(?i:\btimed?[ -]?out\b|deadline exceeded))"
+)
+# Literal pre-check covering every alternative above; most lines of a large log carry no signal
+_TRIGGER = re.compile(r"ERROR|WARN|FATAL|SEVERE|CRITICAL|Exception|Error|GC|Pause|ool|onnection|ime|IME|eadline")
+_MINUTE = re.compile(r"^(.*?\d{1,2}:\d{2}):\d{2}")
+_SIG_NUMBER = re.compile(r"\b(?:0x[0-9a-fA-F]+|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|\d+(?:\.\d+)?)\b")
+_SIG_QUOTED = re.compile(r"(['\"]).*?\1")
+
+# error_lines counts each line once however many signals it carries; the per-kind counters are for the table
+SERIES_FIELDS = (
+    "lines", "error_lines", "errors", "warnings", "exceptions", "timeouts", "pool_exhaustion", "gc_pauses", "gc_max_ms",
+)
+
+
+def _minute_key(timestamp: Optional[str]) -> Optional[str]:
+    if not timestamp:
+        return None
+    match = _MINUTE.match(timestamp)
+    return match.group(1).replace("T", " ") if match else None
+
+
+def _signature(exception: str, message: Optional[str]) -> str:
+    """Exception class plus its message with ids, numbers and quoted values masked."""
+    if not message:
+        return exception
+    message = _SIG_QUOTED.sub("'…'", message.strip())
+    return f"{exception}: {_SIG_NUMBER.sub('N', message)[:120]}"
+
+
+class _Window:
+    __slots__ = ("minute", "lines", "events", "after")
+
+    def __init__(self, minute: str, lines: List[str]):
+        self.minute = minute
+        self.lines = lines
+        self.events = 0
+        self.after = CONTEXT_LINES_AFTER
+
+
+class LogSignalExtractor:
+    """
+    Single streaming pass over a log: per-minute event counts, exception
+    signatures, GC pauses, and context windows around error lines. Windows
+    are kept for the minutes with the most error events only, so memory
+    stays bounded on multi-GB logs. Lines before the first timestamp are
+    bucketed per LINES_PER_BUCKET lines, so unstamped logs still get bursts.
+    """
+
+    def __init__(self):
+        self.total_lines = 0
+        self.series: Dict[str, Dict[str, float]] = {}
+        self.signatures: Counter = Counter()
+        self.gc_total_ms = 0.0
+        self._minute = ""
+        self.timestamped = False
+        self._before: Deque[str] = deque(maxlen=max(CONTEXT_LINES_BEFORE, 0))
+        self._window: Optional[_Window] = None
+        self._windows: Dict[str, List[_Window]] = {}
+
+    def _bucket(self) -> Dict[str, float]:
+        bucket = self.series.get(self._minute)
+        if bucket is None:
+            bucket = self.series[self._minute] = dict.fromkeys(SERIES_FIELDS, 0)
+        return bucket
+
+    def add_line(self, line: str) -> None:
+        line = line.rstrip("\r\n")
+        self.total_lines += 1
+        minute = _minute_key(split_timestamp(line)[0])
+        if minute:
+            # Lines without a timestamp (stack frames) belong to the last stamped minute
+            self._minute = minute
+            self.timestamped = True
+        elif not self.timestamped and (self.total_lines - 1) % max(LINES_PER_BUCKET, 1) == 0:
+            self._minute = f"lines {self.total_lines}-{self.total_lines + max(LINES_PER_BUCKET, 1) - 1}"
+        bucket = self._bucket()
+        bucket["lines"] += 1
+
+        is_error = False
+        matches = _SIGNALS.finditer(line) if _TRIGGER.search(line) else ()
+        for match in matches:
+            if match.group("level"):
+                level = match.group("level")
+                if level.startswith("WARN"):
+                    bucket["warnings"] += 1
+                else:
+                    bucket["errors"] += 1
+                    is_error = True
+            elif match.group("exception"):
+                exception = match.group("exception")
+                bucket["exceptions"] += 1
+                is_error = True
+                if "Timeout" in exception:
+                    bucket["timeouts"] += 1
+                signature = _signature(exception, match.group("message"))
+                if signature in self.signatures or len(self.signatures) < MAX_SIGNATURES:
+                    self.signatures[signature] += 1
+                else:
+                    self.signatures[OTHER_SIGNATURE] += 1
+            elif match.group("gc"):
+                pause = float(match.group("gc_ms"))
+                bucket["gc_pauses"] += 1
+                bucket["gc_max_ms"] = max(bucket["gc_max_ms"], pause)
+                self.gc_total_ms += pause
+            elif match.group("pool"):
+                bucket["pool_exhaustion"] += 1
+                is_error = True
+            elif match.group("timeout"):
+                bucket["timeouts"] += 1
+                is_error = True
+
+        if is_error:
+            bucket["error_lines"] += 1
+        self._track_window(line[:MAX_LINE_CHARS], is_error)
+
+    def _track_window(self, line: str, is_error: bool) -> None:
+        window = self._window
+        if window is not None:
+            window.lines.append(line)
+            if is_error:
+                window.events += 1
+                window.after = CONTEXT_LINES_AFTER
+            else:
+                window.after -= 1
+            if window.after <= 0 or len(window.lines) >= MAX_WINDOW_LINES:
+                self._close_window()
+        elif is_error:
+            window = _Window(self._minute, list(self._before) + [line])
+            window.events = 1
+            self._window = window
+            self._before.clear()
+            return
+        if self._window is None:
+            self._before.append(line)
+
+    def _close_window(self) -> None:
+        window, self._window = self._window, None
+        kept = self._windows.setdefault(window.minute, [])
+        if len(kept) < WINDOWS_PER_MINUTE:
+            kept.append(window)
+        if len(self._windows) > 4 * MAX_WINDOWS:
+            # Drop the windows of the quietest minutes; bursts are what gets sent on
+            ranked = sorted(self._windows, key=lambda m: self._error_events(self.series.get(m, {})), reverse=True)
+            for minute in ranked[2 * MAX_WINDOWS:]:
+                del self._windows[minute]
+
+    @staticmethod
+    def _error_events(bucket: Dict[str, float]) -> float:
+        return bucket.get("error_lines", 0)
+
+    def bursts(self) -> List[str]:
+        """Minutes whose error lines stand out, busiest first (the busiest minute if none does)."""
+        events = {minute: self._error_events(bucket) for minute, bucket in self.series.items()}
+        if not any(events.values()):
+            return []
+        threshold = max(BURST_MIN_EVENTS, BURST_FACTOR * median(events.values()))
+        ranked = sorted(events, key=events.get, reverse=True)
+        return [m for m in ranked if events[m] >= threshold] or ranked[:1]
+
+    def finish(self) -> Dict:
+        if self._window is not None:
+            self._close_window()
+        burst_minutes = self.bursts()
+        windows: List[_Window] = []
+        for minute in burst_minutes:
+            windows.extend(self._windows.get(minute, []))
+            if len(windows) >= MAX_WINDOWS:
+                break
+        order = {minute: idx for idx, minute in enumerate(self.series)}
+        windows = sorted(windows[:MAX_WINDOWS], key=lambda w: order.get(w.minute, 0))
+        return {
+            "total_lines": self.total_lines,
+            "bucket": "minute" if self.timestamped else "lines",
+            "series": [dict(bucket, minute=minute) for minute, bucket in self.series.items()],
+            "totals": {
+                field: sum(bucket[field] for bucket in self.series.values()) for field in SERIES_FIELDS if field != "gc_max_ms"
+            },
+            "gc_total_ms": self.gc_total_ms,
+            "gc_max_ms": max((bucket["gc_max_ms"] for bucket in self.series.values()), default=0),
+            "top_exceptions": self.signatures.most_common(15),
+            "bursts": [
+                {"minute": minute, "events": self._error_events(self.series[minute])} for minute in burst_minutes
+            ],
+            "windows": [{"minute": w.minute, "events": w.events, "text": "\n".join(w.lines)} for w in windows],
+        }
+
+
+def extract_log_signals(path: str) -> Dict:
+    extractor = LogSignalExtractor()
+    with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+        for line in fh:
+            extractor.add_line(line)
+    return extractor.finish()
+
+
+def _merge_series(rows: List[Dict], max_rows: int, unit: str = "m") -> List[Dict]:
+    if len(rows) <= max_rows:
+        return rows
+    group = -(-len(rows) // max_rows)
+    merged = []
+    for i in range(0, len(rows), group):
+        part = rows[i:i + group]
+        row = {field: sum(r[field] for r in part) for field in SERIES_FIELDS}
+        row["gc_max_ms"] = max(r["gc_max_ms"] for r in part)
+        row["minute"] = f"{part[0]['minute']} (+{len(part) - 1}{unit})" if len(part) > 1 else part[0]["minute"]
+        merged.append(row)
+    return merged
+
+
+def format_log_signals(signals: Dict) -> str:
+    """Compact Markdown block of the extracted signals (windows are sent separately)."""
+    totals = signals["totals"]
+    by_minute = signals.get("bucket", "minute") == "minute"
+    period = "minute" if by_minute else f"{LINES_PER_BUCKET} lines (no timestamps found)"
+    lines = [
+        f"Log signals extracted locally ({signals['total_lines']} lines, {len(signals['series'])} "
+        f"{'minutes' if by_minute else 'line buckets'}).",
+        f"Error lines: {totals['error_lines']:.0f} | Errors: {totals['errors']:.0f} | Warnings: {totals['warnings']:.0f} | Exceptions: {totals['exceptions']:.0f} | "
+        f"Timeouts: {totals['timeouts']:.0f} | Pool exhaustion: {totals['pool_exhaustion']:.0f} | "
+        f"GC pauses: {totals['gc_pauses']:.0f} (max {signals['gc_max_ms']:.0f} ms, total {signals['gc_total_ms']:.0f} ms)",
+        "",
+        f"Events per {period}:",
+        f"| {'Minute' if by_minute else 'Lines range'} | Lines | Errors | Warnings | Exceptions | Timeouts | Pool | GC pauses | Max GC ms |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in _merge_series(signals["series"], MAX_SERIES_ROWS, "m" if by_minute else " buckets"):
+        lines.append(
+            f"| {r['minute']} | {r['lines']:.0f} | {r['errors']:.0f} | {r['warnings']:.0f} | {r['exceptions']:.0f} | "
+            f"{r['timeouts']:.0f} | {r['pool_exhaustion']:.0f} | {r['gc_pauses']:.0f} | {r['gc_max_ms']:.0f} |"
+        )
+    if signals["top_exceptions"]:
+        lines += ["", "Top exception signatures:", "| Count | Signature |", "|---|---|"]
+        lines += [f"| {count} | {signature} |" for signature, count in signals["top_exceptions"]]
+    if signals["bursts"]:
+        bursts = ", ".join(f"{b['minute']} ({b['events']:.0f})" for b in signals["bursts"][:10])
+        lines += ["", f"Error bursts ({'minute' if by_minute else 'lines'}, error lines): {bursts}"]
+    return "\n".join(lines)
+
+
+def format_windows(signals: Dict) -> str:
+    """The context windows around error bursts, as text for the chunk summarizer."""
+    return "\n".join(
+        f"--- Window {idx + 1}: {w['minute']} ({w['events']} error lines) ---\n{w['text']}"
+        for idx, w in enumerate(signals["windows"])
+    )
@@ -0,0 +1,185 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+WILDCARD = "<*>"
+
+# Leading timestamps are split off before mining so they never become template tokens
+_TIMESTAMP_PATTERNS = [
+    re.compile(r"^\[?(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?)\]?\s*"),
+    re.compile(r"^\[?(\d{2}/[A-Za-z]{3}/\d{4}:\d{2}:\d{2}:\d{2}(?: [+-]\d{4})?)\]?\s*"),
+    re.compile(r"^\[?(\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)\]?\s+"),
+]
+
+# Tokens that are almost certainly values rather than message text
+_VARIABLE_TOKEN = re.compile(
+    r"^(?:"
+    r"[-+]?\d+(?:[.,:]\d+)*[A-Za-z%]{0,3}"  # numbers, durations (12ms), percentages
+    r"|0x[0-9a-fA-F]+"  # hex addresses
+    r"|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"  # UUIDs
+    r"|(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?"  # IPv4 (with port)
+    r"|[0-9a-fA-F]{16,}"  # long hex ids / hashes
+    r")[,;:)\]]?$"
+)
+_HAS_DIGIT = re.compile(r"\d")
+
+
+def split_timestamp(line: str) -> Tuple[Optional[str], str]:
+    """Return (timestamp, rest) when the line starts with a recognizable timestamp."""
+    for pattern in _TIMESTAMP_PATTERNS:
+        match = pattern.match(line)
+        if match:
+            return match.group(1), line[match.end():]
+    return None, line
+
+
+class LogTemplate:
+    __slots__ = ("tokens", "count", "first_seen", "last_seen", "samples")
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.count = 0
+        self.first_seen: Optional[str] = None
+        self.last_seen: Optional[str] = None
+        self.samples: Dict[int, List[str]] = {}
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+
+class DrainMiner:
+    """
+    Online log template miner following the Drain algorithm (He et al., 2017).
+
+    Lines are routed through a fixed-depth prefix tree keyed by token count and
+    the first `depth` tokens; within a leaf the most similar template above
+    `similarity_threshold` absorbs the line, turning differing positions into <*>.
+    Memory is bounded by `max_templates`; lines that would need a new template
+    beyond that cap are only counted in `unmatched_lines`.
+    """
+
+    def __init__(
+        self,
+        *,
+        depth: int = 4,
+        similarity_threshold: float = 0.5,
+        max_children: int = 100,
+        max_templates: int = 5000,
+        max_samples: int = 3,
+    ):
+        self.depth = max(depth, 1)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.max_templates = max_templates
+        self.max_samples = max_samples
+        self.templates: List[LogTemplate] = []
+        self.total_lines = 0
+        self.unmatched_lines = 0
+        self._root: Dict = {}
+        # Exact masked-line fast path; most repeated lines never touch the tree
+        self._exact: Dict[str, LogTemplate] = {}
+
+    def add_line(self, line: str) -> Optional[LogTemplate]:
+        line = line.strip()
+        if not line:
+            return None
+        self.total_lines += 1
+        timestamp, message = split_timestamp(line)
+        raw_tokens = message.split()
+        if not raw_tokens:
+            return None
+        tokens = [WILDCARD if _VARIABLE_TOKEN.match(t) else t for t in raw_tokens]
+
+        masked = " ".join(tokens)
+        template = self._exact.get(masked)
+        if template is None:
+            template = self._match(tokens)
+            if template is None:
+                self.unmatched_lines += 1
+                return None
+            if len(self._exact) < self.max_templates * 10:
+                self._exact[masked] = template
+
+        template.count += 1
+        if timestamp:
+            if template.first_seen is None:
+                template.first_seen = timestamp
+            template.last_seen = timestamp
+        for pos, token in enumerate(template.tokens):
+            if token == WILDCARD:
+                values = template.samples.setdefault(pos, [])
+                if len(values) < self.max_samples and raw_tokens[pos] not in values:
+                    values.append(raw_tokens[pos])
+        return template
+
+    def add_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.add_line(line)
+
+    def _leaf(self, tokens: List[str]) -> List[LogTemplate]:
+        node = self._root.setdefault(len(tokens), {})
+        for token in tokens[: self.depth]:
+            key = WILDCARD if _HAS_DIGIT.search(token) else token
+            if key not in node:
+                key = key if len(node) < self.max_children else WILDCARD
+            node = node.setdefault(key, {})
+        return node.setdefault("", [])
+
+    def _match(self, tokens: List[str]) -> Optional[LogTemplate]:
+        leaf = self._leaf(tokens)
+        best: Optional[LogTemplate] = None
+        best_score = (-1.0, -1)
+        for candidate in leaf:
+            same = 0
+            params = 0
+            for a, b in zip(candidate.tokens, tokens):
+                if a == WILDCARD:
+                    params += 1
+                elif a == b:
+                    same += 1
+            score = (same / len(tokens), params)
+            if score > best_score:
+                best, best_score = candidate, score
+
+        if best is not None and best_score[0] >= self.similarity_threshold:
+            for pos, (a, b) in enumerate(zip(best.tokens, tokens)):
+                if a != b and a != WILDCARD:
+                    best.tokens[pos] = WILDCARD
+            return best
+
+        if len(self.templates) >= self.max_templates:
+            return None
+        template = LogTemplate(list(tokens))
+        leaf.append(template)
+        self.templates.append(template)
+        return template
+
+    def top_templates(self, limit: Optional[int] = None) -> List[LogTemplate]:
+        ranked = sorted(self.templates, key=lambda t: t.count, reverse=True)
+        return ranked[:limit] if limit else ranked
+
+
+def format_template_table(miner: DrainMiner, max_rows: int = 300) -> str:
+    """Render mined templates as a compact table, most frequent first."""
+    ranked = miner.top_templates()
+    lines = [
+        f"Log compacted locally: {miner.total_lines} lines -> {len(ranked)} templates. "
+        f"{WILDCARD} marks variable fields.",
+        "count | first_seen | last_seen | template | sample values",
+    ]
+    for template in ranked[:max_rows]:
+        samples = "; ".join(
+            f"{WILDCARD}{n + 1}=" + " / ".join(values)
+            for n, (_, values) in enumerate(sorted(template.samples.items()))
+            if values
+        )
+        lines.append(
+            f"{template.count} | {template.first_seen or '-'} | {template.last_seen or '-'} | "
+            f"{template.template} | {samples or '-'}"
+        )
+    if len(ranked) > max_rows:
+        rest = ranked[max_rows:]
+        lines.append(f"... {len(rest)} rarer templates covering {sum(t.count for t in rest)} lines omitted")
+    if miner.unmatched_lines:
+        lines.append(f"... {miner.unmatched_lines} lines not templated (template cap reached)")
+    return "\n".join(lines)
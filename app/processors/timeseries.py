@@ -0,0 +1,203 @@
+import os
+import re
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Points kept per series after shape-preserving downsampling
+TIMESERIES_POINTS = int(os.getenv("TIMESERIES_POINTS", "60"))
+TIMESERIES_MAX_SERIES = int(os.getenv("TIMESERIES_MAX_SERIES", "12"))
+TIMESERIES_CHUNK_ROWS = int(os.getenv("TIMESERIES_CHUNK_ROWS", "200000"))
+# Series longer than this are min/max-reduced while reading, so memory stays bounded
+PRE_REDUCE_POINTS = 20_000
+MIN_PARSED_SHARE = 0.9
+
+_TIME_COLUMN = re.compile(r"time|date|^ts$|epoch", re.IGNORECASE)
+_EPOCH = pd.Timestamp(0, tz="UTC")
+
+
+def _to_seconds(column: pd.Series) -> np.ndarray:
+    """Epoch seconds from epoch s/ms numbers or date strings; NaN where unparseable."""
+    numeric = pd.to_numeric(column, errors="coerce")
+    if numeric.notna().mean() >= MIN_PARSED_SHARE:
+        values = numeric.to_numpy(dtype=float)
+        median = np.nanmedian(values)
+        # Numbers are only timestamps as epoch seconds/ms after 2001 (durations like response_time are not)
+        if median < 1e9:
+            return np.full(len(values), np.nan)
+        return values / 1000.0 if median > 1e11 else values
+    with warnings.catch_warnings():
+        # The format is inferred from the first value and applied vectorized; others become NaT
+        warnings.simplefilter("ignore", UserWarning)
+        parsed = pd.to_datetime(column, errors="coerce", utc=True)
+    return ((parsed - _EPOCH) / pd.Timedelta(seconds=1)).to_numpy(dtype=float, na_value=np.nan)
+
+
+def _parses(values: np.ndarray) -> bool:
+    return len(values) > 0 and np.isfinite(values).mean() >= MIN_PARSED_SHARE
+
+
+def detect_series_columns(sample: pd.DataFrame) -> Optional[Tuple[str, List[str]]]:
+    """
+    Return (timestamp column, numeric columns) for a monitoring export, or None
+    when no column parses as time or nothing numeric is left to plot.
+    """
+    candidates = [c for c in sample.columns if _TIME_COLUMN.search(str(c))] + list(sample.columns[:1])
+    time_column = next((c for c in candidates if _parses(_to_seconds(sample[c]))), None)
+    if time_column is None:
+        return None
+    numeric = [
+        c for c in sample.columns
+        if c != time_column and pd.to_numeric(sample[c], errors="coerce").notna().mean() >= 0.5
+    ]
+    return (time_column, numeric[:TIMESERIES_MAX_SERIES]) if numeric else None
+
+
+def minmax_downsample(x: np.ndarray, y: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the minimum and maximum of each of `buckets` equal-count buckets, in order."""
+    if len(x) <= 2 * buckets:
+        return x, y
+    keep = []
+    for part in np.array_split(np.arange(len(x)), buckets):
+        lo, hi = part[np.argmin(y[part])], part[np.argmax(y[part])]
+        keep.extend((lo, hi) if lo <= hi else (hi, lo))
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+
+def lttb_downsample(x: np.ndarray, y: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last point and, per
+    bucket, the point spanning the largest triangle with its neighbours, so
+    spikes and dips survive where plain striding would skip them.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    keep = [0]
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        # Next bucket's average (the last point for the final bucket)
+        nxt_start, nxt_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nxt_start:nxt_end].mean(), y[nxt_start:nxt_end].mean()
+        ax, ay = x[keep[-1]], y[keep[-1]]
+        area = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        keep.append(start + int(np.argmax(area)))
+    keep.append(n - 1)
+    return x[keep], y[keep]
+
+
+class _Series:
+    """Points of one column, min/max-reduced whenever they outgrow PRE_REDUCE_POINTS."""
+
+    def __init__(self):
+        self.x: List[np.ndarray] = []
+        self.y: List[np.ndarray] = []
+        self.size = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = (np.inf, 0.0)
+        self.max = (-np.inf, 0.0)
+
+    def add(self, x: np.ndarray, y: np.ndarray) -> None:
+        mask = np.isfinite(x) & np.isfinite(y)
+        x, y = x[mask], y[mask]
+        if not len(x):
+            return
+        self.count += len(y)
+        self.total += float(y.sum())
+        lo, hi = int(np.argmin(y)), int(np.argmax(y))
+        if y[lo] < self.min[0]:
+            self.min = (float(y[lo]), float(x[lo]))
+        if y[hi] > self.max[0]:
+            self.max = (float(y[hi]), float(x[hi]))
+        self.x.append(x)
+        self.y.append(y)
+        self.size += len(x)
+        if self.size > PRE_REDUCE_POINTS:
+            reduced = minmax_downsample(*self.points(), PRE_REDUCE_POINTS // 4)
+            self.x, self.y = [reduced[0]], [reduced[1]]
+            self.size = len(reduced[0])
+
+    def points(self) -> Tuple[np.ndarray, np.ndarray]:
+        x, y = np.concatenate(self.x), np.concatenate(self.y)
+        order = np.argsort(x, kind="stable")
+        return x[order], y[order]
+
+
+def reduce_timeseries_csv(path: str, points: int = TIMESERIES_POINTS, chunk_rows: int = TIMESERIES_CHUNK_ROWS) -> Optional[Dict]:
+    """
+    Read a metrics CSV in chunks and downsample every numeric column against
+    the detected timestamp column to `points` points (min/max buckets while
+    reading, LTTB at the end). Returns None if the file is not a time series.
+    """
+    sample = pd.read_csv(path, nrows=1000, on_bad_lines="skip")
+    columns = detect_series_columns(sample)
+    if columns is None:
+        return None
+    time_column, value_columns = columns
+    series = {column: _Series() for column in value_columns}
+    rows = 0
+    start, end = np.inf, -np.inf
+    reader = pd.read_csv(
+        path, usecols=[time_column, *value_columns], chunksize=max(chunk_rows, 1), on_bad_lines="skip", low_memory=True
+    )
+    for chunk in reader:
+        rows += len(chunk)
+        x = _to_seconds(chunk[time_column])
+        if np.isfinite(x).any():
+            start, end = min(start, np.nanmin(x)), max(end, np.nanmax(x))
+        for column, acc in series.items():
+            acc.add(x, pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=float))
+    if not np.isfinite(start):
+        return None
+
+    result = []
+    for column, acc in series.items():
+        if not acc.count:
+            continue
+        x, y = lttb_downsample(*acc.points(), points)
+        result.append({
+            "name": str(column),
+            "count": acc.count,
+            "mean": acc.total / acc.count,
+            "min": acc.min[0],
+            "min_at": acc.min[1] - start,
+            "max": acc.max[0],
+            "max_at": acc.max[1] - start,
+            "last": float(y[-1]),
+            "points": [(float(t - start), float(v)) for t, v in zip(x, y)],
+        })
+    if not result:
+        return None
+    return {
+        "time_column": str(time_column),
+        "rows": rows,
+        "start": float(start),
+        "span_s": float(end - start),
+        "resolution_s": float(end - start) / max(rows - 1, 1),
+        "series": result,
+    }
+
+
+def _value(value: float) -> str:
+    return format(value, ".4g")
+
+
+def format_timeseries(reduced: Dict) -> str:
+    """Compact text block: per-series stats and `offset_s value` points."""
+    start = pd.Timestamp(reduced["start"], unit="s", tz="UTC").strftime("%Y-%m-%d %H:%M:%S UTC")
+    lines = [
+        f"Time series reduced locally from {reduced['rows']} rows (start {start}, span {reduced['span_s']:.0f}s, "
+        f"~{reduced['resolution_s']:.3g}s resolution). Points are `offset_s value`, downsampled with LTTB so peaks are kept.",
+    ]
+    for s in reduced["series"]:
+        lines.append(
+            f"- {s['name']}: min {_value(s['min'])} at +{s['min_at']:.0f}s, mean {_value(s['mean'])}, "
+            f"max {_value(s['max'])} at +{s['max_at']:.0f}s, last {_value(s['last'])}"
+        )
+        lines.append("  " + ", ".join(f"{t:.0f} {_value(v)}" for t, v in s["points"]))
+    return "\n".join(lines)
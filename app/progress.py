@@ -1,42 +1,177 @@
+import logging
+import os
 import threading
 import time
 import uuid
-from typing import Any, Dict, List, Optional
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.progress_store import FINISHED_STATUSES, ProgressStore, create_progress_store
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs are swept at most this often (on job creation)
+EVICTION_INTERVAL_SECONDS = 60.0
+# Posted updates waiting per job before further ones are coalesced into them
+MAX_PENDING_UPDATES = int(os.getenv("PROGRESS_MAX_PENDING_UPDATES", "256"))
+WRITE_BATCH_UPDATES = 16
+
+
+def merge_events(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Coalesce consecutive delta events into one (later values win, logs concatenate)."""
+    job: Dict[str, Any] = {}
+    files: Dict[int, Dict[str, Any]] = {}
+    logs: List[str] = []
+    for event in events:
+        job.update(event.get("job") or {})
+        for idx, changes in (event.get("files") or {}).items():
+            files.setdefault(idx, {}).update(changes)
+        logs.extend(event.get("logs") or [])
+    merged: Dict[str, Any] = {"seq": events[-1]["seq"] if events else 0, "job": job}
+    if files:
+        merged["files"] = [dict(changes, index=idx) for idx, changes in sorted(files.items())]
+    if logs:
+        merged["logs"] = logs
+    return merged
+
 
 class ProgressManager:
-    def __init__(self):
-        self._jobs: Dict[str, Dict[str, Any]] = {}
-        self._lock = threading.Lock()
+    """
+    Job progress facade used by the API and the pipeline. Every change is kept
+    both in the job snapshot (for polling) and as a sequence-numbered delta
+    event (for streaming); where it is kept is up to the ProgressStore.
+    """
+
+    def __init__(self, store: Optional[ProgressStore] = None):
+        self.store = store or create_progress_store()
+        self._last_eviction = 0.0
+        # Posted updates per job, and the jobs that have some, in posting order
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._ready: Deque[str] = deque()
+        self._writing: Optional[str] = None
+        self._cond = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+
+    def _write_pending(self) -> None:
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                job_id = self._ready.popleft()
+                # Jobs take turns a few updates at a time, so a busy job can't hold up the others
+                pending = self._pending[job_id]
+                batch, pending[:] = pending[:WRITE_BATCH_UPDATES], pending[WRITE_BATCH_UPDATES:]
+                if pending:
+                    self._ready.append(job_id)
+                else:
+                    del self._pending[job_id]
+                self._writing = job_id
+            for kwargs in batch:
+                try:
+                    self.update(job_id, **kwargs)
+                except Exception as exc:
+                    logger.warning("Progress update for job %s failed: %s", job_id, exc)
+            with self._cond:
+                self._writing = None
+                self._cond.notify_all()
+
+    @staticmethod
+    def _coalesce(pending: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> bool:
+        """
+        Fold kwargs into the latest pending update for the same file (later values
+        win, logs join) and move it last, so job-level fields still end up newest.
+        """
+        target = (kwargs.get("file_id"), kwargs.get("file_name"))
+        for idx in range(len(pending) - 1, -1, -1):
+            previous = pending[idx]
+            if (previous.get("file_id"), previous.get("file_name")) == target:
+                logs = [log for log in (previous.get("log"), kwargs.get("log")) if log]
+                previous.update({k: v for k, v in kwargs.items() if v is not None})
+                previous["log"] = "\n".join(logs) or None
+                pending.append(pending.pop(idx))
+                return True
+        return False
+
+    def post_update(self, job_id: str, **kwargs: Any) -> None:
+        """
+        Queue an update() for the writer thread and return at once, so code on
+        an event loop never waits on the store (SQLite locks, fsync). A job's
+        updates are applied in the order they were posted; past
+        PROGRESS_MAX_PENDING_UPDATES waiting ones they are coalesced per file.
+        """
+        with self._cond:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_pending, name="progress-writer", daemon=True)
+                self._writer.start()
+            pending = self._pending.get(job_id)
+            if pending is None:
+                pending = self._pending[job_id] = []
+                self._ready.append(job_id)
+            if len(pending) < MAX_PENDING_UPDATES or not self._coalesce(pending, kwargs):
+                pending.append(kwargs)
+            self._cond.notify_all()
+
+    def flush(self, job_id: str) -> None:
+        """Block until every update posted for job_id has been written (other jobs' are not waited for)."""
+        if threading.current_thread() is self._writer:
+            return
+        with self._cond:
+            while job_id in self._pending or self._writing == job_id:
+                self._cond.wait()
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        if now - self._last_eviction < EVICTION_INTERVAL_SECONDS:
+            return
+        self._last_eviction = now
+        try:
+            evicted = self.store.evict_expired(now)
+        except Exception as exc:
+            logger.warning("Progress job eviction failed: %s", exc)
+            return
+        if evicted:
+            logger.info("Evicted %s finished progress jobs", evicted)
 
     def create_job(self, files: List[Dict]) -> str:
+        self._evict_expired()
         job_id = str(uuid.uuid4())
-        with self._lock:
-            self._jobs[job_id] = {
-                "status": "running",
+        self.store.create(
+            job_id,
+            {
+                "status": "queued",
                 "stage": "initializing",
                 "progress": 0,
                 "step": "queued",
-                "message": "Starting analysis",
-                "files": [
-                    {
-                        "file_id": f.get("file_id"),
-                        "name": f.get("name"),
-                        "file_type": f.get("file_type", "unknown"),
-                        "size_bytes": f.get("size_bytes"),
-                        "progress": 0,
-                        "status": "pending",
-                        "chunk_index": 0,
-                        "chunk_total": 0,
-                        "message": f.get("source_zip", "") or "",
-                    }
-                    for f in files
-                ],
-                "logs": [],
+                "message": "Waiting for a free analysis slot",
+                "queue_position": None,
+                "estimated_start_at": None,
                 "result": None,
                 "updated_at": time.time(),
-            }
+            },
+            [
+                {
+                    "file_id": f.get("file_id"),
+                    "name": f.get("name"),
+                    "file_type": f.get("file_type", "unknown"),
+                    "size_bytes": f.get("size_bytes"),
+                    "progress": 0,
+                    "status": "pending",
+                    "chunk_index": 0,
+                    "chunk_total": 0,
+                    "message": f.get("source_zip", "") or "",
+                }
+                for f in files
+            ],
+        )
         return job_id
 
+    def start(self, job_id: str) -> None:
+        """Mark a queued job as picked up by a worker."""
+        self.store.apply(
+            job_id,
+            {"status": "running", "message": "Starting analysis", "queue_position": 0, "estimated_start_at": time.time()},
+        )
+
     def update(
         self,
         job_id: str,
@@ -53,66 +188,67 @@ class ProgressManager:
         chunk_total: Optional[int] = None,
         log: Optional[str] = None,
     ) -> None:
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
-                return
-            if progress is not None:
-                job["progress"] = max(job.get("progress", 0), min(progress, 100))
-            if step:
-                job["step"] = step
-                job["stage"] = stage or step
-            elif stage:
-                job["stage"] = stage
-            if message:
-                job["message"] = message
-            if log:
-                ts = time.strftime("%H:%M:%S")
-                job["logs"].append(f"[{ts}] {log}")
-                job["logs"] = job["logs"][-200:]  # cap
-            if file_name or file_id:
-                for f in job["files"]:
-                    if (file_id and f.get("file_id") == file_id) or (file_name and f.get("name") == file_name):
-                        if file_progress is not None:
-                            f["progress"] = max(f.get("progress", 0), min(file_progress, 100))
-                        if file_status:
-                            f["status"] = file_status
-                        if chunk_index is not None:
-                            f["chunk_index"] = chunk_index
-                        if chunk_total is not None:
-                            f["chunk_total"] = chunk_total
-                        if message:
-                            f["message"] = message
-                        break
-            job["updated_at"] = time.time()
+        changes: Dict[str, Any] = {}
+        if progress is not None:
+            changes["progress"] = progress
+        if step:
+            changes["step"] = step
+            changes["stage"] = stage or step
+        elif stage:
+            changes["stage"] = stage
+        if message:
+            changes["message"] = message
+
+        file_changes: Dict[str, Any] = {}
+        if file_progress is not None:
+            file_changes["progress"] = file_progress
+        if file_status:
+            file_changes["status"] = file_status
+        if chunk_index is not None:
+            file_changes["chunk_index"] = chunk_index
+        if chunk_total is not None:
+            file_changes["chunk_total"] = chunk_total
+        if message:
+            file_changes["message"] = message
+
+        self.store.apply(
+            job_id,
+            changes,
+            file_id=file_id,
+            file_name=file_name,
+            file_changes=file_changes,
+            log=f"[{time.strftime('%H:%M:%S')}] {log}" if log else None,
+        )
 
     def set_result(self, job_id: str, result: Dict[str, Any]) -> None:
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
-                return
-            job["status"] = "completed"
-            job["progress"] = 100
-            job["step"] = "completed"
-            job["message"] = "Analysis complete"
-            job["result"] = result
-            job["updated_at"] = time.time()
+        # Posted updates must not land after the final state
+        self.flush(job_id)
+        self.store.apply(
+            job_id,
+            {"status": "completed", "progress": 100, "step": "completed", "message": "Analysis complete", "result": result},
+        )
 
     def fail(self, job_id: str, message: str) -> None:
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
-                return
-            job["status"] = "failed"
-            job["message"] = message
-            job["progress"] = max(job.get("progress", 0), 100)
-            job["step"] = "failed"
-            job["updated_at"] = time.time()
+        self.flush(job_id)
+        self.store.apply(job_id, {"status": "failed", "message": message, "progress": 100, "step": "failed"})
+
+    def discard(self, job_id: str) -> None:
+        self.flush(job_id)
+        self.store.delete(job_id)
 
     def get(self, job_id: str) -> Optional[Dict[str, Any]]:
-        with self._lock:
-            job = self._jobs.get(job_id)
-            return dict(job) if job else None
+        return self.store.snapshot(job_id)
+
+    def events_since(self, job_id: str, seq: int) -> Optional[Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+        """
+        Delta events after `seq` as (events, snapshot). snapshot is set instead of
+        events when `seq` is older than the buffered history (or 0), so the
+        client must replace its state. Returns None for unknown jobs.
+        """
+        return self.store.events_since(job_id, seq)
+
+    def status(self, job_id: str) -> Optional[str]:
+        return self.store.status(job_id)
 
 
 progress_manager = ProgressManager()
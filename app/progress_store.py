@@ -0,0 +1,440 @@
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Micro-log lines kept per job (oldest dropped first)
+MAX_LOG_LINES = 200
+# Delta events kept per job for resuming streams; older cursors get a fresh snapshot
+EVENT_BUFFER_SIZE = int(os.getenv("PROGRESS_EVENT_BUFFER", "2000"))
+# Finished jobs (and their results) are evicted this long after completion
+JOB_TTL_SECONDS = float(os.getenv("PROGRESS_JOB_TTL_SECONDS", "3600"))
+
+FINISHED_STATUSES = {"completed", "failed"}
+
+EventsSince = Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def apply_job_changes(state: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply changes to a job state in place, keeping progress monotonic. Returns what changed."""
+    changes = dict(changes)
+    if "progress" in changes:
+        value = max(state.get("progress", 0), min(changes["progress"], 100))
+        if value == state.get("progress"):
+            del changes["progress"]
+        else:
+            changes["progress"] = value
+    if changes.get("status") in FINISHED_STATUSES:
+        changes.setdefault("finished_at", time.time())
+    changes["updated_at"] = time.time()
+    state.update(changes)
+    return changes
+
+
+def apply_file_changes(entry: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Same as apply_job_changes for one file entry; the returned delta carries file_id."""
+    changes = dict(changes)
+    if "progress" in changes:
+        value = max(entry.get("progress", 0), min(changes["progress"], 100))
+        if value == entry.get("progress"):
+            del changes["progress"]
+        else:
+            changes["progress"] = value
+    entry.update(changes)
+    if changes:
+        changes["file_id"] = entry.get("file_id")
+    return changes
+
+
+def make_event(seq: int, job: Dict[str, Any], file_idx: Optional[int],
+               file_changes: Dict[str, Any], log: Optional[str]) -> Dict[str, Any]:
+    event: Dict[str, Any] = {"seq": seq, "job": job}
+    if file_changes:
+        event["files"] = {file_idx: file_changes}
+    if log:
+        event["logs"] = [log]
+    return event
+
+
+class ProgressStore(ABC):
+    """
+    Backend for ProgressManager. Jobs are a state dict, an ordered file list,
+    a bounded micro-log and a bounded sequence of delta events. apply() must be
+    atomic per job; the remaining methods only read. A shared store (SQLite
+    file, Redis, ...) lets any worker process serve any job.
+    """
+
+    @abstractmethod
+    def create(self, job_id: str, state: Dict[str, Any], files: List[Dict[str, Any]]) -> None:
+        """Store a new job."""
+
+    @abstractmethod
+    def apply(
+        self,
+        job_id: str,
+        changes: Dict[str, Any],
+        *,
+        file_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        file_changes: Optional[Dict[str, Any]] = None,
+        log: Optional[str] = None,
+    ) -> bool:
+        """Update a job (and optionally one file, matched by id then name) and record the delta event."""
+
+    @abstractmethod
+    def snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Full job state with files, logs and current seq; None if unknown."""
+
+    @abstractmethod
+    def events_since(self, job_id: str, seq: int) -> Optional[EventsSince]:
+        """(events after seq, None), or ([], snapshot) when seq predates the buffered events."""
+
+    @abstractmethod
+    def status(self, job_id: str) -> Optional[str]:
+        """Job status without loading files or logs."""
+
+    @abstractmethod
+    def delete(self, job_id: str) -> None:
+        """Drop a job and everything recorded for it."""
+
+    @abstractmethod
+    def evict_expired(self, now: float) -> int:
+        """Drop finished jobs older than the TTL; returns how many were removed."""
+
+
+class _MemoryJob:
+    __slots__ = ("state", "files", "file_index", "name_index", "logs", "events", "seq", "lock")
+
+    def __init__(self, state: Dict[str, Any], files: List[Dict[str, Any]], event_buffer: int):
+        self.state = state
+        self.files = files
+        self.file_index = {f["file_id"]: idx for idx, f in enumerate(files) if f.get("file_id")}
+        self.name_index: Dict[str, int] = {}
+        for idx, f in enumerate(files):
+            self.name_index.setdefault(f.get("name"), idx)
+        self.logs: Deque[str] = deque(maxlen=MAX_LOG_LINES)
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=event_buffer)
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.state, files=[dict(f) for f in self.files], logs=list(self.logs), seq=self.seq)
+
+
+class MemoryProgressStore(ProgressStore):
+    """Process-local store. The table lock only guards lookups; each job has its own lock."""
+
+    def __init__(self, *, event_buffer: int = EVENT_BUFFER_SIZE, ttl_seconds: float = JOB_TTL_SECONDS):
+        self.event_buffer = max(event_buffer, 1)
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, _MemoryJob] = {}
+        self._lock = threading.Lock()
+
+    def _job(self, job_id: str) -> Optional[_MemoryJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def create(self, job_id: str, state: Dict[str, Any], files: List[Dict[str, Any]]) -> None:
+        job = _MemoryJob(state, files, self.event_buffer)
+        with self._lock:
+            self._jobs[job_id] = job
+
+    def apply(self, job_id, changes, *, file_id=None, file_name=None, file_changes=None, log=None) -> bool:
+        job = self._job(job_id)
+        if not job:
+            return False
+        with job.lock:
+            job_delta = apply_job_changes(job.state, changes)
+            file_idx = None
+            file_delta: Dict[str, Any] = {}
+            if file_id and file_id in job.file_index:
+                file_idx = job.file_index[file_id]
+            elif file_name:
+                file_idx = job.name_index.get(file_name)
+            if file_idx is not None and file_changes:
+                file_delta = apply_file_changes(job.files[file_idx], file_changes)
+            if log:
+                job.logs.append(log)
+            job.seq += 1
+            job.events.append(make_event(job.seq, job_delta, file_idx, file_delta, log))
+        return True
+
+    def snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._job(job_id)
+        if not job:
+            return None
+        with job.lock:
+            return job.snapshot()
+
+    def events_since(self, job_id: str, seq: int) -> Optional[EventsSince]:
+        job = self._job(job_id)
+        if not job:
+            return None
+        with job.lock:
+            # A new subscriber always starts from a snapshot, even before the first update
+            if seq <= 0:
+                return [], job.snapshot()
+            if seq >= job.seq:
+                return [], None
+            oldest = job.events[0]["seq"] if job.events else job.seq + 1
+            if seq < oldest - 1:
+                return [], job.snapshot()
+            return [e for e in job.events if e["seq"] > seq], None
+
+    def status(self, job_id: str) -> Optional[str]:
+        job = self._job(job_id)
+        return job.state.get("status") if job else None
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def evict_expired(self, now: float) -> int:
+        if self.ttl_seconds <= 0:
+            return 0
+        cutoff = now - self.ttl_seconds
+        with self._lock:
+            doomed = [
+                job_id for job_id, job in self._jobs.items()
+                if job.state.get("finished_at") and job.state["finished_at"] < cutoff
+            ]
+            for job_id in doomed:
+                del self._jobs[job_id]
+        return len(doomed)
+
+
+class SqliteProgressStore(ProgressStore):
+    """
+    SQLite-backed store so several uvicorn workers (or replicas sharing a volume)
+    see the same jobs. Writes run in IMMEDIATE transactions, which serialize
+    updates across processes; WAL keeps readers from blocking writers.
+    """
+
+    def __init__(self, path: Path, *, event_buffer: int = EVENT_BUFFER_SIZE, ttl_seconds: float = JOB_TTL_SECONDS):
+        self.path = Path(path)
+        self.event_buffer = max(event_buffer, 1)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, state TEXT NOT NULL, status TEXT, seq INTEGER NOT NULL,"
+            " finished_at REAL);"
+            "CREATE TABLE IF NOT EXISTS job_files ("
+            " job_id TEXT NOT NULL, idx INTEGER NOT NULL, file_id TEXT, name TEXT, data TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, idx));"
+            "CREATE INDEX IF NOT EXISTS idx_job_files_id ON job_files(job_id, file_id);"
+            "CREATE INDEX IF NOT EXISTS idx_job_files_name ON job_files(job_id, name);"
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " job_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, log TEXT,"
+            " PRIMARY KEY (job_id, seq));"
+            "CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at);"
+        )
+        self._conn = conn
+
+    def _write(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def create(self, job_id: str, state: Dict[str, Any], files: List[Dict[str, Any]]) -> None:
+        def _create(conn):
+            conn.execute(
+                "INSERT INTO jobs (job_id, state, status, seq) VALUES (?, ?, ?, 0)",
+                (job_id, json.dumps(state, default=str), state.get("status")),
+            )
+            conn.executemany(
+                "INSERT INTO job_files (job_id, idx, file_id, name, data) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, idx, f.get("file_id"), f.get("name"), json.dumps(f, default=str)) for idx, f in enumerate(files)],
+            )
+
+        self._write(_create)
+
+    def apply(self, job_id, changes, *, file_id=None, file_name=None, file_changes=None, log=None) -> bool:
+        def _apply(conn) -> bool:
+            row = conn.execute("SELECT state, seq FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            state, seq = json.loads(row[0]), row[1] + 1
+            job_delta = apply_job_changes(state, changes)
+
+            file_idx = None
+            file_delta: Dict[str, Any] = {}
+            if file_changes and (file_id or file_name):
+                file_row = None
+                if file_id:
+                    file_row = conn.execute(
+                        "SELECT idx, data FROM job_files WHERE job_id = ? AND file_id = ? ORDER BY idx LIMIT 1",
+                        (job_id, file_id),
+                    ).fetchone()
+                if file_row is None and file_name:
+                    file_row = conn.execute(
+                        "SELECT idx, data FROM job_files WHERE job_id = ? AND name = ? ORDER BY idx LIMIT 1",
+                        (job_id, file_name),
+                    ).fetchone()
+                if file_row is not None:
+                    file_idx, entry = file_row[0], json.loads(file_row[1])
+                    file_delta = apply_file_changes(entry, file_changes)
+                    conn.execute(
+                        "UPDATE job_files SET data = ? WHERE job_id = ? AND idx = ?",
+                        (json.dumps(entry, default=str), job_id, file_idx),
+                    )
+
+            conn.execute(
+                "UPDATE jobs SET state = ?, status = ?, seq = ?, finished_at = ? WHERE job_id = ?",
+                (json.dumps(state, default=str), state.get("status"), seq, state.get("finished_at"), job_id),
+            )
+            event = make_event(seq, job_delta, file_idx, file_delta, log)
+            conn.execute(
+                "INSERT INTO job_events (job_id, seq, data, log) VALUES (?, ?, ?, ?)",
+                (job_id, seq, json.dumps(event, default=str), log),
+            )
+            # Trim history in batches rather than on every write
+            if seq % 100 == 0:
+                self._trim(conn, job_id, seq)
+            return True
+
+        return self._write(_apply)
+
+    def _trim(self, conn: sqlite3.Connection, job_id: str, seq: int) -> None:
+        keep_logs = conn.execute(
+            "SELECT seq FROM job_events WHERE job_id = ? AND log IS NOT NULL ORDER BY seq DESC LIMIT 1 OFFSET ?",
+            (job_id, MAX_LOG_LINES - 1),
+        ).fetchone()
+        log_floor = keep_logs[0] if keep_logs else 0
+        # Events past the buffer go, except those still holding one of the last MAX_LOG_LINES logs
+        conn.execute(
+            "DELETE FROM job_events WHERE job_id = ? AND seq <= ? AND (log IS NULL OR seq < ?)",
+            (job_id, seq - self.event_buffer, log_floor),
+        )
+
+    def _oldest_event(self, job_id: str) -> Optional[int]:
+        # Log-only survivors of trimming don't count as resumable history
+        row = self._conn.execute(
+            "SELECT MIN(seq) FROM job_events WHERE job_id = ? AND seq > "
+            "(SELECT seq FROM jobs WHERE job_id = ?) - ?",
+            (job_id, job_id, self.event_buffer),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT state, seq FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        files = [
+            json.loads(data)
+            for (data,) in self._conn.execute("SELECT data FROM job_files WHERE job_id = ? ORDER BY idx", (job_id,))
+        ]
+        logs = [
+            log for (log,) in self._conn.execute(
+                "SELECT log FROM job_events WHERE job_id = ? AND log IS NOT NULL ORDER BY seq DESC LIMIT ?",
+                (job_id, MAX_LOG_LINES),
+            )
+        ]
+        logs.reverse()
+        return dict(json.loads(row[0]), files=files, logs=logs, seq=row[1])
+
+    def snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                return self._snapshot(job_id)
+            finally:
+                self._conn.execute("COMMIT")
+
+    def events_since(self, job_id: str, seq: int) -> Optional[EventsSince]:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute("SELECT seq FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return None
+                if seq <= 0:
+                    return [], self._snapshot(job_id)
+                if seq >= row[0]:
+                    return [], None
+                oldest = self._oldest_event(job_id)
+                if oldest is None or seq < oldest - 1:
+                    return [], self._snapshot(job_id)
+                events = [
+                    json.loads(data)
+                    for (data,) in self._conn.execute(
+                        "SELECT data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, seq)
+                    )
+                ]
+            finally:
+                self._conn.execute("COMMIT")
+        # JSON object keys are strings; restore integer file indexes
+        for event in events:
+            if "files" in event:
+                event["files"] = {int(idx): changes for idx, changes in event["files"].items()}
+        return events, None
+
+    def status(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def _delete(self, conn: sqlite3.Connection, job_ids: List[str]) -> None:
+        rows = [(job_id,) for job_id in job_ids]
+        conn.executemany("DELETE FROM jobs WHERE job_id = ?", rows)
+        conn.executemany("DELETE FROM job_files WHERE job_id = ?", rows)
+        conn.executemany("DELETE FROM job_events WHERE job_id = ?", rows)
+
+    def delete(self, job_id: str) -> None:
+        self._write(lambda conn: self._delete(conn, [job_id]))
+
+    def evict_expired(self, now: float) -> int:
+        if self.ttl_seconds <= 0:
+            return 0
+
+        def _evict(conn) -> int:
+            doomed = [
+                job_id for (job_id,) in conn.execute(
+                    "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                    (now - self.ttl_seconds,),
+                )
+            ]
+            self._delete(conn, doomed)
+            return len(doomed)
+
+        return self._write(_evict)
+
+
+def create_progress_store(backend: Optional[str] = None) -> ProgressStore:
+    """
+    Build the store named by PROGRESS_BACKEND: "memory" (default), "sqlite"
+    (file at PROGRESS_DB_PATH), or "package.module:ClassName" for a custom
+    ProgressStore such as a Redis adapter (constructed without arguments).
+    """
+    backend = (backend or os.getenv("PROGRESS_BACKEND", "memory")).strip()
+    if backend == "memory":
+        return MemoryProgressStore()
+    if backend == "sqlite":
+        default_path = Path(__file__).resolve().parents[1] / ".cache" / "progress.sqlite3"
+        path = Path(os.getenv("PROGRESS_DB_PATH", str(default_path))).expanduser()
+        logger.info("Using SQLite progress store at %s", path)
+        return SqliteProgressStore(path)
+    if ":" in backend:
+        module_name, _, class_name = backend.partition(":")
+        store_cls = getattr(importlib.import_module(module_name), class_name)
+        return store_cls()
+    raise ValueError(f"Unknown PROGRESS_BACKEND {backend!r}")
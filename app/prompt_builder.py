@@ -1,5 +1,8 @@
 from typing import List, Dict
 
+# Bump when the report prompt changes so cached analysis results are not reused
+PROMPT_TEMPLATE_VERSION = "1"
+
 
 def build_prompt(file_summaries: List[Dict], context: Dict) -> str:
     """
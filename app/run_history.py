@@ -0,0 +1,270 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = Path(__file__).resolve().parents[1] / ".cache" / "run_history.sqlite3"
+
+RUN_HISTORY_ENABLED = os.getenv("RUN_HISTORY_ENABLED", "true").lower() == "true"
+RUN_HISTORY_PATH = Path(os.getenv("RUN_HISTORY_PATH", str(DEFAULT_HISTORY_PATH))).expanduser()
+# A change counts as a regression past these thresholds (relative %, error rate in percentage points)
+REGRESSION_LATENCY_PCT = float(os.getenv("COMPARE_REGRESSION_LATENCY_PCT", "10"))
+REGRESSION_THROUGHPUT_PCT = float(os.getenv("COMPARE_REGRESSION_THROUGHPUT_PCT", "10"))
+REGRESSION_ERROR_RATE_PP = float(os.getenv("COMPARE_REGRESSION_ERROR_RATE_PP", "1"))
+MAX_DELTA_ROWS = int(os.getenv("COMPARE_MAX_DELTA_ROWS", "60"))
+
+# Metrics per transaction, as produced by app.processors.csv_parser.aggregate_jtl_csv
+LATENCY_METRICS = ("mean_ms", "p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms")
+METRICS = ("count",) + LATENCY_METRICS + ("error_rate", "throughput_rps")
+# Metrics that drive regression flags (the rest are reported but not judged)
+JUDGED_METRICS = ("p95_ms", "p99_ms", "mean_ms", "error_rate", "throughput_rps")
+
+RunMetrics = Dict[str, Dict[str, float]]
+
+_HEADER_ALIASES = [
+    (re.compile(r"^(p50|median|50(th)?(pct|percentile)?)"), "p50_ms"),
+    (re.compile(r"^(p90|90(th)?(pct|percentile)?)"), "p90_ms"),
+    (re.compile(r"^(p95|95(th)?(pct|percentile)?)"), "p95_ms"),
+    (re.compile(r"^(p99|99(th)?(pct|percentile)?)"), "p99_ms"),
+    (re.compile(r"^(mean|avg|average)"), "mean_ms"),
+    (re.compile(r"^max"), "max_ms"),
+    (re.compile(r"^(error|err|fail)"), "error_rate"),
+    (re.compile(r"^(rps|tps|throughput|reqs?(per)?s|hits?(per)?s)"), "throughput_rps"),
+    (re.compile(r"^(count|samples|requests|hits)$"), "count"),
+]
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-{2,}")
+
+
+def metrics_from_jtl_stats(stats: Dict) -> RunMetrics:
+    """Per-label metrics (plus the overall row) from aggregate_jtl_csv output."""
+    rows = list(stats.get("labels") or [])
+    if stats.get("overall"):
+        rows.append(stats["overall"])
+    return {
+        str(row["label"]): {m: float(row[m]) for m in METRICS if row.get(m) is not None}
+        for row in rows
+    }
+
+
+def _metric_for_header(header: str) -> Optional[str]:
+    key = re.sub(r"[^a-z0-9]", "", header.lower())
+    for pattern, metric in _HEADER_ALIASES:
+        if pattern.match(key):
+            return metric
+    return None
+
+
+def _cell_value(cell: str, metric: str, header: str) -> Optional[float]:
+    cell = _THOUSANDS.sub("", cell)
+    match = _NUMBER.search(cell)
+    if not match:
+        return None
+    value = float(match.group(0))
+    unit = cell[match.end():].strip().lower()
+    if metric in LATENCY_METRICS and (unit.startswith("s") or ("(s)" in header.lower() and not unit)):
+        value *= 1000.0
+    if metric == "error_rate" and ("%" in cell or "%" in header or value > 1):
+        value /= 100.0
+    return value
+
+
+def metrics_from_markdown(markdown: str) -> RunMetrics:
+    """
+    Pull per-transaction metrics out of Markdown tables (reports, format_jtl_stats
+    blocks). Tables qualify when their header names at least one known metric;
+    the first column is the transaction label.
+    """
+    metrics: RunMetrics = {}
+    lines = markdown.splitlines()
+    idx = 0
+    while idx < len(lines) - 1:
+        header, separator = lines[idx].strip(), lines[idx + 1].strip()
+        if not (header.startswith("|") and _TABLE_SEPARATOR.match(separator)):
+            idx += 1
+            continue
+        headers = [h.strip() for h in header.strip("|").split("|")]
+        columns = {pos: _metric_for_header(h) for pos, h in enumerate(headers) if pos > 0}
+        idx += 2
+        while idx < len(lines) and lines[idx].strip().startswith("|"):
+            cells = [c.strip() for c in lines[idx].strip().strip("|").split("|")]
+            idx += 1
+            label = cells[0].strip("*` ") if cells else ""
+            if not label or _NUMBER.fullmatch(label) or not any(columns.values()):
+                continue
+            row = metrics.setdefault(label, {})
+            for pos, metric in columns.items():
+                if metric and pos < len(cells) and metric not in row:
+                    value = _cell_value(cells[pos], metric, headers[pos])
+                    if value is not None:
+                        row[metric] = value
+            if not row:
+                del metrics[label]
+    return metrics
+
+
+def merge_metrics(sources: Iterable[RunMetrics]) -> RunMetrics:
+    """Combine metric sets; earlier sources win for a transaction they already cover."""
+    merged: RunMetrics = {}
+    for source in sources:
+        for label, values in source.items():
+            row = merged.setdefault(label, {})
+            for metric, value in values.items():
+                row.setdefault(metric, value)
+    return merged
+
+
+def _regressed(metric: str, base: float, value: float) -> bool:
+    if metric in LATENCY_METRICS:
+        return base > 0 and (value - base) / base * 100 > REGRESSION_LATENCY_PCT
+    if metric == "throughput_rps":
+        return base > 0 and (base - value) / base * 100 > REGRESSION_THROUGHPUT_PCT
+    if metric == "error_rate":
+        return (value - base) * 100 > REGRESSION_ERROR_RATE_PP
+    return False
+
+
+def compare_metrics(baseline: RunMetrics, candidates: Dict[str, RunMetrics]) -> List[Dict]:
+    """
+    One row per (transaction, metric) present in the baseline and at least one
+    candidate: baseline value, then per candidate its value, delta, delta % and
+    regression flag. Rows with regressions come first.
+    """
+    rows: List[Dict] = []
+    for label in sorted(baseline):
+        for metric in JUDGED_METRICS:
+            base = baseline[label].get(metric)
+            if base is None:
+                continue
+            runs = {}
+            for run_id, metrics in candidates.items():
+                value = (metrics.get(label) or {}).get(metric)
+                if value is None:
+                    continue
+                delta = value - base
+                runs[run_id] = {
+                    "value": value,
+                    "delta": delta,
+                    "delta_pct": (delta / base * 100) if base else None,
+                    "regression": _regressed(metric, base, value),
+                }
+            if runs:
+                rows.append({"transaction": label, "metric": metric, "baseline": base, "runs": runs})
+    rows.sort(key=lambda r: not any(run["regression"] for run in r["runs"].values()))
+    return rows
+
+
+def _fmt(metric: str, value: float) -> str:
+    if metric == "error_rate":
+        return f"{value * 100:.2f}%"
+    return f"{value:.1f}" if metric == "throughput_rps" else f"{value:.0f}"
+
+
+def format_delta_table(rows: List[Dict], run_ids: List[str], max_rows: int = MAX_DELTA_ROWS) -> str:
+    """Compact Markdown delta table for the comparison prompt (regressions marked with !)."""
+    header = "| Transaction | Metric | Baseline | " + " | ".join(f"Run {n + 1}" for n in range(len(run_ids))) + " |"
+    lines = [header, "|" + "---|" * (3 + len(run_ids))]
+    for row in rows[:max_rows]:
+        cells = []
+        for run_id in run_ids:
+            run = row["runs"].get(run_id)
+            if run is None:
+                cells.append("-")
+                continue
+            pct = f" ({run['delta_pct']:+.1f}%)" if run["delta_pct"] is not None else ""
+            cells.append(f"{_fmt(row['metric'], run['value'])}{pct}{' !' if run['regression'] else ''}")
+        lines.append(
+            f"| {row['transaction']} | {row['metric']} | {_fmt(row['metric'], row['baseline'])} | " + " | ".join(cells) + " |"
+        )
+    if len(rows) > max_rows:
+        lines.append(f"({len(rows) - max_rows} unchanged-or-minor rows omitted)")
+    return "\n".join(lines)
+
+
+class RunHistory:
+    """SQLite store of per-run transaction metrics, indexed by run and by transaction/metric."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, created_at REAL NOT NULL, source TEXT, context TEXT);"
+            "CREATE TABLE IF NOT EXISTS run_metrics ("
+            " run_id TEXT NOT NULL, txn TEXT NOT NULL, metric TEXT NOT NULL, value REAL NOT NULL,"
+            " PRIMARY KEY (run_id, txn, metric));"
+            "CREATE INDEX IF NOT EXISTS idx_run_metrics_txn ON run_metrics(txn, metric);"
+            "CREATE INDEX IF NOT EXISTS idx_runs_created ON runs(created_at);"
+        )
+        conn.commit()
+        self._conn = conn
+
+    def record_run(self, metrics: RunMetrics, *, context: Optional[Dict] = None, source: str = "analysis") -> str:
+        run_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, created_at, source, context) VALUES (?, ?, ?, ?)",
+                (run_id, time.time(), source, json.dumps(context or {}, default=str)),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO run_metrics (run_id, txn, metric, value) VALUES (?, ?, ?, ?)",
+                [(run_id, label, metric, value) for label, values in metrics.items() for metric, value in values.items()],
+            )
+            self._conn.commit()
+        return run_id
+
+    def get_metrics(self, run_id: str) -> Optional[RunMetrics]:
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone() is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT txn, metric, value FROM run_metrics WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        metrics: RunMetrics = {}
+        for label, metric, value in rows:
+            metrics.setdefault(label, {})[metric] = value
+        return metrics
+
+    def list_runs(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.run_id, r.created_at, r.source, COUNT(DISTINCT m.txn) FROM runs r "
+                "LEFT JOIN run_metrics m ON m.run_id = r.run_id "
+                "GROUP BY r.run_id ORDER BY r.created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {"run_id": run_id, "created_at": created_at, "source": source, "transactions": transactions}
+            for run_id, created_at, source, transactions in rows
+        ]
+
+
+_run_history: Optional[RunHistory] = None
+_run_history_lock = threading.Lock()
+
+
+def get_run_history() -> Optional[RunHistory]:
+    """Return the process-wide run-history store, or None when disabled or unavailable."""
+    global _run_history
+    if not RUN_HISTORY_ENABLED:
+        return None
+    with _run_history_lock:
+        if _run_history is None:
+            try:
+                _run_history = RunHistory(RUN_HISTORY_PATH)
+            except (OSError, sqlite3.Error) as exc:
+                logger.warning("Run history unavailable at %s: %s", RUN_HISTORY_PATH, exc)
+                return None
+        return _run_history
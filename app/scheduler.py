@@ -0,0 +1,178 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app import telemetry
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_JOBS = int(os.getenv("JOB_MAX_CONCURRENT", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("JOB_MAX_QUEUED", "32"))
+# Synchronous /analyze requests get their own slots so progress jobs can't starve them (and vice versa)
+ANALYZE_MAX_CONCURRENT = int(os.getenv("ANALYZE_MAX_CONCURRENT", "2"))
+ANALYZE_MAX_QUEUED = int(os.getenv("ANALYZE_MAX_QUEUED", "8"))
+# Seed for start-time estimates until real job durations have been observed
+DEFAULT_JOB_SECONDS = float(os.getenv("JOB_DEFAULT_DURATION_SECONDS", "120"))
+DURATION_SMOOTHING = 0.3
+
+
+class SchedulerOverloaded(RuntimeError):
+    """Raised by submit() when the wait queue is full."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """
+    Runs analysis jobs on a fixed pool of worker threads.
+
+    Jobs wait in a priority queue (lower value first, FIFO within a priority)
+    and at most `max_concurrent` run at once; submit() refuses work once
+    `max_queued` jobs are waiting. Average job duration is tracked so queued
+    jobs can report an estimated start time.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrent: int = MAX_CONCURRENT_JOBS,
+        max_queued: int = MAX_QUEUED_JOBS,
+        default_job_seconds: float = DEFAULT_JOB_SECONDS,
+    ):
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queued = max(max_queued, 0)
+        self.avg_job_seconds = default_job_seconds
+        self._heap: List[Tuple[int, int, str]] = []
+        self._tasks: Dict[str, Callable[[], None]] = {}
+        self._submitted: Dict[str, float] = {}
+        self._running: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self.completed = 0
+        self.rejected = 0
+
+    def _ensure_workers(self) -> None:
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(
+                target=self._work, name=f"job-worker-{len(self._workers)}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job_id: str, task: Callable[[], None], *, priority: int = 0) -> Dict:
+        """Queue a job; returns its queue status. Raises SchedulerOverloaded when full."""
+        with self._cond:
+            if len(self._tasks) >= self.max_queued:
+                self.rejected += 1
+                retry_after = self._wait_seconds(len(self._tasks) + 1, time.time())
+                raise SchedulerOverloaded(
+                    f"{len(self._tasks)} jobs already queued (limit {self.max_queued})", retry_after
+                )
+            heapq.heappush(self._heap, (priority, next(self._seq), job_id))
+            self._tasks[job_id] = task
+            self._submitted[job_id] = time.time()
+            self._ensure_workers()
+            self._cond.notify()
+            return self._status_locked(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job that has not started yet. Returns False if it is running or unknown."""
+        with self._cond:
+            self._submitted.pop(job_id, None)
+            if self._tasks.pop(job_id, None) is None:
+                return False
+            # Lazy deletion: the heap entry is skipped when popped
+            return True
+
+    def _next_job(self) -> Tuple[str, Callable[[], None]]:
+        with self._cond:
+            while True:
+                while self._heap:
+                    _, _, job_id = heapq.heappop(self._heap)
+                    task = self._tasks.pop(job_id, None)
+                    if task is not None:
+                        now = time.time()
+                        self._running[job_id] = now
+                        telemetry.observe_stage("queue_wait", now - self._submitted.pop(job_id, now))
+                        return job_id, task
+                self._cond.wait()
+
+    def _work(self) -> None:
+        while True:
+            job_id, task = self._next_job()
+            try:
+                task()
+            except Exception:
+                logger.exception("Scheduled job %s failed", job_id)
+            finally:
+                with self._cond:
+                    started = self._running.pop(job_id, time.time())
+                    elapsed = time.time() - started
+                    self.avg_job_seconds += DURATION_SMOOTHING * (elapsed - self.avg_job_seconds)
+                    self.completed += 1
+
+    def _wait_seconds(self, position: int, now: float) -> float:
+        """Estimated wait for the job at 1-based queue `position`."""
+        # Idle workers are free now; busy ones are assumed to finish after an average job
+        remaining = sorted(
+            [max(self.avg_job_seconds - (now - started), 0.0) for started in self._running.values()]
+            + [0.0] * (self.max_concurrent - len(self._running))
+        )
+        rounds, slot = divmod(position - 1, self.max_concurrent)
+        return remaining[slot] + rounds * self.avg_job_seconds
+
+    def _status_locked(self, job_id: str) -> Dict:
+        now = time.time()
+        if job_id in self._running:
+            return {"queue_position": 0, "estimated_start_at": self._running[job_id], "estimated_wait_seconds": 0.0}
+        if job_id not in self._tasks:
+            return {}
+        mine = next(entry for entry in self._heap if entry[2] == job_id)
+        ahead = sum(1 for entry in self._heap if entry < mine and entry[2] in self._tasks)
+        wait = self._wait_seconds(ahead + 1, now)
+        return {
+            "queue_position": ahead + 1,
+            "estimated_start_at": now + wait,
+            "estimated_wait_seconds": round(wait, 1),
+        }
+
+    def status(self, job_id: str) -> Dict:
+        """Queue position (0 once running) and estimated start for a job; {} if unknown."""
+        with self._cond:
+            return self._status_locked(job_id)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "running": len(self._running),
+                "queued": len(self._tasks),
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_job_seconds": round(self.avg_job_seconds, 1),
+            }
+
+
+job_scheduler = JobScheduler()
+analyze_scheduler = JobScheduler(max_concurrent=ANALYZE_MAX_CONCURRENT, max_queued=ANALYZE_MAX_QUEUED)
+
+
+def _scheduler_sample(field: str) -> Callable[[], Dict]:
+    return lambda: {(): job_scheduler.stats()[field]}
+
+
+for _name, _field, _help, _kind in [
+    ("aicore_jobs_queued", "queued", "Analysis jobs waiting for a worker.", "gauge"),
+    ("aicore_jobs_running", "running", "Analysis jobs currently running.", "gauge"),
+    ("aicore_jobs_completed_total", "completed", "Analysis jobs finished (any outcome).", "counter"),
+    ("aicore_jobs_rejected_total", "rejected", "Jobs refused because the queue was full.", "counter"),
+]:
+    telemetry.REGISTRY.register(telemetry.CallbackGauge(_name, _help, _scheduler_sample(_field), kind=_kind))
@@ -0,0 +1,263 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; spans local file work (milliseconds) up to long final analyses (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class CallbackGauge(_Metric):
+    """Gauge (or counter) read from `fn` at scrape time; fn returns {label values: value}."""
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], Dict[LabelValues, float]], labels: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in sorted(self.fn().items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket counts, then sum, then count
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[idx] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return int(series[-1]) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0.0
+            for idx, bound in enumerate(self.buckets):
+                cumulative += series[idx]
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {_number(series[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram("aicore_stage_duration_seconds", "Time spent per pipeline stage.", ["stage"])
+)
+LLM_REQUEST_SECONDS = REGISTRY.register(
+    Histogram("aicore_llm_request_duration_seconds", "Model call latency per attempt.", ["model", "outcome"])
+)
+LLM_TOKENS = REGISTRY.register(Counter("aicore_llm_tokens_total", "Tokens reported by the API.", ["model", "kind"]))
+LLM_RETRIES = REGISTRY.register(Counter("aicore_llm_retries_total", "Model call attempts after the first.", ["model"]))
+LLM_RATE_LIMITED = REGISTRY.register(Counter("aicore_llm_rate_limited_total", "429 responses.", ["model"]))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge("aicore_llm_requests_in_flight", "Model calls awaiting a response.", ["model"]))
+
+
+class JobTimings:
+    """Per-job accumulation of stage durations and model usage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.llm: Dict[str, Dict[str, int]] = {}
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_llm(self, model: str, **counts: int) -> None:
+        with self._lock:
+            entry = self.llm.setdefault(
+                model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "retries": 0, "rate_limited": 0}
+            )
+            for key, value in counts.items():
+                entry[key] += value
+
+    def as_dict(self) -> Dict:
+        """
+        Stage seconds are summed over occurrences, so stages that run per file
+        or per chunk concurrently can add up to more than the wall time.
+        """
+        with self._lock:
+            return {
+                "total_seconds": round(time.perf_counter() - self.started, 3),
+                "stages": {
+                    stage: {"count": count, "seconds": round(seconds, 3)}
+                    for stage, (count, seconds) in self.stages.items()
+                },
+                "llm": {model: dict(counts) for model, counts in self.llm.items()},
+            }
+
+
+_current_job: contextvars.ContextVar[Optional[JobTimings]] = contextvars.ContextVar("aicore_job_timings", default=None)
+
+
+@contextmanager
+def track_job() -> Iterator[JobTimings]:
+    """Collect stage timings and model usage of everything run in this context."""
+    timings = JobTimings()
+    token = _current_job.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_job.reset(token)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _current_job.get()
+    if timings is not None:
+        timings.add_stage(stage, seconds)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def record_llm_attempt(model: str, outcome: str, seconds: float, attempt: int) -> None:
+    """Account one model call attempt; outcome is ok, error or rate_limited."""
+    LLM_REQUEST_SECONDS.observe(seconds, model=model, outcome=outcome)
+    retried = 1 if attempt > 1 else 0
+    if retried:
+        LLM_RETRIES.inc(model=model)
+    if outcome == "rate_limited":
+        LLM_RATE_LIMITED.inc(model=model)
+    timings = _current_job.get()
+    if timings is not None:
+        timings.add_llm(
+            model, calls=1 if outcome == "ok" else 0, retries=retried, rate_limited=1 if outcome == "rate_limited" else 0
+        )
+
+
+def record_llm_usage(model: str, usage) -> None:
+    """Count prompt/completion tokens from an API `usage` object (None is ignored)."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    timings = _current_job.get()
+    if timings is not None:
+        timings.add_llm(model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
@@ -0,0 +1,64 @@
+import math
+import os
+import re
+from typing import Dict, Union
+
+# Offline approximation of BPE tokenization (cl100k/o200k-style): digits split in
+# groups of up to 3, letters in runs of up to 6, every punctuation mark separate.
+# Deliberately errs high on log/CSV/JSON content so budgets are not overrun.
+_TOKEN_PATTERN = re.compile(r"\d{1,3}|[^\W\d_]{1,6}|[^\w\s]|_")
+_TOKEN_PATTERN_BYTES = re.compile(rb"[0-9]{1,3}|[A-Za-z]{1,6}|[^\sA-Za-z0-9]")
+
+# Bytes of log/CSV text per estimated token (measured ~2.0-2.8 on JMeter results, GC and app logs);
+# the low end, so sizing a file from its byte count never underestimates its tokens
+LOG_BYTES_PER_TOKEN = 2.0
+
+# Context windows (tokens) used to clamp chunk budgets; unknown models use the default
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4.1": 1_047_576,
+    "gpt-4.1-mini": 1_047_576,
+    "gpt-4.1-nano": 1_047_576,
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+}
+DEFAULT_CONTEXT_WINDOW = 128_000
+
+# Content tokens packed into each summarization chunk
+DEFAULT_CHUNK_TOKEN_BUDGET = int(os.getenv("PREPROCESS_CHUNK_TOKEN_BUDGET", "6000"))
+# Room kept for the prompt template and the model's reply
+PROMPT_OVERHEAD_TOKENS = 400
+COMPLETION_RESERVE_TOKENS = 1024
+
+
+def _parse_budgets(raw: str) -> Dict[str, int]:
+    """Parse "model=tokens,model=tokens" overrides."""
+    budgets: Dict[str, int] = {}
+    for item in raw.split(","):
+        model, _, value = item.partition("=")
+        if model.strip() and value.strip().isdigit():
+            budgets[model.strip()] = int(value)
+    return budgets
+
+
+# Per-model overrides, e.g. PREPROCESS_CHUNK_TOKEN_BUDGETS="gpt-4.1-mini=8000,gpt-4o-mini=4000"
+CHUNK_TOKEN_BUDGETS = _parse_budgets(os.getenv("PREPROCESS_CHUNK_TOKEN_BUDGETS", ""))
+
+
+def estimate_tokens(text: Union[str, bytes]) -> int:
+    """Estimate the token count of text (or raw UTF-8 bytes) without a tokenizer."""
+    if not text:
+        return 0
+    pattern = _TOKEN_PATTERN_BYTES if isinstance(text, bytes) else _TOKEN_PATTERN
+    return len(pattern.findall(text))
+
+
+def estimate_tokens_from_size(size_bytes: int) -> int:
+    """Token estimate for a log/CSV file of size_bytes, without reading it."""
+    return math.ceil(size_bytes / LOG_BYTES_PER_TOKEN)
+
+
+def chunk_token_budget(model: str) -> int:
+    """Content tokens per chunk for a model, clamped to fit its context window."""
+    budget = CHUNK_TOKEN_BUDGETS.get(model, DEFAULT_CHUNK_TOKEN_BUDGET)
+    window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    return max(min(budget, window - PROMPT_OVERHEAD_TOKENS - COMPLETION_RESERVE_TOKENS), 1)
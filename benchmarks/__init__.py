@@ -0,0 +1 @@
+"""Offline benchmarks: a fake LLM backend, synthetic artifacts and a measuring harness."""
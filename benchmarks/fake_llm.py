@@ -0,0 +1,157 @@
+import asyncio
+import random
+import threading
+from collections import Counter
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.tokens import estimate_tokens
+
+FAKE_REPORT = """## Executive Summary
+The system sustained the target load; latency rose in the last third of the run.
+
+## Key Metrics & Findings
+| Transaction | p95 (ms) | Error % | RPS |
+|---|---|---|---|
+| login | 420 | 0.5 | 35.2 |
+
+## Recommendations
+- Review the connection pool size before the next run.
+"""
+
+FAKE_SUMMARY = "Summary: steady throughput, a few timeouts, GC pauses under 50 ms."
+
+
+class LatencyModel:
+    """
+    Per-call latency in seconds, parsed from "fixed:0.2", "uniform:0.1,0.5",
+    "lognormal:<median>,<sigma>" or "exp:<mean>".
+    """
+
+    def __init__(self, spec: str = "fixed:0", seed: Optional[int] = None):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a]
+        if kind not in {"fixed", "uniform", "lognormal", "exp"}:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self._random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.args[0] if self.args else 0.0
+        if self.kind == "uniform":
+            return self._random.uniform(self.args[0], self.args[1])
+        if self.kind == "lognormal":
+            median, sigma = self.args
+            return self._random.lognormvariate(0.0, sigma) * median
+        return self._random.expovariate(1.0 / self.args[0]) if self.args[0] > 0 else 0.0
+
+
+class FakeRateLimitError(Exception):
+    """Shaped like openai.RateLimitError as far as ai_engine looks at it."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("rate limited (injected)")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class FakeLLMClient:
+    """
+    Local stand-in for AsyncOpenAI's chat.completions.create (plain and
+    streamed). Latency comes from a LatencyModel; a share of calls, or every
+    call above `max_in_flight`, fails with 429; prompt and completion tokens
+    are counted per model.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[LatencyModel] = None,
+        *,
+        rate_limit_ratio: float = 0.0,
+        max_in_flight: int = 0,
+        retry_after: float = 0.05,
+        stream_chunk_chars: int = 16,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency or LatencyModel()
+        self.rate_limit_ratio = rate_limit_ratio
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.stream_chunk_chars = max(stream_chunk_chars, 1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self.prompt_tokens: Counter = Counter()
+        self.completion_tokens: Counter = Counter()
+        self.prompts: List[str] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def reply_for(self, model: str, prompt: str) -> str:
+        return FAKE_REPORT if "Executive Summary" in prompt else FAKE_SUMMARY
+
+    def _admit(self, model: str) -> None:
+        with self._lock:
+            self.calls[model] += 1
+            if (self.max_in_flight and self.in_flight >= self.max_in_flight) or (
+                self._random.random() < self.rate_limit_ratio
+            ):
+                self.rate_limited[model] += 1
+                raise FakeRateLimitError(self.retry_after)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _done(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _usage(self, model: str, prompt: str, reply: str) -> SimpleNamespace:
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(reply)
+        with self._lock:
+            self.prompt_tokens[model] += prompt_tokens
+            self.completion_tokens[model] += completion_tokens
+            self.prompts.append(prompt)
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens
+        )
+
+    async def create(self, *, model: str, messages: List[Dict], temperature: float = 0.0, stream: bool = False, **kwargs):
+        prompt = "\n".join(m["content"] for m in messages)
+        self._admit(model)
+        if stream:
+            return self._stream(model, prompt)
+        try:
+            await asyncio.sleep(self.latency.sample())
+        finally:
+            self._done()
+        reply = self.reply_for(model, prompt)
+        message = SimpleNamespace(content=reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=self._usage(model, prompt, reply))
+
+    async def _stream(self, model: str, prompt: str) -> AsyncIterator[SimpleNamespace]:
+        try:
+            reply = self.reply_for(model, prompt)
+            pieces = [reply[i:i + self.stream_chunk_chars] for i in range(0, len(reply), self.stream_chunk_chars)]
+            # Time to first token plus generation, spread evenly over the pieces
+            per_piece = self.latency.sample() / max(len(pieces), 1)
+            for piece in pieces:
+                await asyncio.sleep(per_piece)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+            yield SimpleNamespace(choices=[], usage=self._usage(model, prompt, reply))
+        finally:
+            self._done()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "llm_calls": sum(self.calls.values()) - sum(self.rate_limited.values()),
+                "rate_limited": sum(self.rate_limited.values()),
+                "prompt_tokens": sum(self.prompt_tokens.values()),
+                "completion_tokens": sum(self.completion_tokens.values()),
+                "peak_in_flight": self.peak_in_flight,
+                "calls_by_model": dict(self.calls),
+            }
@@ -0,0 +1,141 @@
+import random
+import zipfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+from xml.sax.saxutils import escape
+
+JTL_HEADER = (
+    "timeStamp,elapsed,label,responseCode,responseMessage,threadName,dataType,success,"
+    "failureMessage,bytes,sentBytes,grpThreads,allThreads,URL,Latency,IdleTime,Connect"
+)
+DEFAULT_LABELS = ["login", "search", "product", "add_to_cart", "checkout", "logout"]
+START_MS = 1_753_531_200_000  # 2025-07-26T12:00:00Z
+
+
+def generate_jtl_csv(
+    path: Path,
+    rows: int,
+    *,
+    labels: Optional[List[str]] = None,
+    error_rate: float = 0.01,
+    threads: int = 50,
+    rps: float = 200.0,
+    seed: int = 1,
+) -> Path:
+    """JMeter results CSV with lognormal latencies and a share of failed samples."""
+    rng = random.Random(seed)
+    labels = labels or DEFAULT_LABELS
+    base_latency = {label: 40 + 60 * idx for idx, label in enumerate(labels)}
+    step_ms = 1000.0 / rps
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(JTL_HEADER + "\n")
+        for n in range(rows):
+            label = labels[n % len(labels)]
+            elapsed = int(base_latency[label] * rng.lognormvariate(0, 0.5))
+            ok = rng.random() >= error_rate
+            code, message = ("200", "OK") if ok else ("500", "Internal Server Error")
+            thread = f"Thread Group 1-{n % threads + 1}"
+            f.write(
+                f"{int(START_MS + n * step_ms)},{elapsed},{label},{code},{message},{thread},text,"
+                f"{'true' if ok else 'false'},{'' if ok else 'Unexpected status'},{rng.randint(500, 5000)},"
+                f"{rng.randint(200, 800)},{threads},{threads},https://shop.example.com/{label},"
+                f"{max(elapsed - 5, 0)},0,{rng.randint(0, 3)}\n"
+            )
+    return path
+
+
+def generate_gc_log(path: Path, events: int, *, full_gc_every: int = 500, seed: int = 2) -> Path:
+    """JDK unified-logging G1 GC log with young pauses and the odd full GC."""
+    rng = random.Random(seed)
+    start = datetime(2025, 7, 26, 12, 0, 0, tzinfo=timezone.utc)
+    heap_mb = 4096
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[0.004s][info][gc] Using G1\n")
+        uptime = 0.5
+        for n in range(events):
+            uptime += rng.uniform(0.2, 2.0)
+            stamp = (start + timedelta(seconds=uptime)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "+0000"
+            before = rng.randint(heap_mb // 2, heap_mb - 256)
+            if full_gc_every and n and n % full_gc_every == 0:
+                after = rng.randint(heap_mb // 8, heap_mb // 4)
+                pause = rng.uniform(400, 2500)
+                kind = "Pause Full (G1 Compaction Pause)"
+            else:
+                after = rng.randint(heap_mb // 8, before - 128)
+                pause = rng.lognormvariate(2.5, 0.6)
+                kind = "Pause Young (Normal) (G1 Evacuation Pause)"
+            f.write(
+                f"[{stamp}][{uptime:.3f}s][info][gc] GC({n}) {kind} {before}M->{after}M({heap_mb}M) {pause:.3f}ms\n"
+            )
+    return path
+
+
+def generate_jmx(path: Path, *, thread_groups: int = 2, samplers_per_group: int = 5, threads: int = 50) -> Path:
+    """Minimal JMeter test plan with thread groups, HTTP samplers and user variables."""
+    groups = []
+    for g in range(thread_groups):
+        samplers = "".join(
+            f"""
+        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="{escape(label)}" enabled="true">
+          <stringProp name="HTTPSampler.domain">${{host}}</stringProp>
+          <stringProp name="HTTPSampler.path">/api/{escape(label)}</stringProp>
+          <stringProp name="HTTPSampler.method">{"POST" if s % 2 else "GET"}</stringProp>
+        </HTTPSamplerProxy>
+        <hashTree/>"""
+            for s, label in enumerate((DEFAULT_LABELS * samplers_per_group)[:samplers_per_group])
+        )
+        groups.append(
+            f"""
+      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="Group {g + 1}" enabled="true">
+        <stringProp name="ThreadGroup.num_threads">{threads}</stringProp>
+        <stringProp name="ThreadGroup.ramp_time">60</stringProp>
+        <boolProp name="ThreadGroup.scheduler">true</boolProp>
+        <stringProp name="ThreadGroup.duration">600</stringProp>
+      </ThreadGroup>
+      <hashTree>{samplers}
+      </hashTree>"""
+        )
+    path.write_text(
+        f"""<?xml version="1.0" encoding="UTF-8"?>
+<jmeterTestPlan version="1.2" properties="5.0" jmeter="5.6.3">
+  <hashTree>
+    <TestPlan guiclass="TestPlanGui" testclass="TestPlan" testname="Checkout load test" enabled="true">
+      <elementProp name="TestPlan.user_defined_variables" elementType="Arguments">
+        <collectionProp name="Arguments.arguments">
+          <elementProp name="host" elementType="Argument">
+            <stringProp name="Argument.name">host</stringProp>
+            <stringProp name="Argument.value">shop.example.com</stringProp>
+          </elementProp>
+        </collectionProp>
+      </elementProp>
+    </TestPlan>
+    <hashTree>{"".join(groups)}
+    </hashTree>
+  </hashTree>
+</jmeterTestPlan>
+""",
+        encoding="utf-8",
+    )
+    return path
+
+
+def generate_bundle(
+    directory: Path,
+    *,
+    jtl_rows: int = 100_000,
+    gc_events: int = 2_000,
+    name: str = "bundle.zip",
+    seed: int = 1,
+) -> Path:
+    """Zip bundle with a JTL, a GC log and a JMX plan, as uploaded after a test run."""
+    directory.mkdir(parents=True, exist_ok=True)
+    jtl = generate_jtl_csv(directory / "results.jtl", jtl_rows, seed=seed)
+    gc_log = generate_gc_log(directory / "gc.log", gc_events, seed=seed + 1)
+    jmx = generate_jmx(directory / "plan.jmx")
+    bundle = directory / name
+    with zipfile.ZipFile(bundle, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for path in (jtl, gc_log, jmx):
+            zf.write(path, f"run/{path.name}")
+            path.unlink()
+    return bundle
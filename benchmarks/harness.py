@@ -0,0 +1,268 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app import ai_engine, analyzer, preprocessing
+from app.bundles import expand_zip
+from app.progress import progress_manager
+from benchmarks.fake_llm import FakeLLMClient, LatencyModel
+from benchmarks.generators import generate_bundle
+
+SAMPLE_INTERVAL_SECONDS = 0.02
+BENCH_CONTEXT = {"Type": "Load Test", "Duration": "10 minutes", "Virtual Users": "50", "Target": "Benchmark API"}
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource  # Not on Windows; ru_maxrss is the lifetime peak (KiB on Linux, bytes on macOS)
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ResourceSampler:
+    """Samples RSS and live thread count on a background thread; keeps the peaks."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        self.peak_rss = max(self.peak_rss, _rss_bytes())
+        # The sampler's own thread is not part of what is measured
+        self.peak_threads = max(self.peak_threads, threading.active_count() - 1)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread = threading.Thread(target=self._run, name="bench-sampler", daemon=True)
+        self._thread.start()
+        self._sample()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class ProgressProbe:
+    """Counts progress-store writes and the time spent in them."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def wrap(self, apply: Callable) -> Callable:
+        def timed_apply(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return apply(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.calls += 1
+                    self.seconds += elapsed
+
+        return timed_apply
+
+
+def _patch(stack: contextlib.ExitStack, obj, name: str, value) -> None:
+    original = getattr(obj, name)
+    setattr(obj, name, value)
+    stack.callback(setattr, obj, name, original)
+
+
+@contextlib.contextmanager
+def offline_pipeline(client: FakeLLMClient, *, unthrottled: bool = False) -> Iterator[None]:
+    """
+    Route every model call to `client`, start from fresh rate limiters and
+    turn off the summary/result caches and run history so each run is cold.
+    """
+    with contextlib.ExitStack() as stack:
+        _patch(stack, ai_engine, "_get_client", lambda: client)
+        _patch(stack, ai_engine, "_limiters", {})
+        if unthrottled:
+            _patch(stack, ai_engine, "_model_ceilings", lambda model: (0, 0))
+        _patch(stack, preprocessing, "get_summary_cache", lambda: None)
+        _patch(stack, analyzer, "get_result_cache", lambda: None)
+        _patch(stack, analyzer, "get_run_history", lambda: None)
+        yield
+
+
+def _scenario_preprocess(bundle: Path, work_dir: Path) -> None:
+    files = expand_zip(str(bundle), bundle.name, str(work_dir))
+    job_id = progress_manager.create_job(files)
+    preprocessing.preprocess_files(files, progress_ctx={"job_id": job_id, "total_files": len(files)})
+
+
+def _scenario_analyze(bundle: Path, work_dir: Path) -> None:
+    files = expand_zip(str(bundle), bundle.name, str(work_dir))
+    job_id = progress_manager.create_job(files)
+    analyzer.analyze(files, BENCH_CONTEXT, job_id=job_id)
+
+
+def _api_client():
+    from fastapi.testclient import TestClient
+
+    from app.api import app
+
+    return TestClient(app)
+
+
+def _scenario_api_analyze(bundle: Path, work_dir: Path) -> None:
+    with open(bundle, "rb") as f:
+        response = _api_client().post(
+            "/analyze", files={"files": (bundle.name, f, "application/zip")}, data={"context": json.dumps(BENCH_CONTEXT)}
+        )
+    response.raise_for_status()
+
+
+def _scenario_api_progress(bundle: Path, work_dir: Path) -> None:
+    client = _api_client()
+    with open(bundle, "rb") as f:
+        response = client.post(
+            "/analyze/progress",
+            files={"files": (bundle.name, f, "application/zip")},
+            data={"context": json.dumps(BENCH_CONTEXT)},
+        )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        status = client.get(f"/analyze/progress/{job_id}").json()["status"]
+        if status in {"completed", "failed"}:
+            if status == "failed":
+                raise RuntimeError(f"Benchmark job {job_id} failed")
+            return
+        time.sleep(0.05)
+
+
+SCENARIOS: Dict[str, Callable[[Path, Path], None]] = {
+    "preprocess": _scenario_preprocess,
+    "analyze": _scenario_analyze,
+    "api_analyze": _scenario_api_analyze,
+    "api_progress": _scenario_api_progress,
+}
+
+
+def _uncompressed_mb(bundle: Path) -> float:
+    """Uncompressed size of a bundle in MB (what preprocessing actually reads)."""
+    with zipfile.ZipFile(bundle) as zf:
+        return sum(member.file_size for member in zf.infolist()) / (1024 * 1024)
+
+
+def run_scenario(
+    name: str,
+    bundle: Path,
+    *,
+    latency: str = "fixed:0.05",
+    rate_limit_ratio: float = 0.0,
+    max_in_flight: int = 0,
+    unthrottled: bool = False,
+    seed: int = 1,
+) -> Dict:
+    """Run one scenario against a fresh fake LLM and return its measurements."""
+    client = FakeLLMClient(
+        LatencyModel(latency, seed=seed), rate_limit_ratio=rate_limit_ratio, max_in_flight=max_in_flight, seed=seed
+    )
+    probe = ProgressProbe()
+    input_mb = bundle.stat().st_size / (1024 * 1024)
+    uncompressed_mb = _uncompressed_mb(bundle)
+    with offline_pipeline(client, unthrottled=unthrottled), contextlib.ExitStack() as stack:
+        _patch(stack, progress_manager.store, "apply", probe.wrap(progress_manager.store.apply))
+        work_dir = Path(tempfile.mkdtemp(prefix="bench-"))
+        stack.callback(shutil.rmtree, work_dir, True)
+        with ResourceSampler() as sampler:
+            started = time.perf_counter()
+            SCENARIOS[name](bundle, work_dir)
+            wall = time.perf_counter() - started
+    llm = client.stats()
+    return {
+        "scenario": name,
+        "wall_s": round(wall, 3),
+        "input_mb": round(input_mb, 2),
+        "uncompressed_mb": round(uncompressed_mb, 2),
+        "llm_calls": llm["llm_calls"],
+        "llm_calls_per_mb": round(llm["llm_calls"] / uncompressed_mb, 2) if uncompressed_mb else 0.0,
+        "rate_limited": llm["rate_limited"],
+        "prompt_tokens": llm["prompt_tokens"],
+        "completion_tokens": llm["completion_tokens"],
+        "peak_rss_mb": round(sampler.peak_rss / (1024 * 1024), 1),
+        "peak_threads": sampler.peak_threads,
+        "progress_updates": probe.calls,
+        "progress_ms": round(probe.seconds * 1000, 1),
+        "progress_pct": round(probe.seconds / wall * 100, 2) if wall else 0.0,
+    }
+
+
+COLUMNS = [
+    "scenario", "wall_s", "uncompressed_mb", "llm_calls", "llm_calls_per_mb", "rate_limited", "prompt_tokens",
+    "peak_rss_mb", "peak_threads", "progress_updates", "progress_ms", "progress_pct",
+]
+
+
+def format_results(results: List[Dict]) -> str:
+    lines = ["| " + " | ".join(COLUMNS) + " |", "|" + "---|" * len(COLUMNS)]
+    for row in results:
+        lines.append("| " + " | ".join(str(row[c]) for c in COLUMNS) + " |")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict]:
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks against a fake LLM backend.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--jtl-rows", type=int, default=200_000)
+    parser.add_argument("--gc-events", type=int, default=5_000)
+    parser.add_argument("--latency", default="lognormal:0.05,0.5", help="fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="share of calls answered with 429")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="429 every call above this many in flight")
+    parser.add_argument("--unthrottled", action="store_true", help="ignore configured RPM/TPM ceilings")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--bundle", help="benchmark an existing zip instead of a generated one")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    data_dir = Path(tempfile.mkdtemp(prefix="bench-data-"))
+    try:
+        bundle = Path(args.bundle) if args.bundle else generate_bundle(
+            data_dir, jtl_rows=args.jtl_rows, gc_events=args.gc_events
+        )
+        results = [
+            run_scenario(
+                name.strip(),
+                bundle,
+                latency=args.latency,
+                rate_limit_ratio=args.rate_limit_ratio,
+                max_in_flight=args.max_in_flight,
+                unthrottled=args.unthrottled,
+                seed=run + 1,
+            )
+            for run in range(args.repeat)
+            for name in args.scenarios.split(",")
+        ]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
@@ -1,23 +1,26 @@
 
+import argparse
 import sys
 import os
-import zipfile
 import json
+import shutil
+import tempfile
 from pathlib import Path
 from datetime import datetime
 from app.analyzer import analyze
+from app.batch import BATCH_WORKERS, format_summary, run_batch
+from app.bundles import expand_zip
 
 
 
-def extract_if_zip(path: str, extract_to="tmp") -> str:
+def extract_if_zip(path: str, extract_to: str) -> list:
     """
-    Extracts ZIP if necessary, returns folder path with extracted or single file.
+    Expands a ZIP's analyzable members into extract_to (streamed, bomb-checked),
+    otherwise collects the files next to the given path.
     """
-    if path.endswith(".zip"):
-        with zipfile.ZipFile(path, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
-        return extract_to
-    return os.path.dirname(path)
+    if path.lower().endswith(".zip"):
+        return expand_zip(path, os.path.basename(path), extract_to)
+    return collect_files(os.path.dirname(path) or ".")
 
 def collect_files(folder: str) -> list:
     """
@@ -33,20 +36,22 @@ def collect_files(folder: str) -> list:
             })
     return file_list
 
-def main(input_path: str):
-    extract_path = extract_if_zip(input_path)
-    files = collect_files(extract_path)
+# Static context for now — in future this can be extracted from input or user form
+DEFAULT_CONTEXT = {
+    "Type": "Load Test",
+    "Duration": "10 minutes",
+    "Virtual Users": "50",
+    "Target": ".NET API on AWS",
+    "Backend": "Oracle DB on EC2"
+}
 
-    # Static context for now — in future this can be extracted from input or user form
-    context = {
-        "Type": "Load Test",
-        "Duration": "10 minutes",
-        "Virtual Users": "50",
-        "Target": ".NET API on AWS",
-        "Backend": "Oracle DB on EC2"
-    }
-
-    result = analyze(files, context)
+def main(input_path: str, context: dict = None):
+    work_dir = tempfile.mkdtemp(prefix="bundle-")
+    try:
+        files = extract_if_zip(input_path, work_dir)
+        result = analyze(files, context or DEFAULT_CONTEXT)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
     print("\n📊 AI Analysis Result:")
     print(json.dumps(result, indent=2))
@@ -55,8 +60,34 @@ def main(input_path: str):
         json.dump(result, f, indent=2)
     print("\n✅ Saved output to output.json")
 
+def main_batch(source: str, output: str, workers: int, resume: bool, context: dict = None):
+    def report(record: dict):
+        status = "✅" if record["status"] == "ok" else "❌"
+        print(f"{status} {record['bundle']} ({record['elapsed_seconds']}s) {record.get('error', '')}".rstrip())
+
+    summary = run_batch(
+        source, output, context or DEFAULT_CONTEXT, workers=workers, resume=resume, on_record=report
+    )
+    print("\n📈 Batch summary:")
+    print(format_summary(summary))
+    print(f"\n✅ Results appended to {output}")
+    return summary
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python main.py path_to_file_or_zip")
-        sys.exit(1)
-    main(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Analyze a performance test bundle, or a batch of them.")
+    parser.add_argument("path", help="file or zip to analyze; with --batch, a directory or glob of bundles")
+    parser.add_argument("--batch", action="store_true", help="analyze every bundle under path in parallel")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="bundles analyzed at once")
+    parser.add_argument("--output", default="results.jsonl", help="batch output (one JSON line per bundle)")
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of skipping finished bundles")
+    parser.add_argument("--context", help="JSON file with the test context")
+    args = parser.parse_args()
+
+    context = None
+    if args.context:
+        with open(args.context) as f:
+            context = json.load(f)
+    if args.batch:
+        summary = main_batch(args.path, args.output, args.workers, not args.no_resume, context)
+        sys.exit(1 if summary["bundles_failed"] else 0)
+    main(args.path, context)
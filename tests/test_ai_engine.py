@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import ai_engine
+
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class _FakeClient:
+    """Rejects requests above a concurrency ceiling, like a provider enforcing limits."""
+
+    def __init__(self, ceiling):
+        self.ceiling = ceiling
+        self.in_flight = 0
+        self.rejected = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, *, model, messages, temperature):
+        if self.in_flight >= self.ceiling:
+            self.rejected += 1
+            raise _RateLimitError(0.05)
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        message = SimpleNamespace(content="ok")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=10))
+
+
+def test_retry_after_parsing():
+    assert ai_engine._retry_after_seconds(_RateLimitError(2)) == 2.0
+    err = _RateLimitError(0)
+    err.response.headers = {"retry-after-ms": "1500"}
+    assert ai_engine._retry_after_seconds(err) == 1.5
+    assert ai_engine._retry_after_seconds(Exception("no response")) is None
+
+
+def test_limiter_shrinks_window_on_429(monkeypatch):
+    client = _FakeClient(ceiling=2)
+    monkeypatch.setattr(ai_engine, "_get_client", lambda: client)
+    monkeypatch.setattr(ai_engine, "_limiters", {})
+
+    async def _burst():
+        return await asyncio.gather(
+            *(ai_engine.ask_gpt_async("hello", model="fake-model", retries=6) for _ in range(12))
+        )
+
+    results = ai_engine.llm_runtime.run(_burst())
+
+    assert results == ["ok"] * 12
+    limiter = ai_engine._limiters["fake-model"]
+    assert client.rejected >= 1
+    assert limiter.rate_limited == client.rejected
+    assert limiter.allowed() < ai_engine.LLM_MAX_CONCURRENCY
+    assert limiter.in_flight == 0
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = ai_engine.TokenBucket(per_minute=600)  # 10 tokens/s
+    bucket.tokens = 0
+
+    async def _acquire():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await bucket.acquire(1)
+        return loop.time() - start
+
+    assert asyncio.run(_acquire()) == pytest.approx(0.1, abs=0.08)
+
+
+def test_runtime_run_cancels_task_when_event_set():
+    cancel_event = threading.Event()
+    state = {}
+
+    async def _long_call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    threading.Timer(0.1, cancel_event.set).start()
+    with pytest.raises(ai_engine.AnalysisCancelled):
+        ai_engine.llm_runtime.run(_long_call(), cancel_event=cancel_event)
+    # Cancellation is delivered to the runtime loop asynchronously
+    for _ in range(50):
+        if state.get("cancelled"):
+            break
+        time.sleep(0.01)
+    assert state.get("cancelled")
+
+
+class _StreamingClient:
+    """Rate-limits the first request, then streams the reply in small deltas."""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, *, model, messages, temperature, stream, stream_options):
+        self.calls += 1
+        if self.calls == 1:
+            raise _RateLimitError(0.01)
+
+        async def _chunks():
+            for text in self.deltas:
+                await asyncio.sleep(0)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=42))
+
+        return _chunks()
+
+
+def test_stream_gpt_yields_deltas_and_retries_before_first_token(monkeypatch):
+    client = _StreamingClient(["# Exec", "utive Summary\n", "All good."])
+    monkeypatch.setattr(ai_engine, "_get_client", lambda: client)
+    monkeypatch.setattr(ai_engine, "_limiters", {})
+
+    deltas = list(ai_engine.stream_gpt("hello", model="fake-stream-model"))
+
+    assert deltas == client.deltas
+    assert client.calls == 2
+    limiter = ai_engine._limiters["fake-stream-model"]
+    assert limiter.rate_limited == 1
+    assert limiter.in_flight == 0
+
+    async def _collect():
+        return [delta async for delta in ai_engine.stream_gpt_async("hello", model="fake-stream-model")]
+
+    client.calls = 1  # skip the simulated 429 this time
+    assert asyncio.run(_collect()) == client.deltas
@@ -1,6 +1,10 @@
 
 import pytest
-from app.analyzer import analyze
+from app import analyzer
+from app.analyzer import SectionStream, _extract_section, analyze
+from app.cache import TieredCache
+from benchmarks.fake_llm import FakeLLMClient
+from benchmarks.harness import offline_pipeline
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -28,10 +32,8 @@ def test_context():
         "Target": "Node.js API on GCP"
     }
 
-def test_analyze_basic(monkeypatch, mock_files, test_context):
-    # Mock ask_gpt to avoid real API call
-    from app import ai_engine
-
+def test_analyze_basic(mock_files, test_context):
+    # Serve model calls from the local fake backend instead of the real API
     fake_response = """SUMMARY:
 The system behaved correctly under light load.
 
@@ -40,12 +42,121 @@ No errors were observed. Latency was acceptable.
 
 RECOMMENDATIONS:
 Try increasing virtual users to test scalability."""
+    client = FakeLLMClient()
+    client.reply_for = lambda model, prompt: fake_response
 
-    monkeypatch.setattr(ai_engine, "ask_gpt", lambda prompt: fake_response)
-
-    result = analyze(mock_files, test_context)
+    with offline_pipeline(client):
+        result = analyze(mock_files, test_context)
 
     assert isinstance(result.get("summary"), str)
     assert isinstance(result.get("insights"), str)
     assert isinstance(result.get("recommendations"), str)
+    assert client.stats()["llm_calls"] >= 1
+
+
+def test_section_stream_matches_extract_section():
+    report = (
+        "# Report\n\n## Executive Summary\nStable under load.\n\n"
+        "## Key Metrics & Findings\n- p95 120ms\n- 0.1% errors\n\n## Recommendations\nAdd caching."
+    )
+    sections = SectionStream()
+    closed = []
+    # Feed in uneven pieces, as tokens arrive
+    for start in range(0, len(report), 7):
+        closed.extend(sections.feed(report[start:start + 7]))
+    closed.extend(sections.finish())
+
+    by_title = dict(closed)
+    for title in ("Executive Summary", "Key Metrics & Findings", "Recommendations"):
+        assert by_title[title] == _extract_section(report, title)
+
+
+def test_analyze_streams_report_events(monkeypatch, mock_files, test_context):
+    report = "## Executive Summary\nAll good.\n## Recommendations\nShip it.\n"
+    monkeypatch.setattr(analyzer, "get_result_cache", lambda: None)
+    monkeypatch.setattr(analyzer, "get_run_history", lambda: None)
+    monkeypatch.setattr(analyzer, "preprocess_files", lambda files, **kwargs: [])
+    monkeypatch.setattr(analyzer, "stream_gpt", lambda prompt, **kwargs: iter([report[:20], report[20:]]))
+    events = []
+
+    result = analyzer.analyze(mock_files, test_context, on_event=lambda event, data: events.append((event, data)))
+
+    assert "".join(d["text"] for e, d in events if e == "token") == report
+    sections = [d for e, d in events if e == "section"]
+    assert [(s["key"], s["content"]) for s in sections] == [("summary", "All good."), ("recommendations", "Ship it.")]
+    assert [d["step"] for e, d in events if e == "stage"][-1] == "finalizing"
+    assert result["summary"] == "All good."
+
+
+def test_identical_inputs_hit_the_result_cache(monkeypatch, mock_files, test_context):
+    cache = TieredCache(None)
+    calls = []
+    monkeypatch.setattr(analyzer, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(analyzer, "get_run_history", lambda: None)
+    monkeypatch.setattr(analyzer, "preprocess_files", lambda files, **kwargs: calls.append(files) or [])
+    monkeypatch.setattr(analyzer, "ask_gpt", lambda prompt, **kwargs: "## Executive Summary\nFine.")
+
+    first = analyze(mock_files, test_context)
+    # Same contents in a different order, same context with keys reordered
+    second = analyze(list(reversed(mock_files)), dict(reversed(list(test_context.items()))))
+    changed = analyze(mock_files, dict(test_context, Duration="10 minutes"))
+
+    assert first["cache_hit"] is False and second["cache_hit"] is True
+    assert second["summary"] == first["summary"] == "Fine."
+    assert changed["cache_hit"] is False
+    assert len(calls) == 2
+
+
+def test_degraded_results_are_not_cached_and_hits_drop_run_details(monkeypatch, mock_files, test_context):
+    cache = TieredCache(None)
+    summaries = [{"name": "app.log", "summary": "[Preprocessing failed: timeout]", "degraded": True}]
+    monkeypatch.setattr(analyzer, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(analyzer, "preprocess_files", lambda files, **kwargs: summaries)
+    monkeypatch.setattr(analyzer, "ask_gpt", lambda prompt, **kwargs: "## Executive Summary\nLatency p95 was 200 ms.")
+
+    class _History:
+        def record_run(self, metrics, context=None):
+            return "run-1"
+
+    monkeypatch.setattr(analyzer, "get_run_history", lambda: _History())
+
+    degraded = analyze(mock_files, test_context)
+    summaries[0] = {"name": "app.log", "summary": "ok", "metrics": {"Login": {"p95_ms": 200.0}}}
+    healthy = analyze(mock_files, test_context)
+    replayed = analyze(mock_files, test_context)
+
+    assert degraded["cache_hit"] is False and healthy["cache_hit"] is False
+    assert replayed["cache_hit"] is True
+    assert "run_id" not in replayed and replayed["cached_run_id"] == healthy["run_id"] == "run-1"
+    # Timings are this (cached) run's, which made no model call
+    assert "final_analysis" in healthy["timings"]["stages"]
+    assert "final_analysis" not in replayed["timings"]["stages"]
+
+
+def test_jmx_plans_are_merged_into_the_prompt_context(monkeypatch, tmp_path, test_context):
+    prompts = []
+    monkeypatch.setattr(analyzer, "get_result_cache", lambda: None)
+    monkeypatch.setattr(analyzer, "get_run_history", lambda: None)
+    monkeypatch.setattr(analyzer, "ask_gpt", lambda prompt, **kwargs: prompts.append(prompt) or "## Executive Summary\nOk.")
+    monkeypatch.setattr(analyzer, "preprocess_files", lambda files, **kwargs: [
+        {"name": "plan.jmx", "file_type": "jmx", "summary": "parsed", "processor": "jmx_plan",
+         "test_context": {"Test Plan": "Checkout", "Virtual Users": "500"}},
+    ])
+
+    analyze([], test_context)
+
+    assert "- Test Plan: Checkout\n" in prompts[0]
+    assert "- Virtual Users: 10\n" in prompts[0] and "500" not in prompts[0]
+
+
+def test_result_cache_key_covers_file_types_and_preprocessing_version(monkeypatch, tmp_path):
+    from app import preprocessing
+
+    path = tmp_path / "data"
+    path.write_text("2025-07-26 12:00:01 INFO Request received\n")
+    as_log = analyzer.analysis_cache_key([{"name": "app.log", "path": str(path)}], {})
+    as_text = analyzer.analysis_cache_key([{"name": "app.txt", "path": str(path)}], {})
+    monkeypatch.setattr(preprocessing, "PREPROCESSING_VERSION", "test")
+    upgraded = analyzer.analysis_cache_key([{"name": "app.log", "path": str(path)}], {})
 
+    assert len({as_log, as_text, upgraded}) == 3
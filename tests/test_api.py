@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import io
+import threading
+import time
+import zipfile
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import api, bundles
+from app.ai_engine import AnalysisCancelled
+from app.run_history import RunHistory
+from app.scheduler import JobScheduler
+
+
+@pytest.fixture
+def client(monkeypatch):
+    seen = {}
+
+    def fake_analyze(files, context, job_id=None, cancel_event=None):
+        seen["files"] = files
+        return {"summary": "ok"}
+
+    monkeypatch.setattr(api, "analyze", fake_analyze)
+    test_client = TestClient(api.app)
+    test_client.seen = seen
+    return test_client
+
+
+def test_analyze_streams_upload_and_hashes(client, monkeypatch):
+    monkeypatch.setattr(api, "UPLOAD_BLOCK_BYTES", 4)
+    payload = b"timeStamp,elapsed,label\n1,2,a\n"
+
+    response = client.post("/analyze", files={"files": ("results.csv", payload)}, data={"context": "{}"})
+
+    assert response.status_code == 200
+    [saved] = client.seen["files"]
+    assert saved["size_bytes"] == len(payload)
+    assert saved["sha256"] == hashlib.sha256(payload).hexdigest()
+    assert saved["file_type"] == "csv"
+
+
+def test_analyze_rejects_oversized_file(client, monkeypatch):
+    monkeypatch.setattr(api, "MAX_UPLOAD_FILE_BYTES", 10)
+
+    response = client.post("/analyze", files={"files": ("big.log", b"x" * 11)})
+
+    assert response.status_code == 413
+    assert "files" not in client.seen
+
+
+def test_analyze_rejects_oversized_request_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(api, "MAX_UPLOAD_REQUEST_BYTES", 10)
+
+    response = client.post("/analyze/progress", files={"files": ("big.log", b"x" * 100)})
+
+    assert response.status_code == 413
+
+
+def test_analyze_stops_reading_chunked_uploads_at_the_limit(client, monkeypatch):
+    monkeypatch.setattr(api, "MAX_UPLOAD_REQUEST_BYTES", 1000)
+    body = (
+        b"--b\r\nContent-Disposition: form-data; name=\"files\"; filename=\"big.log\"\r\n\r\n"
+        + b"x" * 5000 + b"\r\n--b--\r\n"
+    )
+    chunks = [body[i:i + 400] for i in range(0, len(body), 400)]
+    received, sent = [], []
+
+    async def receive():
+        if len(received) == len(chunks):
+            return {"type": "http.disconnect"}
+        received.append(chunks[len(received)])
+        return {"type": "http.request", "body": received[-1], "more_body": len(received) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    # Chunked transfer: no Content-Length header to check up front
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/analyze", "raw_path": b"/analyze", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=b"), (b"transfer-encoding", b"chunked")],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    asyncio.run(api.app(scope, receive, send))
+
+    assert sent[0]["status"] == 413
+    assert len(received) == 3
+    assert "files" not in client.seen
+
+
+def test_analyze_rejects_zip_bombs(client, monkeypatch):
+    monkeypatch.setattr(bundles, "ZIP_MAX_RATIO", 10)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("huge.log", b"A" * 200_000)
+
+    response = client.post(
+        "/analyze", files={"files": ("bundle.zip", buffer.getvalue())}, data={"context": "{}"}
+    )
+
+    assert response.status_code == 413
+
+
+def test_analyze_rejects_bundles_without_analyzable_files(client):
+    empty = io.BytesIO()
+    with zipfile.ZipFile(empty, "w") as zf:
+        zf.writestr("screenshot.png", b"png")
+
+    corrupt = client.post("/analyze", files={"files": ("bundle.zip", b"PK\x03\x04 not a zip")}, data={"context": "{}"})
+    skipped = client.post("/analyze", files={"files": ("bundle.zip", empty.getvalue())}, data={"context": "{}"})
+
+    assert corrupt.status_code == 400 and "No analyzable files" in corrupt.json()["detail"]
+    assert skipped.status_code == 400
+    assert "files" not in client.seen
+
+
+def test_progress_endpoint_returns_503_when_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(api, "job_scheduler", JobScheduler(max_concurrent=1, max_queued=0))
+
+    response = client.post(
+        "/analyze/progress", files={"files": ("run.log", b"line\n")}, data={"context": "{}"}
+    )
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_analyze_has_its_own_slots_when_the_job_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(api, "job_scheduler", JobScheduler(max_concurrent=1, max_queued=0))
+    monkeypatch.setattr(api, "analyze_scheduler", JobScheduler(max_concurrent=1, max_queued=1))
+
+    progress = client.post("/analyze/progress", files={"files": ("run.log", b"line\n")}, data={"context": "{}"})
+    analysis = client.post("/analyze", files={"files": ("run.log", b"line\n")}, data={"context": "{}"})
+
+    assert progress.status_code == 503
+    assert analysis.status_code == 200
+
+
+def test_analyze_does_not_block_the_event_loop(monkeypatch):
+    release = threading.Event()
+
+    def slow_analyze(files, context, job_id=None, cancel_event=None):
+        release.wait(5)
+        return {"summary": "ok"}
+
+    monkeypatch.setattr(api, "analyze", slow_analyze)
+    monkeypatch.setattr(api, "analyze_scheduler", JobScheduler(max_concurrent=1, max_queued=1))
+
+    async def _scenario():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            analysis = asyncio.create_task(
+                http.post("/analyze", files={"files": ("run.log", b"line\n")}, data={"context": "{}"})
+            )
+            await asyncio.sleep(0.2)
+            started = time.perf_counter()
+            poll = await http.get("/analyze/progress/unknown")
+            poll_latency = time.perf_counter() - started
+            release.set()
+            return poll, poll_latency, await analysis
+
+    poll, poll_latency, analysis = asyncio.run(_scenario())
+
+    assert poll.status_code == 404
+    assert poll_latency < 0.5
+    assert analysis.status_code == 200
+
+
+def test_client_disconnect_cancels_running_analysis(monkeypatch):
+    seen = {}
+
+    def cancellable_analyze(files, context, job_id=None, cancel_event=None):
+        seen["cancelled"] = cancel_event.wait(5)
+        raise AnalysisCancelled("stopped")
+
+    class _GoneRequest:
+        async def is_disconnected(self):
+            return True
+
+    monkeypatch.setattr(api, "analyze", cancellable_analyze)
+    monkeypatch.setattr(api, "analyze_scheduler", JobScheduler(max_concurrent=1, max_queued=1))
+    monkeypatch.setattr(api, "DISCONNECT_POLL_SECONDS", 0.05)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(api._run_analysis(_GoneRequest(), [], {}))
+
+    assert exc_info.value.status_code == 499
+    assert seen["cancelled"] is True
+
+
+def test_analyze_stream_sends_events_then_result(monkeypatch):
+    def streaming_analyze(files, context, job_id=None, cancel_event=None, on_event=None):
+        on_event("stage", {"step": "ai_analysis"})
+        on_event("token", {"text": "## Executive Summary\n"})
+        on_event("section", {"title": "Executive Summary", "key": "summary", "content": "ok"})
+        return {"summary": "ok"}
+
+    monkeypatch.setattr(api, "analyze", streaming_analyze)
+    monkeypatch.setattr(api, "job_scheduler", JobScheduler(max_concurrent=1, max_queued=1))
+    client = TestClient(api.app)
+
+    response = client.post("/analyze/stream", files={"files": ("run.log", b"line\n")}, data={"context": "{}"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line.split(": ", 1)[1] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events == ["queued", "stage", "token", "section", "result"]
+
+
+def test_compare_sends_delta_table_for_stored_runs(client, monkeypatch, tmp_path):
+    history = RunHistory(tmp_path / "runs.sqlite3")
+    baseline = history.record_run({"login": {"p95_ms": 200.0, "error_rate": 0.0}})
+    candidate = history.record_run({"login": {"p95_ms": 300.0, "error_rate": 0.0}})
+    prompts = []
+
+    async def fake_ask(prompt, **kwargs):
+        prompts.append(prompt)
+        return '{"ai_comparison_summary": "slower", "ai_key_differences": ["p95 up"], "ai_recommendations": []}'
+
+    monkeypatch.setattr(api, "get_run_history", lambda: history)
+    monkeypatch.setattr(api, "ask_gpt_async", fake_ask)
+
+    response = client.post("/compare", json={"baseline_run_id": baseline, "run_ids": [candidate]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ai_comparison_summary"] == "slower"
+    assert body["regressions"] == [
+        {"run_id": candidate, "transaction": "login", "metric": "p95_ms", "baseline": 200.0,
+         "value": 300.0, "delta": 100.0, "delta_pct": 50.0, "regression": True}
+    ]
+    assert "| login | p95_ms | 200 | 300 (+50.0%) ! |" in prompts[0]
+    assert client.post("/compare", json={"baseline_run_id": baseline, "run_ids": ["nope"]}).status_code == 404
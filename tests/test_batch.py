@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+import zipfile
+
+from app import batch
+
+
+def _make_bundles(root):
+    root.mkdir()
+    with zipfile.ZipFile(root / "run1.zip", "w") as zf:
+        zf.writestr("results.csv", "timeStamp,elapsed,label\n1,2,a\n")
+        zf.writestr("image.png", b"skip")
+    (root / "run2").mkdir()
+    (root / "run2" / "app.log").write_text("ERROR boom\n")
+    (root / "run2" / "app.log.1").write_text("INFO rotated\n")
+    (root / "run3.log").write_text("INFO ok\n")
+    (root / "notes.png").write_bytes(b"ignored")
+    return root
+
+
+def test_batch_runs_bundles_in_parallel_and_writes_jsonl(tmp_path):
+    source = _make_bundles(tmp_path / "bundles")
+    output = tmp_path / "out" / "results.jsonl"
+    active, peak, lock = [0], [0], threading.Lock()
+    extracted = []
+
+    def fake_analyze(files, context, cancel_event=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            extracted.extend(f["path"] for f in files if f.get("source_zip"))
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return {"names": sorted(f["name"] for f in files)}
+
+    summary = batch.run_batch(str(source), str(output), {}, workers=3, analyze_fn=fake_analyze)
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    by_bundle = {r["bundle"].rsplit("/", 1)[-1]: r for r in records}
+    assert set(by_bundle) == {"run1.zip", "run2", "run3.log"}
+    assert by_bundle["run1.zip"]["result"] == {"names": ["results.csv"]}
+    assert by_bundle["run2"]["result"] == {"names": ["app.log", "app.log.1"]}
+    assert summary["bundles_ok"] == 3 and summary["bundles_failed"] == 0
+    assert peak[0] > 1
+    # Zip members were extracted into a per-bundle temp dir that is removed afterwards
+    assert extracted and not any(os.path.exists(path) for path in extracted)
+
+
+def test_batch_resume_skips_finished_bundles_and_retries_failures(tmp_path):
+    source = _make_bundles(tmp_path / "bundles")
+    # Results next to the bundles must not be picked up as a bundle on the second run
+    output = source / "results.jsonl"
+    calls = []
+
+    def flaky_analyze(files, context, cancel_event=None):
+        calls.append(files[0]["name"])
+        if files[0]["name"] == "app.log" and calls.count("app.log") == 1:
+            raise RuntimeError("model unavailable")
+        return {"summary": "ok"}
+
+    first = batch.run_batch(str(source), str(output), {}, workers=2, analyze_fn=flaky_analyze)
+    # Simulate a crash halfway through writing a line
+    with open(output, "a") as f:
+        f.write('{"bundle": "trunc')
+    second = batch.run_batch(str(source), str(output), {}, workers=2, analyze_fn=flaky_analyze)
+
+    assert (first["bundles_ok"], first["bundles_failed"]) == (2, 1)
+    assert (second["bundles_ok"], second["bundles_skipped"]) == (1, 2)
+    assert calls.count("app.log") == 2 and len(calls) == 4
+    assert len(batch.load_completed(output)) == 3
+
+
+def test_bundles_removed_during_the_batch_fail_alone(tmp_path):
+    source = _make_bundles(tmp_path / "bundles")
+    output = tmp_path / "results.jsonl"
+
+    def analyze_and_remove(files, context, cancel_event=None):
+        (source / "run3.log").unlink(missing_ok=True)
+        return {"summary": "ok"}
+
+    summary = batch.run_batch(str(source), str(output), {}, workers=1, analyze_fn=analyze_and_remove)
+
+    records = {r["bundle"].rsplit("/", 1)[-1]: r for r in map(json.loads, output.read_text().splitlines())}
+    assert records["run3.log"]["status"] == "failed"
+    assert (summary["bundles_ok"], summary["bundles_failed"]) == (2, 1)
@@ -0,0 +1,55 @@
+import asyncio
+import zipfile
+
+import pytest
+
+from app import ai_engine
+from app.processors.csv_parser import aggregate_jtl_csv, is_jtl_csv
+from benchmarks.fake_llm import FakeLLMClient, LatencyModel
+from benchmarks.generators import generate_bundle, generate_gc_log, generate_jmx, generate_jtl_csv
+from benchmarks.harness import offline_pipeline, run_scenario
+
+
+def test_latency_models():
+    assert LatencyModel("fixed:0.2").sample() == 0.2
+    assert all(0.1 <= LatencyModel("uniform:0.1,0.3", seed=1).sample() <= 0.3 for _ in range(20))
+    assert LatencyModel("lognormal:0.05,0.5", seed=1).sample() > 0
+    with pytest.raises(ValueError):
+        LatencyModel("gamma:1")
+
+
+def test_fake_llm_injects_429s_and_counts_tokens():
+    client = FakeLLMClient(rate_limit_ratio=0.5, retry_after=0.01, seed=3)
+
+    async def _burst():
+        return await asyncio.gather(
+            *(ai_engine.ask_gpt_async("summarize these lines", model="fake-model", retries=10) for _ in range(8))
+        )
+
+    with offline_pipeline(client, unthrottled=True):
+        replies = ai_engine.llm_runtime.run(_burst())
+
+    stats = client.stats()
+    assert len(replies) == 8 and stats["llm_calls"] == 8
+    assert stats["rate_limited"] > 0
+    assert stats["prompt_tokens"] == 8 * ai_engine.estimate_tokens("summarize these lines")
+
+
+def test_generators_produce_parseable_artifacts(tmp_path):
+    jtl = generate_jtl_csv(tmp_path / "results.csv", 600, error_rate=0.1)
+    stats = aggregate_jtl_csv(str(jtl))
+    assert is_jtl_csv(str(jtl))
+    assert stats["rows"] == 600 and 0 < stats["overall"]["error_rate"] < 0.3
+    assert "Pause Full" in generate_gc_log(tmp_path / "gc.log", 20, full_gc_every=10).read_text()
+    assert "<ThreadGroup" in generate_jmx(tmp_path / "plan.jmx").read_text()
+    bundle = generate_bundle(tmp_path / "bundle", jtl_rows=100, gc_events=10)
+    assert sorted(zipfile.ZipFile(bundle).namelist()) == ["run/gc.log", "run/plan.jmx", "run/results.jtl"]
+
+
+def test_analyze_scenario_reports_measurements(tmp_path):
+    bundle = generate_bundle(tmp_path, jtl_rows=500, gc_events=50)
+
+    row = run_scenario("analyze", bundle, latency="fixed:0")
+
+    assert row["llm_calls"] >= 1 and row["llm_calls_per_mb"] > 0
+    assert row["progress_updates"] > 0 and row["peak_threads"] >= 1 and row["peak_rss_mb"] > 0
@@ -0,0 +1,92 @@
+import hashlib
+import zipfile
+
+import pytest
+
+from app import bundles
+from app.bundles import ZipBombError, expand_zip
+
+
+def _make_zip(path, members, compression=zipfile.ZIP_DEFLATED):
+    with zipfile.ZipFile(path, "w", compression=compression) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def test_expand_zip_extracts_only_analyzable_members(tmp_path, monkeypatch):
+    monkeypatch.setattr(bundles, "ZIP_BLOCK_BYTES", 8)
+    log = b"2025-01-01 12:00:00 INFO started\n" * 5
+    zip_path = _make_zip(tmp_path / "bundle.zip", {
+        "logs/app.log": log,
+        "results/report.csv": b"timeStamp,elapsed\n1,2\n",
+        "bin/agent.jar": b"\x00" * 100,
+        "screenshot.png": b"\x89PNG",
+    })
+
+    extracted = expand_zip(zip_path, "bundle.zip", str(tmp_path / "out"))
+
+    by_name = {f["name"]: f for f in extracted}
+    assert set(by_name) == {"logs/app.log", "results/report.csv"}
+    app_log = by_name["logs/app.log"]
+    assert app_log["file_type"] == "log"
+    assert app_log["size_bytes"] == len(log)
+    assert app_log["sha256"] == hashlib.sha256(log).hexdigest()
+    assert app_log["source_zip"] == "bundle.zip"
+    with open(app_log["path"], "rb") as fh:
+        assert fh.read() == log
+
+
+def test_expand_zip_skips_paths_escaping_the_target(tmp_path):
+    zip_path = _make_zip(tmp_path / "evil.zip", {
+        "../escape.log": b"nope",
+        "/abs/path.log": b"nope",
+        "ok.log": b"fine",
+    })
+    out = tmp_path / "out"
+
+    extracted = expand_zip(zip_path, "evil.zip", str(out))
+
+    assert [f["name"] for f in extracted] == ["ok.log"]
+    assert not (tmp_path / "escape.log").exists()
+    assert all(str(out) in f["path"] for f in extracted)
+
+
+def test_expand_zip_rejects_high_compression_ratio(tmp_path, monkeypatch):
+    monkeypatch.setattr(bundles, "ZIP_MAX_RATIO", 50)
+    zip_path = _make_zip(tmp_path / "bomb.zip", {"huge.log": b"A" * 1_000_000})
+
+    with pytest.raises(ZipBombError):
+        expand_zip(zip_path, "bomb.zip", str(tmp_path / "out"))
+
+
+def test_expand_zip_rejects_oversized_totals(tmp_path, monkeypatch):
+    monkeypatch.setattr(bundles, "ZIP_MAX_TOTAL_BYTES", 100)
+    zip_path = _make_zip(
+        tmp_path / "big.zip", {"a.log": b"x" * 80, "b.log": b"y" * 80}, compression=zipfile.ZIP_STORED
+    )
+
+    with pytest.raises(ZipBombError):
+        expand_zip(zip_path, "big.zip", str(tmp_path / "out"))
+
+
+def test_jtl_rotated_logs_and_unknown_text_members_are_kept(tmp_path):
+    zip_path = _make_zip(tmp_path / "bundle.zip", {
+        "results.jtl": b"timeStamp,elapsed,label\n1,2,a\n",
+        "gc.log.1": b"[0.1s][info][gc] Pause Young 1.2ms\n",
+        "logs/app.log.2024-01-01": b"2024-01-01 00:00:00 INFO up\n",
+        "server.out": b"started\n",
+        "logs/app.log.3.gz": b"\x1f\x8b",
+        "__MACOSX/._results.jtl": b"\x00",
+        ".DS_Store": b"\x00",
+    })
+
+    extracted = expand_zip(zip_path, "bundle.zip", str(tmp_path / "out"))
+
+    types = {f["name"]: f["file_type"] for f in extracted}
+    assert types == {
+        "results.jtl": "csv",
+        "gc.log.1": "log",
+        "logs/app.log.2024-01-01": "log",
+        "server.out": "unknown",
+    }
@@ -0,0 +1,36 @@
+import time
+
+from app.cache import TieredCache, make_cache_key
+
+
+def test_cache_key_depends_on_all_parts():
+    base = make_cache_key("gpt-4.1-mini", 0.2, "template", "chunk")
+    assert base == make_cache_key("gpt-4.1-mini", 0.2, "template", "chunk")
+    assert base != make_cache_key("gpt-4.1", 0.2, "template", "chunk")
+    assert base != make_cache_key("gpt-4.1-mini", 0.3, "template", "chunk")
+    assert make_cache_key("ab", "c") != make_cache_key("a", "bc")
+
+
+def test_tiered_cache_persists_to_disk(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = TieredCache(path, max_memory_entries=1)
+    cache.set("a", "alpha")
+    cache.set("b", "beta")  # pushes "a" out of the memory tier
+    assert cache.get("a") == "alpha"
+
+    reopened = TieredCache(path)
+    assert reopened.get("b") == "beta"
+    assert reopened.get("missing") is None
+
+
+def test_tiered_cache_ttl_and_size_eviction(tmp_path):
+    cache = TieredCache(tmp_path / "cache.sqlite3", max_memory_entries=0, ttl_seconds=0.05)
+    cache.set("k", "v")
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+    small = TieredCache(tmp_path / "small.sqlite3", max_memory_entries=0, max_disk_bytes=10)
+    small.set("old", "x" * 8)
+    small.set("new", "y" * 8)
+    assert small.get("old") is None
+    assert small.get("new") == "y" * 8
@@ -0,0 +1,52 @@
+from app.chunking import iter_file_chunks, plan_file_chunks, plan_text_chunks
+from app.tokens import estimate_tokens
+
+
+def test_estimate_tokens_handles_text_and_bytes():
+    line = "2025-01-01 12:00:01 INFO Request completed in 35ms"
+    assert estimate_tokens(line) == estimate_tokens(line.encode())
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 60) == 10
+
+
+def test_log_chunks_keep_stack_traces_together(tmp_path):
+    records = []
+    for i in range(30):
+        records.append(f"2025-01-01 12:00:{i:02d} ERROR Request {i} failed")
+        records.append("java.lang.IllegalStateException: boom")
+        records.append("    at com.example.Service.call(Service.java:42)")
+    path = tmp_path / "app.log"
+    path.write_text("\n".join(records) + "\n")
+
+    plan = plan_file_chunks(path, "log", budget=60)
+    chunks = list(iter_file_chunks(path, plan))
+
+    assert len(chunks) > 1
+    assert all(chunk.startswith("2025-01-01") for chunk in chunks)
+    assert all(tokens <= 60 for tokens in plan.tokens)
+    assert "\n".join(chunks) == "\n".join(records)
+    assert plan.total_lines == len(records) + 1
+
+
+def test_csv_chunks_repeat_header(tmp_path):
+    path = tmp_path / "cpu.csv"
+    rows = [f"2025-01-01T12:00:{i:02d},{i}" for i in range(50)]
+    path.write_text("time,cpu\n" + "\n".join(rows) + "\n")
+
+    plan = plan_file_chunks(path, "csv", budget=80)
+    chunks = list(iter_file_chunks(path, plan))
+
+    assert len(chunks) > 1
+    assert all(chunk.startswith("time,cpu\n") for chunk in chunks)
+    assert [line for chunk in chunks for line in chunk.splitlines()[1:]] == rows
+
+
+def test_json_chunks_split_between_top_level_members():
+    members = [f'  "label{i}": {{\n    "count": {i},\n    "mean": {i}.5\n  }}' for i in range(20)]
+    text = "{\n" + ",\n".join(members) + "\n}"
+
+    chunks = plan_text_chunks(text, "json", budget=40)
+
+    assert len(chunks) > 1
+    assert all(chunk.lstrip().startswith(('"label', "{")) for chunk in chunks)
+    assert "\n".join(chunks) == text
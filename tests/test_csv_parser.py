@@ -0,0 +1,58 @@
+from app.processors.csv_parser import aggregate_jtl_csv, format_jtl_stats, is_jtl_csv
+
+
+def _write_jtl(path):
+    rows = ["timeStamp,elapsed,label,responseCode,success"]
+    for i in range(100):
+        rows.append(f"{1700000000000 + i * 1000},{i + 1},login,200,true")
+    for i in range(10):
+        rows.append(f"{1700000000000 + i * 1000},500,search,503,false")
+    path.write_text("\n".join(rows) + "\n")
+
+
+def test_aggregate_jtl_csv_in_chunks(tmp_path):
+    path = tmp_path / "results.csv"
+    _write_jtl(path)
+    assert is_jtl_csv(str(path))
+
+    stats = aggregate_jtl_csv(str(path), chunk_rows=7, bucket_seconds=60)
+    by_label = {r["label"]: r for r in stats["labels"]}
+
+    assert stats["rows"] == 110
+    assert by_label["login"]["count"] == 100
+    assert by_label["login"]["max_ms"] == 100
+    assert abs(by_label["login"]["mean_ms"] - 50.5) < 1e-9
+    assert abs(by_label["login"]["p90_ms"] - 90) <= 1.5
+    assert by_label["search"]["error_rate"] == 1.0
+    assert stats["status_codes"] == {"200": 100, "503": 10}
+    assert sum(b["requests"] for b in stats["throughput"]) == 110
+
+    table = format_jtl_stats(stats)
+    assert "| login | 100 |" in table
+    assert "TOTAL" in table
+
+
+def test_is_jtl_csv_rejects_other_csv(tmp_path):
+    path = tmp_path / "cpu.csv"
+    path.write_text("time,cpu\n1,50\n")
+    assert not is_jtl_csv(str(path))
+
+
+def test_formatted_jmeter_timestamps_are_parsed(tmp_path):
+    path = tmp_path / "results.jtl"
+    rows = ["timeStamp,elapsed,label,responseCode,success"]
+    rows += [f"2025/07/26 12:0{i // 60}:{i % 60:02d}.123,{100 + i},login,200,true" for i in range(120)]
+    path.write_text("\n".join(rows) + "\n")
+
+    stats = aggregate_jtl_csv(str(path), bucket_seconds=60)
+
+    assert stats["rows"] == 120
+    assert [b["requests"] for b in stats["throughput"]] == [60, 60]
+    assert 119 < stats["duration_s"] < 121
+
+
+def test_unparseable_timestamps_give_no_aggregate(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_text("timeStamp,elapsed,label\nsoon,12,login\nlater,15,login\n")
+
+    assert aggregate_jtl_csv(str(path)) is None
@@ -0,0 +1,94 @@
+from app.processors.jmx_parser import jmx_test_context, parse_jmx
+from benchmarks.generators import generate_jmx
+
+PLAN = """<?xml version="1.0" encoding="UTF-8"?>
+<jmeterTestPlan version="1.2" properties="5.0">
+  <hashTree>
+    <TestPlan guiclass="TestPlanGui" testclass="TestPlan" testname="Search soak" enabled="true"/>
+    <hashTree>
+      <ConstantThroughputTimer guiclass="TestBeanGUI" testclass="ConstantThroughputTimer" testname="Pace" enabled="true">
+        <doubleProp><name>throughput</name><value>600.0</value><savedValue>0.0</savedValue></doubleProp>
+      </ConstantThroughputTimer>
+      <hashTree/>
+      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="Users" enabled="true">
+        <elementProp name="ThreadGroup.main_controller" elementType="LoopController" testclass="LoopController">
+          <stringProp name="LoopController.loops">-1</stringProp>
+        </elementProp>
+        <stringProp name="ThreadGroup.num_threads">${__P(users,25)}</stringProp>
+        <stringProp name="ThreadGroup.ramp_time">120</stringProp>
+        <boolProp name="ThreadGroup.scheduler">false</boolProp>
+        <stringProp name="ThreadGroup.duration">3600</stringProp>
+      </ThreadGroup>
+      <hashTree>
+        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="search" enabled="true">
+          <stringProp name="HTTPSampler.path">/api/search</stringProp>
+          <stringProp name="HTTPSampler.method">POST</stringProp>
+        </HTTPSamplerProxy>
+        <hashTree>
+          <ResponseAssertion guiclass="AssertionGui" testclass="ResponseAssertion" testname="200" enabled="true"/>
+          <hashTree/>
+          <UniformRandomTimer guiclass="UniformRandomTimerGui" testclass="UniformRandomTimer" testname="Think" enabled="true">
+            <stringProp name="ConstantTimer.delay">500</stringProp>
+            <stringProp name="RandomTimer.range">1000</stringProp>
+          </UniformRandomTimer>
+          <hashTree/>
+        </hashTree>
+        <TransactionController guiclass="TransactionControllerGui" testclass="TransactionController" testname="Old flow" enabled="false"/>
+        <hashTree>
+          <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="legacy" enabled="true">
+            <stringProp name="HTTPSampler.path">/v1/legacy</stringProp>
+          </HTTPSamplerProxy>
+          <hashTree/>
+        </hashTree>
+      </hashTree>
+      <com.blazemeter.jmeter.threads.concurrency.ConcurrencyThreadGroup guiclass="ConcurrencyThreadGroupGui"
+          testclass="com.blazemeter.jmeter.threads.concurrency.ConcurrencyThreadGroup" testname="Spike" enabled="true">
+        <stringProp name="TargetLevel">200</stringProp>
+        <stringProp name="RampUp">2</stringProp>
+        <stringProp name="Steps">4</stringProp>
+        <stringProp name="Hold">10</stringProp>
+        <stringProp name="Unit">M</stringProp>
+      </com.blazemeter.jmeter.threads.concurrency.ConcurrencyThreadGroup>
+      <hashTree>
+        <JSR223Sampler guiclass="TestBeanGUI" testclass="JSR223Sampler" testname="warm cache" enabled="true"/>
+        <hashTree/>
+      </hashTree>
+    </hashTree>
+  </hashTree>
+</jmeterTestPlan>
+"""
+
+
+def test_parse_jmx_extracts_groups_samplers_timers_and_assertions(tmp_path):
+    path = tmp_path / "soak.jmx"
+    path.write_text(PLAN)
+
+    context = jmx_test_context(parse_jmx(str(path)))
+
+    assert context == {
+        "Test Plan": "Search soak",
+        "Thread Group 1 'Users'": "ThreadGroup, ${__P(users,25)} threads, ramp-up 120s, loops forever, 1 samplers",
+        "Thread Group 1 'Users' samplers": "search (POST /api/search)",
+        "Thread Group 1 'Users' timers": "Think: 500 ms + random 1000 ms",
+        "Thread Group 1 'Users' assertions": "ResponseAssertion x1",
+        "Thread Group 2 'Spike'": "ConcurrencyThreadGroup, 200 threads, ramp-up 2min, 4 steps, hold 10min, 1 samplers",
+        "Thread Group 2 'Spike' samplers": "warm cache (JSR223Sampler)",
+        "Plan-level timers": "Pace: 600.0 samples/min",
+    }
+
+
+def test_parse_jmx_reads_generated_plans(tmp_path):
+    plan = parse_jmx(str(generate_jmx(tmp_path / "plan.jmx", thread_groups=3, samplers_per_group=40)))
+
+    assert [g["sampler_count"] for g in plan["thread_groups"]] == [40, 40, 40]
+    assert plan["thread_groups"][0]["duration_s"] == "600"
+    assert plan["variables"] == {"host": "shop.example.com"}
+    context = jmx_test_context(plan)
+    assert context["Thread Group 3 'Group 3' samplers"].endswith("(+25 more)")
+
+
+def test_non_plan_xml_is_not_parsed(tmp_path):
+    path = tmp_path / "other.jmx"
+    path.write_text("<config><hashTree/></config>")
+
+    assert parse_jmx(str(path)) is None
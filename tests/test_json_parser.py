@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from app.processors.json_parser import format_summary_table, iter_json_members, parse_summary_json
+from app.run_history import metrics_from_markdown
+
+JMETER_STATS = {
+    "Total": {"transaction": "Total", "sampleCount": 300, "errorCount": 3, "errorPct": 1.0, "meanResTime": 120.5,
+              "medianResTime": 100, "pct1ResTime": 180, "pct2ResTime": 220, "pct3ResTime": 400, "maxResTime": 900,
+              "throughput": 25.0},
+    "login": {"transaction": "login", "sampleCount": 200, "errorCount": 0, "errorPct": 0.0, "meanResTime": 90.0,
+              "medianResTime": 80, "pct1ResTime": 150, "pct2ResTime": 190, "pct3ResTime": 300, "maxResTime": 700,
+              "throughput": 16.7},
+    "checkout": {"transaction": "checkout", "sampleCount": 100, "errorCount": 3, "errorPct": 3.0, "meanResTime": 181.0,
+                 "medianResTime": 160, "pct1ResTime": 260, "pct2ResTime": 300, "pct3ResTime": 500, "maxResTime": 900,
+                 "throughput": 8.3},
+}
+
+
+def test_iter_json_members_streams_across_small_blocks(tmp_path):
+    path = tmp_path / "statistics.json"
+    path.write_text(json.dumps(JMETER_STATS, indent=4) + "\n")
+
+    members = dict(iter_json_members(str(path), block_bytes=16))
+
+    assert members == JMETER_STATS
+
+
+def test_numbers_split_at_block_edges_are_not_truncated(tmp_path):
+    path = tmp_path / "numbers.json"
+    path.write_text("[" + ",".join(str(10 ** n) for n in range(12)) + "]")
+
+    assert [v for _, v in iter_json_members(str(path), block_bytes=1)] == [10 ** n for n in range(12)]
+
+
+def test_malformed_json_raises(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text('{"a": 1, "b": ')
+
+    with pytest.raises(ValueError):
+        list(iter_json_members(str(path)))
+
+
+def test_jmeter_statistics_flatten_to_a_table_run_history_can_read(tmp_path):
+    path = tmp_path / "statistics.json"
+    path.write_text(json.dumps(JMETER_STATS))
+
+    summary = parse_summary_json(str(path))
+    metrics = metrics_from_markdown(format_summary_table(summary))
+
+    assert summary["source"] == "jmeter"
+    assert [row["label"] for row in summary["labels"]] == ["login", "checkout"]
+    assert summary["overall"]["label"] == "TOTAL"
+    assert metrics["checkout"]["p95_ms"] == 300
+    assert metrics["checkout"]["error_rate"] == pytest.approx(0.03)
+
+
+def test_k6_handle_summary_uses_name_tagged_submetrics(tmp_path):
+    path = tmp_path / "summary.json"
+    path.write_text(json.dumps({
+        "root_group": {"name": "", "checks": []},
+        "metrics": {
+            "http_req_duration": {"type": "trend", "values": {"avg": 150.0, "med": 120.0, "p(90)": 250.0, "p(95)": 300.0, "max": 950.0}},
+            "http_req_duration{name:login}": {"type": "trend", "values": {"avg": 90.0, "med": 80.0, "p(95)": 200.0, "max": 400.0}},
+            "http_req_duration{expected_response:true}": {"type": "trend", "values": {"avg": 140.0}},
+            "http_reqs": {"type": "counter", "values": {"count": 1200, "rate": 20.0}},
+            "http_req_failed": {"type": "rate", "values": {"rate": 0.02}},
+        },
+    }))
+
+    summary = parse_summary_json(str(path))
+
+    assert summary["source"] == "k6"
+    [login] = summary["labels"]
+    assert (login["label"], login["p95_ms"], login["count"]) == ("login", 200.0, None)
+    assert summary["overall"]["count"] == 1200 and summary["overall"]["error_rate"] == 0.02
+
+
+def test_gatling_stats_walks_groups(tmp_path):
+    def stats(total, ko, p95):
+        return {"numberOfRequests": {"total": total, "ok": total - ko, "ko": ko}, "meanResponseTime": {"total": 50},
+                "percentiles1": {"total": 40}, "percentiles3": {"total": p95}, "percentiles4": {"total": p95 * 2},
+                "maxResponseTime": {"total": 999}, "meanNumberOfRequestsPerSecond": {"total": 5.5}}
+
+    path = tmp_path / "stats.json"
+    path.write_text(json.dumps({
+        "type": "GROUP", "name": "All Requests", "stats": stats(100, 4, 120),
+        "contents": {"grp": {"type": "GROUP", "name": "Checkout", "contents": {
+            "req_pay": {"type": "REQUEST", "name": "pay", "stats": stats(40, 4, 300)}}}},
+    }))
+
+    summary = parse_summary_json(str(path))
+
+    assert summary["source"] == "gatling"
+    [pay] = summary["labels"]
+    assert pay["label"] == "Checkout / pay" and pay["error_rate"] == 0.1 and pay["p95_ms"] == 300
+    assert summary["overall"]["count"] == 100
+
+
+def test_other_json_is_not_a_summary(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"name": "service", "replicas": 3}))
+
+    assert parse_summary_json(str(path)) is None
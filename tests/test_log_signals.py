@@ -0,0 +1,93 @@
+from app.processors import log_signals
+from app.processors.log_signals import extract_log_signals, format_log_signals, format_windows
+
+
+def _write(tmp_path, lines):
+    path = tmp_path / "app.log"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_counts_signals_per_minute_and_groups_exception_signatures(tmp_path):
+    path = _write(tmp_path, [
+        "2025-07-26 12:00:01,123 INFO  started",
+        "2025-07-26 12:00:02,456 WARN  slow response 1200ms",
+        "2025-07-26 12:01:03,000 ERROR request failed",
+        "java.net.SocketTimeoutException: Read timed out after 30000 ms",
+        "\tat java.net.SocketInputStream.read(SocketInputStream.java:150)",
+        "2025-07-26 12:01:04,000 ERROR request failed",
+        "java.net.SocketTimeoutException: Read timed out after 15000 ms",
+        "2025-07-26 12:01:05,000 ERROR HikariPool-1 - Connection is not available, request timed out after 30000ms.",
+        "[2025-07-26T12:01:06.000+0000][12.345s][info][gc] GC(7) Pause Full (G1 Compaction Pause) 3900M->600M(4096M) 812.500ms",
+    ])
+
+    signals = extract_log_signals(path)
+
+    first, second = signals["series"]
+    assert (first["minute"], first["lines"], first["warnings"], first["errors"]) == ("2025-07-26 12:00", 2, 1, 0)
+    assert (second["minute"], second["lines"]) == ("2025-07-26 12:01", 7)
+    assert second["exceptions"] == 2
+    assert second["pool_exhaustion"] == 1
+    assert second["timeouts"] == 3
+    assert second["gc_pauses"] == 1 and signals["gc_max_ms"] == 812.5
+    assert signals["top_exceptions"] == [("java.net.SocketTimeoutException: Read timed out after N ms", 2)]
+    table = format_log_signals(signals)
+    assert "| 2025-07-26 12:01 | 7 | 3 | 0 | 2 | 3 | 1 | 1 | 812 |" in table
+
+
+def test_windows_cover_error_bursts_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_signals, "CONTEXT_LINES_BEFORE", 2)
+    monkeypatch.setattr(log_signals, "CONTEXT_LINES_AFTER", 2)
+    lines = [f"2025-07-26 12:{m:02d}:{s:02d} INFO ok {m}-{s}" for m in range(6) for s in range(0, 60, 10)]
+    lines.insert(8, "2025-07-26 12:01:15 ERROR lone failure")
+    burst = [f"2025-07-26 12:04:2{i} ERROR upstream refused connection {i}" for i in range(6)]
+    at = lines.index("2025-07-26 12:04:20 INFO ok 4-20")
+    lines[at:at] = burst
+
+    signals = extract_log_signals(_write(tmp_path, lines))
+
+    assert [b["minute"] for b in signals["bursts"]] == ["2025-07-26 12:04"]
+    [window] = signals["windows"]
+    assert window["events"] == 6
+    text = format_windows(signals)
+    assert "ok 4-0" in text and "ok 4-10" in text and "ok 4-30" in text
+    assert "lone failure" not in text and "ok 0-0" not in text
+
+
+def test_logs_without_errors_produce_no_windows(tmp_path):
+    path = _write(tmp_path, [f"12:00:{s:02d} INFO heartbeat" for s in range(30)])
+
+    signals = extract_log_signals(path)
+
+    assert signals["windows"] == [] and signals["bursts"] == []
+    assert signals["series"][0]["minute"] == "12:00"
+
+
+def test_logs_without_timestamps_are_bucketed_by_line_count(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_signals, "LINES_PER_BUCKET", 100)
+    monkeypatch.setattr(log_signals, "CONTEXT_LINES_AFTER", 2)
+    lines = ["INFO request served"] * 500
+    for i in range(300, 320, 4):
+        lines[i] = "ERROR java.net.SocketTimeoutException: Read timed out"
+
+    signals = extract_log_signals(_write(tmp_path, lines))
+
+    assert signals["bucket"] == "lines"
+    assert [row["minute"] for row in signals["series"]][:2] == ["lines 1-100", "lines 101-200"]
+    assert len(signals["series"]) == 5
+    assert [b["minute"] for b in signals["bursts"]] == ["lines 301-400"]
+    assert len(signals["windows"]) == 3
+    assert "Events per 100 lines (no timestamps found):" in format_log_signals(signals)
+
+
+def test_lines_with_several_signals_count_as_one_error_event(tmp_path):
+    lines = ["2025-07-26 12:00:00 INFO ok"] * 5
+    lines += ["2025-07-26 12:01:00 ERROR java.net.SocketTimeoutException: Read timed out"] * 20
+
+    signals = extract_log_signals(_write(tmp_path, lines))
+
+    assert signals["bursts"] == [{"minute": "2025-07-26 12:01", "events": 20}]
+    assert signals["totals"]["error_lines"] == 20
+    # The per-kind counters still see every signal
+    assert (signals["totals"]["errors"], signals["totals"]["exceptions"], signals["totals"]["timeouts"]) == (20, 20, 20)
+    assert "Error lines: 20 |" in format_log_signals(signals)
@@ -0,0 +1,34 @@
+from app.processors.log_templates import DrainMiner, format_template_table, split_timestamp
+
+
+def test_split_timestamp():
+    assert split_timestamp("2025-01-01 12:00:01,123 INFO started") == ("2025-01-01 12:00:01,123", "INFO started")
+    assert split_timestamp("no timestamp here") == (None, "no timestamp here")
+
+
+def test_drain_miner_groups_repeated_shapes():
+    miner = DrainMiner()
+    for i in range(50):
+        miner.add_line(f"2025-01-01 12:00:{i:02d} INFO Request /api/items/{i} completed in {i * 3}ms user u{i % 3}")
+    miner.add_line("2025-01-01 12:01:00 ERROR Connection pool exhausted")
+
+    templates = miner.top_templates()
+    assert len(templates) == 2
+    top = templates[0]
+    assert top.count == 50
+    assert top.first_seen == "2025-01-01 12:00:00"
+    assert top.last_seen == "2025-01-01 12:00:49"
+    assert top.template == "INFO Request <*> completed in <*> user <*>"
+    assert top.samples[5][:2] == ["0ms", "3ms"]
+
+    table = format_template_table(miner)
+    assert "51 lines -> 2 templates" in table
+    assert "ERROR Connection pool exhausted" in table
+
+
+def test_drain_miner_respects_template_cap():
+    miner = DrainMiner(max_templates=1)
+    miner.add_line("alpha beta gamma")
+    miner.add_line("completely different words here now")
+    assert len(miner.templates) == 1
+    assert miner.unmatched_lines == 1
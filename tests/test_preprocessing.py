@@ -0,0 +1,264 @@
+import json
+
+from app import preprocessing
+from app.cache import TieredCache
+
+
+def test_preprocess_files_summarizes_streamed_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "SUMMARY_CHUNK_TOKENS", 40)
+    monkeypatch.setattr(preprocessing, "LOG_COMPACTION_ENABLED", False)
+    monkeypatch.setattr(preprocessing, "LOG_SIGNALS_ENABLED", False)
+    monkeypatch.setattr(preprocessing, "MAX_CHUNKS_IN_FLIGHT", 2)
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+    prompts = []
+
+    async def fake_ask_gpt_async(prompt, *, model=None, temperature=0.4, retries=3):
+        prompts.append(prompt)
+        return "summary"
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fake_ask_gpt_async)
+    path = tmp_path / "gc.log"
+    path.write_text("\n".join(f"GC pause {i}ms" for i in range(35)))  # 5 tokens per line
+
+    [result] = preprocessing.preprocess_files([{"name": "gc.log", "path": str(path)}])
+
+    assert result["chunks"] == 5
+    assert result["planned_tokens"] == 175
+    assert result["chunk_summaries"] == ["summary"] * 5
+    assert result["cache"] == {"hits": 0, "misses": 6}
+    assert len(prompts) == 6
+
+
+def test_tree_reduce_overlaps_with_chunk_summaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "SUMMARY_CHUNK_TOKENS", 10)
+    monkeypatch.setattr(preprocessing, "LOG_COMPACTION_ENABLED", False)
+    monkeypatch.setattr(preprocessing, "LOG_SIGNALS_ENABLED", False)
+    monkeypatch.setattr(preprocessing, "MAX_CHUNKS_IN_FLIGHT", 2)
+    monkeypatch.setattr(preprocessing, "REDUCE_FAN_IN", 2)
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+    calls = []
+
+    async def fake_ask_gpt_async(prompt, *, model=None, temperature=0.4, retries=3):
+        calls.append("reduce" if "Partial Summaries" in prompt else "chunk")
+        return f"summary {len(calls)}"
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fake_ask_gpt_async)
+    path = tmp_path / "gc.log"
+    path.write_text("\n".join(f"GC pause {i}ms" for i in range(18)))  # 2 lines per chunk
+
+    [result] = preprocessing.preprocess_files([{"name": "gc.log", "path": str(path)}])
+
+    assert result["chunks"] == 9
+    assert result["reduce_depth"] == 4
+    assert calls.count("chunk") == 9
+    assert calls.count("reduce") == 5 + 3 + 2 + 1
+    # The first reductions run while later chunks are still being summarized
+    assert calls.index("reduce") < len(calls) - 1 - calls[::-1].index("chunk")
+
+
+def test_unchanged_files_reuse_their_summary_record(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "SUMMARY_CHUNK_TOKENS", 40)
+    monkeypatch.setattr(preprocessing, "LOG_COMPACTION_ENABLED", False)
+    monkeypatch.setattr(preprocessing, "LOG_SIGNALS_ENABLED", False)
+    cache = TieredCache(None)
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: cache)
+    prompts = []
+
+    async def fake_ask_gpt_async(prompt, *, model=None, temperature=0.4, retries=3):
+        prompts.append(prompt)
+        return "summary"
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fake_ask_gpt_async)
+    old = tmp_path / "gc.log"
+    old.write_text("\n".join(f"GC pause {i}ms" for i in range(35)))
+    first = preprocessing.preprocess_files([{"name": "gc.log", "path": str(old)}])
+    calls_for_first_run = len(prompts)
+
+    new = tmp_path / "app.log"
+    new.write_text("ERROR Connection pool exhausted\n")
+    renamed = tmp_path / "gc-copy.log"
+    renamed.write_bytes(old.read_bytes())
+    second = preprocessing.preprocess_files([
+        {"name": "gc-copy.log", "path": str(renamed), "file_id": "f1"},
+        {"name": "app.log", "path": str(new), "file_id": "f2"},
+    ])
+
+    reused, fresh = second
+    assert first[0]["reused"] is False
+    assert reused["reused"] is True and fresh["reused"] is False
+    assert reused["name"] == "gc-copy.log" and reused["file_id"] == "f1"
+    assert reused["summary"] == first[0]["summary"]
+    assert reused["chunks"] == first[0]["chunks"] == 5
+    # Only the new file was sent to the model
+    assert all("File: app.log" in prompt for prompt in prompts[calls_for_first_run:])
+
+
+def test_summaries_with_failed_chunks_are_not_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "SUMMARY_CHUNK_TOKENS", 40)
+    monkeypatch.setattr(preprocessing, "LOG_COMPACTION_ENABLED", False)
+    monkeypatch.setattr(preprocessing, "LOG_SIGNALS_ENABLED", False)
+    cache = TieredCache(None)
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: cache)
+    prompts = []
+
+    async def flaky_ask_gpt_async(prompt, **kwargs):
+        prompts.append(prompt)
+        if "Chunk 2 of " in prompt:
+            raise RuntimeError("429 Too Many Requests")
+        return "summary"
+
+    async def healthy_ask_gpt_async(prompt, **kwargs):
+        prompts.append(prompt)
+        return "summary"
+
+    path = tmp_path / "gc.log"
+    path.write_text("\n".join(f"GC pause {i}ms" for i in range(35)))
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", flaky_ask_gpt_async)
+    [first] = preprocessing.preprocess_files([{"name": "gc.log", "path": str(path)}])
+    prompts.clear()
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", healthy_ask_gpt_async)
+    [second] = preprocessing.preprocess_files([{"name": "gc.log", "path": str(path)}])
+
+    assert first["degraded"] is True and "summary failed" in first["chunk_summaries"][1]
+    assert second["reused"] is False and second["degraded"] is False
+    assert any("Chunk 2 of " in prompt for prompt in prompts)
+    assert second["chunk_summaries"] == ["summary"] * 5
+
+
+def test_small_json_summaries_skip_the_llm(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+
+    async def fail_ask_gpt_async(prompt, **kwargs):
+        raise AssertionError("summary JSON should not reach the model")
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fail_ask_gpt_async)
+    path = tmp_path / "statistics.json"
+    path.write_text(json.dumps({
+        "login": {"transaction": "login", "sampleCount": 10, "errorPct": 0.0, "meanResTime": 90.0, "medianResTime": 80,
+                  "pct1ResTime": 150, "pct2ResTime": 190, "pct3ResTime": 300, "maxResTime": 700, "throughput": 1.5},
+    }, indent=2))
+
+    [result] = preprocessing.preprocess_files([{"name": "statistics.json", "path": str(path)}])
+
+    assert result["processor"] == "json_summary"
+    assert "| login | 10 | 90.0 | 80 | 150 | 190 | 300 | 700 | 0.00 | 1.50 |" in result["summary"]
+    assert result["metrics"]["login"]["p99_ms"] == 300
+
+
+def test_oversized_json_summaries_summarize_the_table_not_the_raw_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+    monkeypatch.setattr(preprocessing, "JSON_SUMMARY_MAX_TOKENS", 50)
+    prompts = []
+
+    async def fake_ask_gpt_async(prompt, **kwargs):
+        prompts.append(prompt)
+        return "summary"
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fake_ask_gpt_async)
+    path = tmp_path / "statistics.json"
+    path.write_text(json.dumps({
+        f"txn{i}": {"transaction": f"txn{i}", "sampleCount": 10 + i, "meanResTime": 5.0, "throughput": 1.0}
+        for i in range(40)
+    }))
+
+    [result] = preprocessing.preprocess_files([{"name": "statistics.json", "path": str(path)}])
+
+    assert result["processor"] == "json_summary_chunks"
+    assert prompts and all('"sampleCount"' not in p for p in prompts)
+    assert any("| txn39 | 49 |" in p for p in prompts)
+
+
+def test_large_logs_send_only_error_windows_to_the_summarizer(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "SUMMARY_CHUNK_TOKENS", 400)
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+    prompts = []
+
+    async def fake_ask_gpt_async(prompt, **kwargs):
+        prompts.append(prompt)
+        return "windows summary"
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fake_ask_gpt_async)
+    lines = [f"2025-07-26 12:{m:02d}:{s:02d} INFO request served id={m * 60 + s}" for m in range(10) for s in range(60)]
+    lines[400:400] = [f"2025-07-26 12:06:40 ERROR HikariPool-1 - Connection is not available, attempt {i}" for i in range(8)]
+    path = tmp_path / "app.log"
+    path.write_text("\n".join(lines))
+
+    [result] = preprocessing.preprocess_files([{"name": "app.log", "path": str(path)}])
+
+    assert result["processor"] == "log_signals"
+    assert result["summary"].startswith("Log signals extracted locally")
+    assert result["summary"].endswith("windows summary")
+    assert prompts and all("id=10 " not in p for p in prompts)
+    assert any("attempt 7" in p for p in prompts)
+
+
+def test_large_logs_without_errors_need_no_model_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "SUMMARY_CHUNK_TOKENS", 40)
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+
+    async def fail_ask_gpt_async(prompt, **kwargs):
+        raise AssertionError("no model call expected")
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fail_ask_gpt_async)
+    path = tmp_path / "gc.log"
+    path.write_text("\n".join(f"[2025-07-26T12:00:{i:02d}.000+0000] GC({i}) Pause Young 512M->128M(1024M) {i}.5ms" for i in range(40)))
+
+    [result] = preprocessing.preprocess_files([{"name": "gc.log", "path": str(path)}])
+
+    assert result["processor"] == "log_signals"
+    assert result["chunks"] == 0
+    assert "GC pauses: 40 (max 40 ms" in result["summary"]
+
+
+def test_metric_exports_are_downsampled_without_model_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+
+    async def fail_ask_gpt_async(prompt, **kwargs):
+        raise AssertionError("no model call expected")
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fail_ask_gpt_async)
+    path = tmp_path / "cpu.csv"
+    path.write_text("timestamp,cpu\n" + "\n".join(f"{1753531200 + i},{50 + (i == 700) * 40}" for i in range(1000)))
+
+    [result] = preprocessing.preprocess_files([{"name": "cpu.csv", "path": str(path)}])
+
+    assert result["processor"] == "timeseries"
+    assert result["total_lines"] == 1001
+    assert "max 90 at +700s" in result["summary"]
+
+
+def test_jmx_plans_are_parsed_without_model_calls(tmp_path, monkeypatch):
+    from benchmarks.generators import generate_jmx
+
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+
+    async def fail_ask_gpt_async(prompt, **kwargs):
+        raise AssertionError("no model call expected")
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fail_ask_gpt_async)
+    path = generate_jmx(tmp_path / "plan.jmx")
+
+    [result] = preprocessing.preprocess_files([{"name": "plan.jmx", "path": str(path)}])
+
+    assert result["processor"] == "jmx_plan"
+    assert result["chunks"] == 0
+    assert result["test_context"]["Thread Group 1 'Group 1'"].startswith("ThreadGroup, 50 threads, ramp-up 60s")
+
+
+def test_jtl_files_are_aggregated_locally(tmp_path, monkeypatch):
+    from benchmarks.generators import generate_jtl_csv
+
+    monkeypatch.setattr(preprocessing, "get_summary_cache", lambda: None)
+
+    async def fail_ask_gpt_async(prompt, **kwargs):
+        raise AssertionError("no model call expected")
+
+    monkeypatch.setattr(preprocessing, "ask_gpt_async", fail_ask_gpt_async)
+    path = generate_jtl_csv(tmp_path / "results.jtl", 300)
+
+    [result] = preprocessing.preprocess_files([{"name": "results.jtl", "path": str(path)}])
+
+    assert result["file_type"] == "csv"
+    assert result["processor"] == "jtl_aggregate"
+    assert result["metrics"]["login"]["count"] == 50
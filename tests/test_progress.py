@@ -0,0 +1,217 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import api, progress
+from app.progress import ProgressManager, merge_events
+from app.progress_store import MAX_LOG_LINES, MemoryProgressStore, SqliteProgressStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def _make(**kwargs):
+        if request.param == "memory":
+            return MemoryProgressStore(**kwargs)
+        return SqliteProgressStore(tmp_path / "progress.sqlite3", **kwargs)
+    return _make
+
+
+def _files():
+    return [
+        {"file_id": "a", "name": "app.log", "file_type": "log"},
+        {"file_id": "b", "name": "results.csv", "file_type": "csv"},
+    ]
+
+
+def test_updates_become_sequenced_deltas(make_store):
+    manager = ProgressManager(make_store())
+    job_id = manager.create_job(_files())
+    manager.start(job_id)
+    manager.update(job_id, progress=20, file_id="b", file_status="summarizing", chunk_index=1, chunk_total=4)
+    manager.update(job_id, progress=30, file_id="b", chunk_index=2, log="chunk 2 done")
+
+    events, snapshot = manager.events_since(job_id, 1)
+    assert snapshot is None
+    assert [e["seq"] for e in events] == [2, 3]
+
+    delta = merge_events(events)
+    assert delta["seq"] == 3
+    assert delta["job"]["progress"] == 30
+    assert delta["files"] == [
+        {"index": 1, "file_id": "b", "status": "summarizing", "chunk_index": 2, "chunk_total": 4}
+    ]
+    assert delta["logs"][0].endswith("chunk 2 done")
+    assert manager.events_since(job_id, 3) == ([], None)
+
+    job = manager.get(job_id)
+    assert job["files"][1]["chunk_index"] == 2 and job["files"][0]["status"] == "pending"
+
+
+def test_posted_updates_do_not_wait_for_the_store(make_store):
+    store = make_store()
+    manager = ProgressManager(store)
+    job_id = manager.create_job(_files())
+    released = threading.Event()
+    apply = store.apply
+
+    def slow_apply(*args, **kwargs):
+        released.wait(5)
+        return apply(*args, **kwargs)
+
+    store.apply = slow_apply
+    for i in range(1, 4):
+        manager.post_update(job_id, progress=i * 10, file_id="a", chunk_index=i)
+    assert manager.get(job_id)["progress"] == 0
+
+    released.set()
+    manager.set_result(job_id, {"summary": "ok"})
+    job = manager.get(job_id)
+    # Posted updates are written in order and before the final state
+    events, _ = manager.events_since(job_id, 1)
+    assert [e["job"]["progress"] for e in events] == [20, 30, 100]
+    assert job["status"] == "completed" and job["progress"] == 100
+    assert job["files"][0]["chunk_index"] == 3
+
+
+def test_finishing_a_job_waits_only_for_its_own_posted_updates(make_store):
+    store = make_store()
+    manager = ProgressManager(store)
+    busy, done = manager.create_job(_files()), manager.create_job(_files())
+    apply = store.apply
+
+    def slow_apply(job_id, *args, **kwargs):
+        if job_id == busy:
+            time.sleep(0.002)
+        return apply(job_id, *args, **kwargs)
+
+    store.apply = slow_apply
+    stop = threading.Event()
+
+    def keep_posting():
+        while not stop.is_set():
+            manager.post_update(busy, progress=10, file_id="a", log="tick")
+            time.sleep(0.0005)
+
+    poster = threading.Thread(target=keep_posting)
+    poster.start()
+    try:
+        time.sleep(0.1)
+        manager.post_update(done, progress=50, file_id="b", chunk_index=2)
+        started = time.perf_counter()
+        manager.set_result(done, {"summary": "ok"})
+        elapsed = time.perf_counter() - started
+    finally:
+        stop.set()
+        poster.join()
+
+    assert elapsed < 0.5
+    job = manager.get(done)
+    assert job["status"] == "completed" and job["files"][1]["chunk_index"] == 2
+
+
+def test_posted_updates_are_coalesced_past_the_pending_limit(make_store, monkeypatch):
+    monkeypatch.setattr(progress, "MAX_PENDING_UPDATES", 5)
+    store = make_store()
+    manager = ProgressManager(store)
+    job_id = manager.create_job(_files())
+    released = threading.Event()
+    apply = store.apply
+    store.apply = lambda *args, **kwargs: released.wait(5) and apply(*args, **kwargs)
+
+    manager.post_update(job_id, progress=1)  # taken by the writer, which then blocks
+    time.sleep(0.05)
+    for i in range(100):
+        manager.post_update(job_id, progress=i, file_id="a" if i % 2 else "b", chunk_index=i, log=f"chunk {i}")
+
+    assert len(manager._pending[job_id]) <= 5 + 2
+    released.set()
+    manager.flush(job_id)
+    job = manager.get(job_id)
+    assert job["progress"] == 99
+    assert (job["files"][0]["chunk_index"], job["files"][1]["chunk_index"]) == (99, 98)
+    assert "chunk 99" in job["logs"][-1]
+
+
+def test_logs_are_capped_and_stale_cursors_get_a_snapshot(make_store):
+    manager = ProgressManager(make_store(event_buffer=10))
+    job_id = manager.create_job(_files())
+    for i in range(MAX_LOG_LINES + 150):
+        manager.update(job_id, log=f"line {i}")
+
+    job = manager.get(job_id)
+    assert len(job["logs"]) == MAX_LOG_LINES
+    assert job["logs"][0].endswith("line 150")
+    assert job["logs"][-1].endswith(f"line {MAX_LOG_LINES + 149}")
+
+    events, snapshot = manager.events_since(job_id, 5)
+    assert events == [] and snapshot["seq"] == job["seq"]
+    events, snapshot = manager.events_since(job_id, job["seq"] - 3)
+    assert snapshot is None and len(events) == 3
+
+
+def test_event_stream_resumes_from_last_event_id(monkeypatch, make_store):
+    manager = ProgressManager(make_store())
+    monkeypatch.setattr(api, "progress_manager", manager)
+    monkeypatch.setattr(api, "PROGRESS_STREAM_INTERVAL", 0.01)
+    job_id = manager.create_job(_files())
+    manager.start(job_id)
+    manager.update(job_id, progress=50, file_id="a", file_status="done")
+    manager.set_result(job_id, {"summary": "ok"})
+    client = TestClient(api.app)
+
+    full = client.get(f"/analyze/progress/{job_id}/events").text
+    assert "event: snapshot" in full and '"status": "completed"' in full
+
+    resumed = client.get(f"/analyze/progress/{job_id}/events", headers={"Last-Event-ID": "1"}).text
+    assert "event: snapshot" not in resumed
+    assert resumed.startswith("id: 3\nevent: progress\n")
+    assert '"index": 0' in resumed and '"summary": "ok"' in resumed
+
+    assert client.get("/analyze/progress/missing/events").status_code == 404
+
+
+def test_subscribers_connecting_before_the_first_update_get_a_snapshot(monkeypatch, make_store):
+    manager = ProgressManager(make_store())
+    monkeypatch.setattr(api, "progress_manager", manager)
+    monkeypatch.setattr(api, "PROGRESS_STREAM_INTERVAL", 0.01)
+    job_id = manager.create_job(_files())
+
+    events, snapshot = manager.events_since(job_id, 0)
+    assert events == [] and snapshot["status"] == "queued" and snapshot["seq"] == 0
+
+    finisher = threading.Timer(0.2, manager.set_result, (job_id, {"summary": "ok"}))
+    finisher.start()
+    stream = TestClient(api.app).get(f"/analyze/progress/{job_id}/events").text
+    finisher.join()
+    assert stream.startswith("id: 0\nevent: snapshot\n")
+    assert '"status": "queued"' in stream.split("\n\n")[0]
+
+
+def test_finished_jobs_are_evicted_after_ttl(make_store):
+    store = make_store(ttl_seconds=60)
+    manager = ProgressManager(store)
+    done = manager.create_job(_files())
+    running = manager.create_job(_files())
+    manager.set_result(done, {"summary": "ok"})
+    manager.start(running)
+    finished_at = manager.get(done)["finished_at"]
+
+    assert store.evict_expired(finished_at + 30) == 0
+    assert store.evict_expired(finished_at + 61) == 1
+    assert manager.get(done) is None
+    assert manager.status(running) == "running"
+
+
+def test_sqlite_store_is_shared_between_managers(tmp_path):
+    path = tmp_path / "progress.sqlite3"
+    first = ProgressManager(SqliteProgressStore(path))
+    second = ProgressManager(SqliteProgressStore(path))
+
+    job_id = first.create_job(_files())
+    second.update(job_id, progress=40, file_name="results.csv", file_status="summarizing")
+
+    job = first.get(job_id)
+    assert job["progress"] == 40
+    assert job["files"][1]["status"] == "summarizing"
@@ -0,0 +1,68 @@
+import pytest
+
+from app.processors.csv_parser import format_jtl_stats
+from app.run_history import (
+    RunHistory,
+    compare_metrics,
+    format_delta_table,
+    metrics_from_jtl_stats,
+    metrics_from_markdown,
+)
+
+
+def _stats():
+    row = {
+        "label": "login", "count": 100, "mean_ms": 120.0, "p50_ms": 100.0, "p90_ms": 180.0, "p95_ms": 200.0,
+        "p99_ms": 300.0, "max_ms": 900.0, "error_rate": 0.02, "throughput_rps": 12.5,
+    }
+    return {"rows": 100, "duration_s": 8.0, "labels": [row], "overall": dict(row, label="TOTAL")}
+
+
+def test_markdown_tables_round_trip_jtl_stats():
+    metrics = metrics_from_markdown(format_jtl_stats(_stats()))
+
+    assert metrics["login"]["p95_ms"] == 200
+    assert metrics["login"]["error_rate"] == pytest.approx(0.02)
+    assert metrics["login"]["throughput_rps"] == pytest.approx(12.5)
+    assert set(metrics) == {"login", "TOTAL"}
+
+
+def test_markdown_parsing_handles_units_and_ignores_plain_tables():
+    markdown = (
+        "| Transaction | Avg (s) | 95th pct | Errors |\n"
+        "|:---|---:|---:|---:|\n"
+        "| **checkout** | 1.5 | 2,400 ms | 3% |\n\n"
+        "| Finding | Severity |\n|---|---|\n| Slow DB | High |\n"
+    )
+
+    metrics = metrics_from_markdown(markdown)
+
+    assert metrics == {"checkout": {"mean_ms": 1500.0, "p95_ms": 2400.0, "error_rate": 0.03}}
+
+
+def test_compare_flags_regressions_first():
+    baseline = {"login": {"p95_ms": 200.0, "throughput_rps": 10.0}, "home": {"p95_ms": 50.0}}
+    candidates = {
+        "run-b": {"login": {"p95_ms": 260.0, "throughput_rps": 10.5}, "home": {"p95_ms": 51.0}},
+    }
+
+    rows = compare_metrics(baseline, candidates)
+
+    assert (rows[0]["transaction"], rows[0]["metric"]) == ("login", "p95_ms")
+    assert rows[0]["runs"]["run-b"]["regression"] is True
+    assert rows[0]["runs"]["run-b"]["delta_pct"] == pytest.approx(30.0)
+    assert not any(run["regression"] for row in rows[1:] for run in row["runs"].values())
+    table = format_delta_table(rows, ["run-b"])
+    assert "| login | p95_ms | 200 | 260 (+30.0%) ! |" in table
+
+
+def test_run_history_round_trip(tmp_path):
+    history = RunHistory(tmp_path / "runs.sqlite3")
+    metrics = metrics_from_jtl_stats(_stats())
+
+    run_id = history.record_run(metrics, context={"env": "staging"})
+
+    assert history.get_metrics(run_id) == metrics
+    assert history.get_metrics("missing") is None
+    [run] = history.list_runs()
+    assert run["run_id"] == run_id and run["transactions"] == 2
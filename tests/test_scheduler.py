@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from app.scheduler import JobScheduler, SchedulerOverloaded
+
+
+def _blocking_task(started, release, name):
+    def _task():
+        started.append(name)
+        release.wait(5)
+    return _task
+
+
+def test_scheduler_caps_concurrency_and_reports_queue_position():
+    scheduler = JobScheduler(max_concurrent=1, max_queued=5, default_job_seconds=10)
+    release = threading.Event()
+    started = []
+    done = threading.Event()
+
+    scheduler.submit("a", _blocking_task(started, release, "a"))
+    scheduler.submit("b", _blocking_task(started, release, "b"))
+    scheduler.submit("c", lambda: (started.append("c"), done.set()))
+    # Wait for the worker to pick up the first job
+    for _ in range(100):
+        if started:
+            break
+        time.sleep(0.01)
+
+    assert started == ["a"]
+    assert scheduler.status("a")["queue_position"] == 0
+    b_status = scheduler.status("b")
+    c_status = scheduler.status("c")
+    assert b_status["queue_position"] == 1 and c_status["queue_position"] == 2
+    assert 0 < b_status["estimated_wait_seconds"] <= 10
+    assert c_status["estimated_wait_seconds"] > b_status["estimated_wait_seconds"]
+
+    release.set()
+    assert done.wait(5)
+    assert started == ["a", "b", "c"]
+
+
+def test_scheduler_orders_by_priority_and_rejects_when_full():
+    scheduler = JobScheduler(max_concurrent=1, max_queued=2)
+    release = threading.Event()
+    order = []
+    done = threading.Event()
+
+    scheduler.submit("blocker", _blocking_task(order, release, "blocker"))
+    for _ in range(100):
+        if order:
+            break
+        time.sleep(0.01)
+    scheduler.submit("low", lambda: (order.append("low"), done.set()), priority=5)
+    scheduler.submit("high", lambda: order.append("high"), priority=0)
+
+    with pytest.raises(SchedulerOverloaded) as exc_info:
+        scheduler.submit("overflow", lambda: None)
+    assert exc_info.value.retry_after > 0
+    assert scheduler.stats()["rejected"] == 1
+
+    release.set()
+    assert done.wait(5)
+    assert order == ["blocker", "high", "low"]
+
+
+def test_cancelled_jobs_never_run():
+    scheduler = JobScheduler(max_concurrent=1, max_queued=5)
+    release = threading.Event()
+    ran = []
+    done = threading.Event()
+
+    scheduler.submit("blocker", _blocking_task(ran, release, "blocker"))
+    scheduler.submit("dropped", lambda: ran.append("dropped"))
+    scheduler.submit("kept", lambda: (ran.append("kept"), done.set()))
+
+    assert scheduler.cancel("dropped")
+    assert scheduler.status("dropped") == {}
+    release.set()
+    assert done.wait(5)
+    assert ran == ["blocker", "kept"]
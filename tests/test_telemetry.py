@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+
+from app import api, telemetry
+from app.analyzer import analyze
+from benchmarks.fake_llm import FakeLLMClient
+from benchmarks.harness import offline_pipeline
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = telemetry.Histogram("demo_seconds", "Demo.", ["stage"], buckets=(0.1, 1))
+    histogram.observe(0.05, stage="read")
+    histogram.observe(0.5, stage="read")
+    histogram.observe(5, stage="read")
+
+    lines = histogram.render()
+
+    assert 'demo_seconds_bucket{stage="read",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="read",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{stage="read",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{stage="read"} 3' in lines
+
+
+def test_analyze_attaches_per_job_timings_and_usage(tmp_path):
+    log = tmp_path / "app.log"
+    log.write_text("2025-07-26 12:00:01 ERROR Timeout calling payments\n" * 5)
+    client = FakeLLMClient(rate_limit_ratio=0.3, retry_after=0.01, seed=2)
+    before = telemetry.LLM_TOKENS.value(model=api.ANALYSIS_MODEL, kind="prompt")
+
+    with offline_pipeline(client, unthrottled=True):
+        result = analyze([{"name": "app.log", "path": str(log)}], {"Type": "Load Test"})
+
+    timings = result["timings"]
+    for stage in ("analysis", "preprocessing", "chunk_summary", "final_analysis"):
+        assert timings["stages"][stage]["count"] >= 1
+    usage = client.stats()
+    llm = timings["llm"]
+    # Usage recorded on the LLM runtime's loop is attributed to this job
+    assert sum(m["calls"] for m in llm.values()) == usage["llm_calls"]
+    assert sum(m["prompt_tokens"] for m in llm.values()) == usage["prompt_tokens"]
+    assert sum(m["rate_limited"] for m in llm.values()) == usage["rate_limited"]
+    assert telemetry.LLM_TOKENS.value(model=api.ANALYSIS_MODEL, kind="prompt") > before
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    telemetry.observe_stage("upload", 0.01)
+
+    response = TestClient(api.app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE aicore_stage_duration_seconds histogram" in response.text
+    assert 'aicore_stage_duration_seconds_count{stage="upload"}' in response.text
+    assert "aicore_jobs_queued 0" in response.text
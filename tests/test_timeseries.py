@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from app.processors import timeseries
+from app.processors.timeseries import format_timeseries, lttb_downsample, minmax_downsample, reduce_timeseries_csv
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[617] = 25.0
+
+    dx, dy = lttb_downsample(x, y, 40)
+
+    assert len(dx) == 40
+    assert dx[0] == 0 and dx[-1] == 999
+    assert 617 in dx and dy.max() == 25.0
+    assert np.all(np.diff(dx) > 0)
+
+
+def test_minmax_downsample_keeps_each_bucket_extremes():
+    x = np.arange(100, dtype=float)
+    y = np.zeros(100)
+    y[13], y[58] = -4.0, 9.0
+
+    dx, dy = minmax_downsample(x, y, 10)
+
+    assert len(dx) <= 20
+    assert {13.0, 58.0} <= set(dx)
+
+
+def test_reduce_timeseries_csv_streams_a_monitoring_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries, "PRE_REDUCE_POINTS", 400)
+    n = 3600
+    cpu = np.full(n, 30.0)
+    cpu[2500] = 97.0
+    path = tmp_path / "node_metrics.csv"
+    pd.DataFrame({
+        "Time": pd.date_range("2025-07-26 12:00", periods=n, freq="s").strftime("%Y-%m-%d %H:%M:%S"),
+        "host": "node-1",
+        "cpu_pct": cpu,
+        "rps": np.arange(n) % 200,
+    }).to_csv(path, index=False)
+
+    reduced = reduce_timeseries_csv(str(path), points=50, chunk_rows=500)
+
+    assert reduced["rows"] == n and reduced["span_s"] == n - 1
+    cpu_series, rps_series = reduced["series"]
+    assert cpu_series["name"] == "cpu_pct" and len(cpu_series["points"]) == 50
+    assert (cpu_series["max"], cpu_series["max_at"]) == (97.0, 2500)
+    assert (2500.0, 97.0) in cpu_series["points"]
+    assert rps_series["max"] == 199
+    text = format_timeseries(reduced)
+    assert "start 2025-07-26 12:00:00 UTC" in text
+    assert "- cpu_pct: min 30 at +0s, mean 30.02, max 97 at +2500s" in text
+    assert len(text) < 3000
+
+
+def test_tables_without_a_time_axis_are_not_series(tmp_path):
+    path = tmp_path / "endpoints.csv"
+    path.write_text("endpoint,response_time,status_code\n/api/data,200,200\n/api/list,350,200\n")
+
+    assert reduce_timeseries_csv(str(path)) is None